@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Access to nested value by dotted key, typed getter and attribute of to_object
+
+Run from the project root:
+
+    python -m benchmarks.bench_access
+"""
+
+from __future__ import print_function
+
+import timeit
+
+from envyaml import EnvYAML
+
+NUMBER = 1000000
+
+
+def main():
+    env = EnvYAML("tests/env.test.yaml", "tests/test.env", strict=False)
+    config = env.to_object()
+
+    cases = [
+        ("env[key]", lambda: env["one.two.three.value"]),
+        ("env.get(key)", lambda: env.get("one.two.three.value")),
+        ("env.get_int(key)", lambda: env.get_int("PROJECT_ID")),
+        ("int(env[key])", lambda: int(env["PROJECT_ID"])),
+        ("to_object()", lambda: config.one.two.three.value),
+    ]
+
+    print("%20s %12s" % ("access", "ns/op"))
+
+    for name, function in cases:
+        seconds = min(timeit.repeat(function, number=NUMBER, repeat=3))
+
+        print("%20s %12.1f" % (name, seconds / NUMBER * 1e9))
+
+
+if __name__ == "__main__":
+    main()
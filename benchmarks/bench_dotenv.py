@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Streaming .env reader compared to regex over whole file content
+
+Peak RSS is measured in a separate process for every reader. Run from the
+project root (peak RSS requires Unix):
+
+    python -m benchmarks.bench_dotenv
+"""
+
+from __future__ import print_function
+
+import io
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+from envyaml import EnvYAML
+from envyaml.envyaml import RE_DOT_ENV
+
+LINE = 'SECRET_{0}="{1}"\n'
+
+
+def read_regex(path):
+    """Previous implementation, regex over whole file content"""
+    with io.open(path, encoding="utf8") as f:
+        content = f.read()
+
+    return dict(
+        (entry.group("name"), entry.group("value"))
+        for entry in RE_DOT_ENV.finditer(content)
+    )
+
+
+def read_stream(path):
+    return EnvYAML._EnvYAML__read_env_file(path, True)
+
+
+READERS = {"regex": read_regex, "stream": read_stream}
+
+
+def max_rss():
+    """Peak RSS of current process in KiB"""
+    # ru_maxrss is inherited from parent process on Linux, VmHWM is not
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except IOError:
+        pass
+
+    # ru_maxrss is in bytes on macOS
+    scale = 1024 if sys.platform == "darwin" else 1
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale
+
+
+def child(reader, path):
+    """Print peak RSS growth caused by reader in KiB"""
+    before = max_rss()
+    READERS[reader](path)
+
+    print(max_rss() - before)
+
+
+def peak_rss(reader, path):
+    output = subprocess.check_output(
+        [sys.executable, "-m", "benchmarks.bench_dotenv", reader, path]
+    )
+
+    return int(output)
+
+
+def main():
+    directory = tempfile.mkdtemp()
+
+    try:
+        print(
+            "%10s %12s %10s %10s %12s %12s"
+            % ("lines", "bytes", "regex", "stream", "regex KiB", "stream KiB")
+        )
+
+        for lines in (10000, 100000, 500000):
+            path = os.path.join(directory, "secrets.%d.env" % lines)
+
+            with open(path, "w") as f:
+                for i in range(lines):
+                    f.write(LINE.format(i, "x" * 64))
+
+            regex, stream = [
+                min(timeit.repeat(lambda: READERS[name](path), number=1, repeat=3))
+                for name in ("regex", "stream")
+            ]
+
+            print(
+                "%10d %12d %10.4f %10.4f %12d %12d"
+                % (
+                    lines,
+                    os.path.getsize(path),
+                    regex,
+                    stream,
+                    peak_rss("regex", path),
+                    peak_rss("stream", path),
+                )
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        child(*sys.argv[1:])
+    else:
+        main()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""EnvYAML construction time for growing process environment
+
+Run from the project root:
+
+    python -m benchmarks.bench_environment
+"""
+
+from __future__ import print_function
+
+import os
+import timeit
+
+from envyaml import EnvYAML
+
+PREFIX = "ENVYAML_BENCH_"
+
+
+def main():
+    print("%10s %10s %10s" % ("variables", "init ms", "lookup us"))
+
+    try:
+        for size in (100, 1000, 10000, 50000):
+            for i in range(size):
+                os.environ["%s%d" % (PREFIX, i)] = "value-%d" % i
+
+            env = EnvYAML(
+                "tests/env.test.yaml", env_file="tests/test.env", strict=False
+            )
+
+            init = min(
+                timeit.repeat(
+                    lambda: EnvYAML(
+                        "tests/env.test.yaml", env_file="tests/test.env", strict=False
+                    ),
+                    number=10,
+                    repeat=3,
+                )
+            )
+            lookup = min(
+                timeit.repeat(lambda: env["config.test_env"], number=10000, repeat=3)
+            )
+
+            print("%10d %10.3f %10.3f" % (size, init / 10 * 1e3, lookup / 10000 * 1e6))
+    finally:
+        for name in [name for name in os.environ if name.startswith(PREFIX)]:
+            del os.environ[name]
+
+
+if __name__ == "__main__":
+    main()
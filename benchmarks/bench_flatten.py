@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Flattening of deep configurations, recursive vs single accumulator
+
+Run from the project root:
+
+    python -m benchmarks.bench_flatten
+
+Recursive implementation is the one EnvYAML used before, it copies every
+leaf once per nesting level.
+"""
+
+from __future__ import print_function
+
+import timeit
+
+from envyaml import EnvYAML
+
+# current implementation
+flat = getattr(EnvYAML, "_EnvYAML__flat")
+
+
+def recursive_flat_deep(prefix, config):
+    dest_ = {}
+
+    elements = enumerate(config) if isinstance(config, list) else config.items()
+
+    for key_, value_ in elements:
+        key_ = prefix + "." + str(key_)
+        dest_[key_] = value_
+
+        if isinstance(value_, (dict, list)):
+            dest_.update(recursive_flat_deep(key_, value_))
+
+    return dest_
+
+
+def recursive_flat(config):
+    dest_ = {}
+
+    for key_, value_ in config.items():
+        key_ = str(key_)
+        dest_[key_] = value_
+
+        if isinstance(value_, (dict, list)):
+            dest_.update(recursive_flat_deep(key_, value_))
+
+    return dest_
+
+
+def generate(depth, width):
+    """Helm-like values tree, lists on every third level"""
+    if depth == 0:
+        return "value"
+
+    if depth % 3 == 0:
+        return [generate(depth - 1, width) for _ in range(width)]
+
+    return {"key_%d" % i: generate(depth - 1, width) for i in range(width)}
+
+
+def main():
+    print("%6s %6s %10s %12s %12s" % ("depth", "width", "keys", "recursive", "stack"))
+
+    for depth, width in ((4, 8), (6, 5), (8, 3), (10, 2), (12, 2)):
+        config = {"values": generate(depth, width)}
+
+        assert recursive_flat(config) == flat(config)
+
+        timings = [
+            min(timeit.repeat(lambda: function(config), number=1, repeat=5))
+            for function in (recursive_flat, flat)
+        ]
+
+        print(
+            "%6d %6d %10d %12.4f %12.4f"
+            % ((depth, width, len(flat(config))) + tuple(timings))
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""Unique memory of forked workers reading preloaded config
+
+Master process loads config and forks workers, every worker reads keys of
+every section and runs garbage collection, then reports its unique set size
+(USS), memory which is not shared with master anymore. Every mode runs in a separate master
+process, because gc.freeze affects whole process. Requires Linux:
+
+    python -m benchmarks.bench_fork
+"""
+
+from __future__ import print_function
+
+import gc
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from envyaml import EnvYAML
+
+from .generators import generate_yaml
+
+MODES = ("plain", "freeze", "freeze+gc")
+
+WORKERS = 4
+
+
+def uss():
+    """Unique set size of current process in KiB"""
+    path = "/proc/self/smaps_rollup"
+
+    if not os.path.exists(path):
+        path = "/proc/self/smaps"
+
+    with open(path) as f:
+        return sum(
+            int(line.split()[1])
+            for line in f
+            if line.startswith(("Private_Clean:", "Private_Dirty:"))
+        )
+
+
+# keys read by workers, generated by them as request handlers do
+KEYS = ("name", "port", "enabled", "level_0.value", "level_0.level_1.value", "items.1")
+
+
+def work(env, sections):
+    """Read keys of every section"""
+    for section in range(sections):
+        for key in KEYS:
+            env["section_%d.%s" % (section, key)]
+
+    gc.collect()
+
+
+def master(mode, path, sections):
+    """Load config, fork workers and print their average USS in KiB"""
+    if mode == "plain":
+        env = EnvYAML(path, include_environment=False)
+    else:
+        env = EnvYAML.preload(
+            mode,
+            gc_freeze=mode == "freeze+gc",
+            yaml_file=path,
+            include_environment=False,
+        )
+
+    results = []
+
+    for _ in range(WORKERS):
+        read, write = os.pipe()
+        pid = os.fork()
+
+        if pid == 0:
+            os.close(read)
+            before = uss()
+            work(env, int(sections))
+            os.write(write, str(uss() - before).encode())
+            os._exit(0)
+
+        os.close(write)
+
+        with os.fdopen(read) as f:
+            results.append(int(f.read()))
+
+        os.waitpid(pid, 0)
+
+    print(sum(results) // len(results))
+
+
+def main():
+    directory = tempfile.mkdtemp()
+
+    try:
+        print("%10s %10s" % ("sections", "keys") + "".join("%12s" % m for m in MODES))
+
+        for sections in (1000, 10000, 50000):
+            path = generate_yaml(directory, sections)
+            keys = len(EnvYAML(path, include_environment=False).keys())
+
+            row = [
+                int(
+                    subprocess.check_output(
+                        [
+                            sys.executable,
+                            "-m",
+                            "benchmarks.bench_fork",
+                            mode,
+                            path,
+                            str(sections),
+                        ]
+                    )
+                )
+                for mode in MODES
+            ]
+
+            print("%10d %10d" % (sections, keys) + "".join("%12d" % kib for kib in row))
+
+        print("unique KiB of every worker after reading keys of every section")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4:
+        master(*sys.argv[1:])
+    else:
+        main()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Interpolation throughput for growing env.yaml files
+
+Run from the project root:
+
+    python -m benchmarks.bench_interpolation
+
+Every row doubles amount of sections (and so file size and references count),
+throughput in MB/s should stay flat when substitution cost is linear. First
+column measures substitution only, second one whole EnvYAML construction.
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import timeit
+
+from envyaml import EnvYAML
+
+# substitution stage of EnvYAML.__read_yaml_file
+compile_template = getattr(EnvYAML, "_EnvYAML__compile_template")
+render_template = getattr(EnvYAML, "_EnvYAML__render_template")
+
+
+def interpolate(content, cfg, strict):
+    return render_template(compile_template(content), cfg, strict)
+
+
+SECTION = """section_{0}:
+  host: ${{HOST_{1}|localhost}}
+  port: $PORT_{1}|5432
+  user: "$USER_{1}"
+  url: "postgres://${{USER_{1}}}:$${{secret}}@${{HOST_{1}|localhost}}/db_{0}"
+"""
+
+VARIABLES = 100
+
+
+def write_config(path, sections):
+    with open(path, "w") as f:
+        for i in range(sections):
+            f.write(SECTION.format(i, i % VARIABLES))
+
+    return os.path.getsize(path)
+
+
+def mb(size, seconds):
+    return size / seconds / 1024 / 1024
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    variables = {}
+
+    for i in range(VARIABLES):
+        variables["HOST_%d" % i] = "host-%d" % i
+        variables["USER_%d" % i] = "user-%d" % i
+
+    try:
+        print("%10s %12s %12s %12s" % ("sections", "bytes", "subst MB/s", "total MB/s"))
+
+        for sections in (500, 1000, 2000, 4000, 8000, 16000):
+            path = os.path.join(directory, "env.%d.yaml" % sections)
+            size = write_config(path, sections)
+
+            with open(path) as f:
+                content = f.read()
+
+            substitution = min(
+                timeit.repeat(
+                    lambda: interpolate(content, variables, False), number=1, repeat=3
+                )
+            )
+
+            total = min(
+                timeit.repeat(
+                    lambda: EnvYAML(
+                        path, include_environment=False, strict=False, **variables
+                    ),
+                    number=1,
+                    repeat=3,
+                )
+            )
+
+            print(
+                "%10d %12d %12.2f %12.2f"
+                % (sections, size, mb(size, substitution), mb(size, total))
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
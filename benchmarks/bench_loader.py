@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""EnvYAML construction with LibYAML and pure Python loaders
+
+Run from the project root:
+
+    python -m benchmarks.bench_loader
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import timeit
+
+from envyaml import EnvYAML
+from envyaml.envyaml import CSafeLoader
+
+SECTION = """service_{0}:
+  name: service-{0}
+  host: ${{HOST|localhost}}
+  port: {0}
+  enabled: true
+  ratio: 0.{0}
+  tags: [ a, b, c ]
+  limits:
+    cpu: 500m
+    memory: 256Mi
+"""
+
+
+def main():
+    if CSafeLoader is None:
+        print("PyYAML built without LibYAML, nothing to compare")
+        return
+
+    directory = tempfile.mkdtemp()
+
+    try:
+        print("%10s %12s %10s %10s %8s" % ("sections", "bytes", "python", "c", "x"))
+
+        for sections in (100, 1000, 5000, 10000):
+            path = os.path.join(directory, "env.%d.yaml" % sections)
+
+            with open(path, "w") as f:
+                for i in range(sections):
+                    f.write(SECTION.format(i))
+
+            python, c = [
+                min(
+                    timeit.repeat(
+                        lambda: EnvYAML(path, include_environment=False, loader=loader),
+                        number=1,
+                        repeat=3,
+                    )
+                )
+                for loader in ("python", "c")
+            ]
+
+            print(
+                "%10d %12d %10.4f %10.4f %8.1f"
+                % (sections, os.path.getsize(path), python, c, python / c)
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
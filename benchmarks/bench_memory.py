@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Memory of many EnvYAML instances with and without shared flattened keys and
+cost of export
+
+Run from the project root:
+
+    python -m benchmarks.bench_memory
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import timeit
+import tracemalloc
+
+from envyaml import EnvYAML
+from envyaml import envyaml
+
+SECTION = """service_{0}:
+  name: service-{0}
+  port: {0}
+  database:
+    host: db-{0}.local
+    options:
+      timeout: 10
+      retries: 3
+  tags: [ a, b, c ]
+"""
+
+
+def measure(path, instances):
+    """Size of allocated memory in KiB for given number of instances"""
+    tracemalloc.start()
+
+    try:
+        envs = [EnvYAML(path, include_environment=False) for _ in range(instances)]
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    del envs
+
+    return size // 1024
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    intern = envyaml.intern
+
+    try:
+        print(
+            "%10s %10s %12s %12s %12s %12s"
+            % ("sections", "instances", "KiB", "interned KiB", "copy", "export")
+        )
+
+        for sections in (100, 1000):
+            path = os.path.join(directory, "env.%d.yaml" % sections)
+
+            with open(path, "w") as f:
+                for i in range(sections):
+                    f.write(SECTION.format(i))
+
+            for instances in (1, 10, 50):
+                # flattened keys are separate strings in every instance
+                envyaml.intern = lambda value: value
+
+                try:
+                    plain = measure(path, instances)
+                finally:
+                    envyaml.intern = intern
+
+                interned = measure(path, instances)
+
+                env = EnvYAML(path, include_environment=False)
+                cfg = dict(env.export())
+
+                copy = min(timeit.repeat(cfg.copy, number=100, repeat=3)) / 100
+                export = min(timeit.repeat(env.export, number=100, repeat=3)) / 100
+
+                print(
+                    "%10d %10d %12d %12d %12.6f %12.6f"
+                    % (sections, instances, plain, interned, copy, export)
+                )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
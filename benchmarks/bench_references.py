@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Resolution of references to config keys, time should grow linearly with
+number of references
+
+Run from the project root:
+
+    python -m benchmarks.bench_references
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import timeit
+
+from envyaml import EnvYAML
+
+SECTION = """service_{0}:
+  host: service-{0}.local
+  url: http://${{service_{0}.host}}:${{service_{1}.port}}
+  port: ${{service_{1}.port}}
+"""
+
+
+def main():
+    directory = tempfile.mkdtemp()
+
+    try:
+        print("%10s %10s %10s %12s" % ("sections", "plain", "references", "us/ref"))
+
+        for sections in (100, 1000, 10000):
+            path = os.path.join(directory, "env.%d.yaml" % sections)
+            plain_path = os.path.join(directory, "env.plain.%d.yaml" % sections)
+
+            # every section refers to previous one, chain of dependencies
+            with open(path, "w") as f:
+                f.write("service_0:\n  port: 80\n")
+
+                for i in range(1, sections):
+                    f.write(SECTION.format(i, i - 1))
+
+            with open(plain_path, "w") as f:
+                f.write("service_0:\n  port: 80\n")
+
+                for i in range(1, sections):
+                    f.write(SECTION.format(i, i - 1).replace("$", ""))
+
+            plain, references = [
+                min(
+                    timeit.repeat(
+                        lambda: EnvYAML(name, include_environment=False),
+                        number=1,
+                        repeat=3,
+                    )
+                )
+                for name in (plain_path, path)
+            ]
+
+            print(
+                "%10d %10.4f %10.4f %12.2f"
+                % (
+                    sections,
+                    plain,
+                    references,
+                    (references - plain) / (sections * 3) * 1e6,
+                )
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
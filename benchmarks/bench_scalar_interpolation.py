@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Text interpolation compared to interpolation into parsed scalars
+
+Run from the project root:
+
+    python -m benchmarks.bench_scalar_interpolation
+
+Configs have comments and long block scalars without variables, only every
+n-th section refers to variables. Text interpolation scans whole file with
+regular expressions, scalar one looks at scalars with "$" only.
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import timeit
+
+from envyaml import EnvYAML
+
+SECTION = """# section {0} of generated config
+# this comment is long enough to look like real documentation of options
+section_{0}:
+  host: {1}
+  port: 5432
+  enabled: true
+  description: |
+    Long block scalar without variables, which is common in real configs
+    and is scanned by text interpolation although it has nothing to replace
+  tags: [a, b, c]
+"""
+
+VARIABLES = dict(HOST="db.example.com")
+
+
+def write_config(path, sections, every):
+    with open(path, "w") as f:
+        for i in range(sections):
+            f.write(SECTION.format(i, "$HOST" if i % every == 0 else "localhost"))
+
+    return os.path.getsize(path)
+
+
+def main():
+    directory = tempfile.mkdtemp()
+
+    try:
+        print(
+            "%10s %10s %12s %10s %10s"
+            % ("sections", "variables", "bytes", "text", "scalar")
+        )
+
+        for sections in (1000, 5000):
+            for every in (1, 20, 100):
+                path = os.path.join(directory, "env.%d.%d.yaml" % (sections, every))
+                size = write_config(path, sections, every)
+
+                text, scalar = [
+                    min(
+                        timeit.repeat(
+                            lambda: EnvYAML(
+                                path,
+                                include_environment=False,
+                                interpolate=interpolate,
+                                **VARIABLES
+                            ),
+                            number=1,
+                            repeat=3,
+                        )
+                    )
+                    for interpolate in ("text", "scalar")
+                ]
+
+                print(
+                    "%10d %10d %12d %10.4f %10.4f"
+                    % (sections, sections // every, size, text, scalar)
+                )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
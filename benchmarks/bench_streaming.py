@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Streaming multi-document reader compared to substitution over whole file
+
+Whole file reader substitutes variables into file content and parses all
+documents at once, streaming reader keeps single document in memory. Run
+from the project root:
+
+    python -m benchmarks.bench_streaming
+"""
+
+from __future__ import print_function
+
+import io
+import os
+import shutil
+import tempfile
+import timeit
+import tracemalloc
+
+from yaml import load_all
+
+from envyaml import EnvYAML
+
+DOCUMENT = """---
+name: host_{0}
+address: ${{HOST_PREFIX}}-{0}.example.com
+port: ${{PORT|8080}}
+tags: [web, $REGION, rack-{1}]
+disks:
+  - size: 100
+    mount: /data/{0}
+  - size: 20
+    mount: /logs/{0}
+"""
+
+VARIABLES = dict(HOST_PREFIX="eu", REGION="west")
+
+LOADER = EnvYAML._EnvYAML__get_loader("auto")
+
+
+def read_whole(path):
+    """Substitute variables into whole file, then parse all documents"""
+    with io.open(path, encoding="utf8") as f:
+        content = f.read()
+
+    template = EnvYAML._EnvYAML__compile_template(content)
+    content = EnvYAML._EnvYAML__render_template(template, VARIABLES, True)
+
+    return sum(
+        len(EnvYAML._EnvYAML__flat(document))
+        for document in load_all(content, Loader=LOADER)
+    )
+
+
+def read_stream(path):
+    return sum(
+        len(document)
+        for document in EnvYAML.iter_documents(
+            path, include_environment=False, **VARIABLES
+        )
+    )
+
+
+READERS = (("whole", read_whole), ("stream", read_stream))
+
+
+def peak_memory(function, path):
+    """Peak of traced allocations in KiB"""
+    tracemalloc.start()
+
+    try:
+        function(path)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak // 1024
+
+
+def main():
+    directory = tempfile.mkdtemp()
+
+    try:
+        print(
+            "%10s %12s %10s %10s %12s %12s"
+            % ("documents", "bytes", "whole", "stream", "whole KiB", "stream KiB")
+        )
+
+        for documents in (100, 1000, 10000):
+            path = os.path.join(directory, "inventory.%d.yaml" % documents)
+
+            with open(path, "w") as f:
+                for i in range(documents):
+                    f.write(DOCUMENT.format(i, i % 42))
+
+            assert read_whole(path) == read_stream(path)
+
+            timings = [
+                min(timeit.repeat(lambda: reader(path), number=1, repeat=3))
+                for _, reader in READERS
+            ]
+            memory = [peak_memory(reader, path) for _, reader in READERS]
+
+            print(
+                "%10d %12d %10.4f %10.4f %12d %12d"
+                % tuple([documents, os.path.getsize(path)] + timings + memory)
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
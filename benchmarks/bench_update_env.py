@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Recompute values of one changed variable vs reading whole config again
+
+Run from the project root:
+
+    python -m benchmarks.bench_update_env
+
+Time of update_env should stay flat when config grows, first update builds
+dependency index and is measured separately.
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import timeit
+
+from envyaml import EnvYAML
+
+SECTION = """section_{0}:
+  host: ${{HOST_{0}|localhost}}
+  port: 5432
+  tags: [ a, b, c ]
+  nested:
+    user: user-{0}
+"""
+
+
+def main():
+    directory = tempfile.mkdtemp()
+
+    try:
+        print(
+            "%10s %12s %12s %12s"
+            % ("sections", "construct", "first update", "next update")
+        )
+
+        for sections in (100, 1000, 5000, 10000):
+            path = os.path.join(directory, "env.%d.yaml" % sections)
+
+            with open(path, "w") as f:
+                for i in range(sections):
+                    f.write(SECTION.format(i))
+
+            construct = min(
+                timeit.repeat(
+                    lambda: EnvYAML(path, include_environment=False),
+                    number=1,
+                    repeat=3,
+                )
+            )
+
+            env = EnvYAML(path, include_environment=False)
+
+            first = timeit.timeit(lambda: env.update_env({"HOST_0": "first"}), number=1)
+
+            values = iter(range(1000000))
+            update = min(
+                timeit.repeat(
+                    lambda: env.update_env({"HOST_0": "host-%d" % next(values)}),
+                    number=1,
+                    repeat=20,
+                )
+            )
+
+            print("%10d %12.4f %12.4f %12.6f" % (sections, construct, first, update))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Synthetic yaml and .env files for benchmarks
+
+Every generator writes a file into given directory and returns its path,
+output depends only on arguments, so runs could be compared.
+"""
+
+import io
+import os
+
+
+def generate_yaml(directory, sections=100, depth=2, width=3, references=0):
+    """Write yaml file
+
+    :param str directory: directory for file
+    :param int sections: number of top level sections
+    :param int depth: nesting level of dicts inside every section
+    :param int width: number of items in list of every section
+    :param int references: number of $VAR references in every section
+    :return: str path to file
+    """
+    path = os.path.join(
+        directory,
+        "env.%d-%d-%d-%d.yaml" % (sections, depth, width, references),
+    )
+
+    with io.open(path, "w", encoding="utf8") as f:
+        for section in range(sections):
+            f.write("section_%d:\n" % section)
+            f.write("  name: section-%d\n" % section)
+            f.write("  port: %d\n" % (8000 + section))
+            f.write("  enabled: true\n")
+
+            # nested dicts
+            indent = "  "
+
+            for level in range(depth):
+                f.write("%slevel_%d:\n" % (indent, level))
+                indent += "  "
+                f.write("%svalue: value-%d-%d\n" % (indent, section, level))
+
+            # list
+            f.write("  items:\n")
+
+            for item in range(width):
+                f.write("    - item-%d\n" % item)
+
+            # variables with defaults, so files could be loaded in strict mode
+            for reference in range(references):
+                f.write(
+                    "  ref_%d: ${BENCH_VAR_%d|default-%d}\n"
+                    % (reference, reference, reference)
+                )
+
+    return path
+
+
+def generate_env(directory, variables=100, references=0):
+    """Write .env file
+
+    :param str directory: directory for file
+    :param int variables: number of variables
+    :param int references: number of variables referring to previous ones
+    :return: str path to file
+    """
+    path = os.path.join(directory, "bench.%d-%d.env" % (variables, references))
+
+    with io.open(path, "w", encoding="utf8") as f:
+        f.write("# generated\n")
+
+        for variable in range(variables):
+            if 0 < variable <= references:
+                f.write(
+                    "BENCH_ENV_%d=${BENCH_ENV_%d}/%d\n"
+                    % (variable, variable - 1, variable)
+                )
+            else:
+                f.write('BENCH_ENV_%d="value-%d"\n' % (variable, variable))
+
+    return path
+
+
+def generate_environment(variables=100):
+    """Environment variables to add to os.environ
+
+    :param int variables: number of variables
+    :return: dict
+    """
+    return dict(("BENCH_ENVIRON_%d" % i, "value-%d" % i) for i in range(variables))
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""Benchmark suite over synthetic configs, results are saved as JSON
+
+Run from the project root:
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --quick --compare results.json
+
+Every case changes one axis of default config: number of sections (file
+size), nesting depth, list width, number of variables references,
+environment size and .env size. For every case construction time, get
+latency, export cost and peak memory of construction are measured.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import yaml
+
+from envyaml import EnvYAML, __version__
+
+from .generators import generate_env, generate_environment, generate_yaml
+
+# default values of every axis
+DEFAULTS = dict(
+    sections=100, depth=2, width=3, references=0, environment=0, env_variables=0
+)
+
+# values of axes, other axes keep defaults
+AXES = dict(
+    sections=(10, 100, 1000, 5000),
+    depth=(1, 5, 20),
+    width=(1, 10, 100),
+    references=(0, 5, 20),
+    environment=(0, 1000, 10000),
+    env_variables=(0, 1000, 10000),
+)
+
+QUICK_AXES = dict((axis, values[:2]) for axis, values in AXES.items())
+
+
+def best(function, number, repeat):
+    """Best time of one call in seconds"""
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def run_case(directory, case, repeat):
+    """Measure one case
+
+    :param str directory: directory for generated files
+    :param dict case: values of axes
+    :param int repeat: number of repeats, best result is used
+    :return: dict with results
+    """
+    yaml_file = generate_yaml(
+        directory, case["sections"], case["depth"], case["width"], case["references"]
+    )
+    env_file = generate_env(directory, case["env_variables"])
+    environment = generate_environment(case["environment"])
+
+    os.environ.update(environment)
+
+    try:
+
+        def construct():
+            return EnvYAML(yaml_file, env_file)
+
+        # few calls for small configs, single one for big
+        number = max(1, int(0.05 / max(best(construct, 1, 1), 1e-6)))
+        env = construct()
+        key = "section_%d.name" % (case["sections"] // 2)
+
+        tracemalloc.start()
+
+        try:
+            construct()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return dict(
+            case,
+            yaml_bytes=os.path.getsize(yaml_file),
+            keys=len(env.keys()),
+            construct=best(construct, number, repeat),
+            get=best(lambda: env.get(key), 100000, repeat),
+            export=best(env.export, max(1, number), repeat),
+            peak_memory=peak,
+        )
+    finally:
+        for name in environment:
+            del os.environ[name]
+
+
+def get_cases(axes):
+    """Cases changing one axis at a time, default case is measured once
+
+    :param dict axes: values of every axis
+    :return: list of dict
+    """
+    cases = [dict(DEFAULTS)]
+
+    for axis in sorted(axes):
+        for value in axes[axis]:
+            case = dict(DEFAULTS, **{axis: value})
+
+            if case not in cases:
+                cases.append(case)
+
+    return cases
+
+
+def compare(results, baseline):
+    """Print ratio of current results to baseline, more than 1 is slower
+
+    :param list results: current results
+    :param list baseline: previous results
+    """
+    metrics = ("construct", "get", "export", "peak_memory")
+    previous = dict(
+        (tuple(sorted((axis, entry[axis]) for axis in DEFAULTS)), entry)
+        for entry in baseline
+    )
+
+    print()
+    print("%-60s" % "compared to baseline" + "".join("%12s" % m for m in metrics))
+
+    for entry in results:
+        old = previous.get(tuple(sorted((axis, entry[axis]) for axis in DEFAULTS)))
+
+        if old is None:
+            continue
+
+        print(
+            "%-60s" % describe(entry)
+            + "".join(
+                "%12.2f" % (entry[metric] / old[metric] if old[metric] else 0)
+                for metric in metrics
+            )
+        )
+
+
+def describe(case):
+    return " ".join("%s=%s" % (axis, case[axis]) for axis in sorted(DEFAULTS))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--output", help="path of JSON file to save results")
+    parser.add_argument("--compare", help="path of JSON file with previous results")
+    parser.add_argument("--quick", action="store_true", help="small cases only")
+    parser.add_argument("--repeat", type=int, default=3, help="repeats of every case")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp()
+
+    try:
+        results = []
+
+        print(
+            "%-60s%10s%10s%12s%12s%12s%12s"
+            % ("case", "bytes", "keys", "construct", "get ns", "export", "peak KiB")
+        )
+
+        for case in get_cases(QUICK_AXES if args.quick else AXES):
+            result = run_case(directory, case, args.repeat)
+            results.append(result)
+
+            print(
+                "%-60s%10d%10d%12.5f%12.1f%12.6f%12d"
+                % (
+                    describe(result),
+                    result["yaml_bytes"],
+                    result["keys"],
+                    result["construct"],
+                    result["get"] * 1e9,
+                    result["export"],
+                    result["peak_memory"] // 1024,
+                )
+            )
+    finally:
+        shutil.rmtree(directory)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                dict(
+                    envyaml=__version__,
+                    python=sys.version.split()[0],
+                    platform=platform.platform(),
+                    libyaml=bool(getattr(yaml, "__with_libyaml__", False)),
+                    results=results,
+                ),
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)["results"])
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1 @@
-from .envyaml import EnvYAML, __version__
+from .envyaml import EnvYAML, EnvYAMLTemplate, __version__
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""Command line interface of EnvYAML
+
+Serve config to local processes, which get it by EnvYAML.connect:
+
+    python -m envyaml serve --yaml env.yaml --env .env --socket /run/envyaml.sock
+"""
+
+from __future__ import print_function
+
+import argparse
+import signal
+import sys
+
+from .envyaml import EnvYAML
+
+
+def serve(args):
+    """Publish config until interrupted
+
+    :param argparse.Namespace args: command line arguments
+    :return: int exit code
+    """
+
+    def on_error(error):
+        print("EnvYAML reload failed: %s" % error, file=sys.stderr)
+
+    server = EnvYAML.serve(
+        args.socket,
+        interval=args.interval,
+        on_error=on_error,
+        yaml_file=args.yaml,
+        env_file=args.env,
+        include_environment=not args.no_environment,
+        strict=not args.no_strict,
+        loader=args.loader,
+        interpolate=args.interpolate,
+    )
+
+    # socket file is removed on termination
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    print("EnvYAML serves config on %s" % server.socket_path)
+    sys.stdout.flush()
+
+    try:
+        while not server.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m envyaml", description="EnvYAML command line interface"
+    )
+    commands = parser.add_subparsers(dest="command")
+
+    command = commands.add_parser(
+        "serve", help="load config once and publish it to local processes"
+    )
+    command.add_argument(
+        "--socket",
+        help="path of Unix socket, ENVYAML_SOCKET or envyaml.sock in runtime directory of user",
+    )
+    command.add_argument(
+        "--yaml", action="append", help="yaml file, could be repeated to merge files"
+    )
+    command.add_argument(
+        "--env", action="append", help=".env file, could be repeated to merge files"
+    )
+    command.add_argument(
+        "--interval", type=float, default=1.0, help="seconds between checks of files"
+    )
+    command.add_argument(
+        "--no-environment", action="store_true", help="do not use environment variables"
+    )
+    command.add_argument(
+        "--no-strict", action="store_true", help="allow not defined variables"
+    )
+    command.add_argument(
+        "--loader", default=None, choices=("auto", "c", "python"), help="YAML loader"
+    )
+    command.add_argument(
+        "--interpolate",
+        default="text",
+        choices=("text", "scalar"),
+        help="substitute variables into yaml text or parsed scalars",
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        return serve(args)
+
+    parser.print_help()
+
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
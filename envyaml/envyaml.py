@@ -24,14 +24,92 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import gc
+import hashlib
+import hmac
 import io
+import keyword
+import marshal
 import os
+import pickle
 import re
+import socket
+import stat
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
 
 try:
-    from yaml import safe_load
+    from sys import intern
 except ImportError:
-    safe_load = None
+    # python 2 interns only byte strings, keys are kept as is
+    def intern(value):
+        return value
+
+
+try:
+    from types import MappingProxyType
+except ImportError:
+    from collections import Mapping
+
+    class MappingProxyType(Mapping):
+        """Read-only view of mapping for python 2"""
+
+        __slots__ = ("__mapping",)
+
+        def __init__(self, mapping):
+            self.__mapping = mapping
+
+        def __getitem__(self, key):
+            return self.__mapping[key]
+
+        def __iter__(self):
+            return iter(self.__mapping)
+
+        def __len__(self):
+            return len(self.__mapping)
+
+        def __repr__(self):
+            return "mappingproxy(%r)" % (self.__mapping,)
+
+
+try:
+    from yaml import load, SafeLoader, YAMLError
+except ImportError:
+    load = SafeLoader = YAMLError = None
+
+try:
+    from yaml.nodes import ScalarNode, SequenceNode
+    from yaml.resolver import Resolver
+except ImportError:
+    ScalarNode = SequenceNode = Resolver = None
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+try:
+    import dataclasses
+    from typing import get_type_hints
+except ImportError:
+    dataclasses = get_type_hints = None
+
+try:
+    # available only when PyYAML built with LibYAML
+    from yaml import CSafeLoader
+except ImportError:
+    CSafeLoader = None
 
 # pattern to remove comments
 RE_COMMENTS = re.compile(r"(^#.*\n)", re.MULTILINE | re.UNICODE | re.IGNORECASE)
@@ -41,6 +119,13 @@ RE_DOT_ENV = re.compile(
     re.MULTILINE | re.UNICODE | re.IGNORECASE,
 )
 
+# pattern to extract variables expanded by os.path.expandvars
+RE_EXPAND_VARS = re.compile(r"\$(?:(?P<named>\w+)|{(?P<braced>[^}]*)})", re.UNICODE)
+# pattern to extract variables expanded by os.path.expandvars on windows, %% is "%"
+RE_EXPAND_NT_VARS = re.compile(
+    r"%(?P<percent>[^%]*)%|" + RE_EXPAND_VARS.pattern, re.UNICODE
+)
+
 # pattern to extract env variables
 RE_PATTERN = re.compile(
     r"(?P<pref>[\"\'])?"
@@ -51,241 +136,4101 @@ RE_PATTERN = re.compile(
     re.MULTILINE | re.UNICODE | re.IGNORECASE | re.VERBOSE,
 )
 
-__version__ = "1.10.211231"
+# pattern of variable names which could refer to config keys
+RE_KEY = re.compile(r"^[\w\-\.]+$", re.UNICODE)
+
+# pattern of config key references left in parsed yaml, named or braced
+RE_REFERENCE = re.compile(u"\ue000([\\w\\-\\.]+)([\ue001\ue002])", re.UNICODE)
+
+# pattern of yaml indicators which change meaning of scalar when value starts with them
+RE_INDICATOR = re.compile(r"^\s*([\-\?:](\s|$)|[|>'\"&*!%@`\[\]{},#])", re.UNICODE)
+
+# pattern to parse durations like 1h30m, 500ms or 1.5
+RE_DURATION = re.compile(
+    r"(?P<value>\d+(?:\.\d*)?|\.\d+)\s*(?P<unit>us|ms|s|m|h|d|w)?\s*",
+    re.UNICODE | re.IGNORECASE,
+)
+
+# pattern to parse sizes like 512, 10k, 256Mi or 1.5 GiB
+RE_BYTES = re.compile(
+    r"^\s*(?P<value>\d+(?:\.\d*)?|\.\d+)\s*(?P<unit>[kmgtp]?)(?P<binary>i?)b?\s*$",
+    re.UNICODE | re.IGNORECASE,
+)
+
+__version__ = "1.10.211231"
+
+try:
+    string_types = basestring  # Python 2.7
+except NameError:
+    string_types = str
+
+# marker for not found values
+_MISSING = object()
+
+# marker for removed variables, hides variables from lower layers
+_DELETED = object()
+
+# classes allowed in compiled cache files besides plain containers and scalars
+_CACHE_CLASSES = {
+    ("builtins", "set"),
+    ("builtins", "frozenset"),
+    ("__builtin__", "set"),
+    ("__builtin__", "frozenset"),
+    ("datetime", "date"),
+    ("datetime", "datetime"),
+    ("datetime", "timedelta"),
+    ("datetime", "timezone"),
+    # bytes in pickle protocol 2
+    ("_codecs", "encode"),
+}
+
+
+# overlay of values changed by update_env is merged into flat config when it has
+# more than 1/8 of its keys
+_OVERLAY_RATIO = 8
+
+# seconds in duration units
+_DURATION_UNITS = {
+    None: 1.0,
+    "us": 0.000001,
+    "ms": 0.001,
+    "s": 1.0,
+    "m": 60.0,
+    "h": 3600.0,
+    "d": 86400.0,
+    "w": 604800.0,
+}
+
+# powers of size units
+_BYTES_UNITS = {"": 0, "k": 1, "m": 2, "g": 3, "t": 4, "p": 5}
+
+# strings accepted as booleans
+_BOOLEANS = {
+    "1": True,
+    "true": True,
+    "yes": True,
+    "y": True,
+    "on": True,
+    "0": False,
+    "false": False,
+    "no": False,
+    "n": False,
+    "off": False,
+    "": False,
+}
+
+
+def _to_int(value):
+    if isinstance(value, bool):
+        raise ValueError(value)
+
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(value)
+
+        return int(value)
+
+    return int(value.strip() if isinstance(value, string_types) else value)
+
+
+def _to_float(value):
+    if isinstance(value, bool):
+        raise ValueError(value)
+
+    return float(value)
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+
+    if isinstance(value, string_types):
+        return _BOOLEANS[value.strip().lower()]
+
+    raise ValueError(value)
+
+
+def _to_str(value):
+    if isinstance(value, (dict, list)):
+        raise ValueError(value)
+
+    return value if isinstance(value, string_types) else str(value)
+
+
+def _to_list(value):
+    if isinstance(value, (list, tuple)):
+        return list(value)
+
+    if isinstance(value, string_types):
+        return [item.strip() for item in value.split(",")] if value.strip() else []
+
+    raise ValueError(value)
+
+
+def _to_duration(value):
+    if isinstance(value, string_types):
+        seconds, end = 0.0, 0
+        value = value.strip()
+
+        for entry in RE_DURATION.finditer(value):
+            if entry.start() != end:
+                break
+
+            unit = entry.group("unit")
+            seconds += (
+                float(entry.group("value"))
+                * _DURATION_UNITS[unit.lower() if unit else None]
+            )
+            end = entry.end()
+
+        if not value or end != len(value):
+            raise ValueError(value)
+
+        return seconds
+
+    return _to_float(value)
+
+
+def _to_bytes(value):
+    if isinstance(value, string_types):
+        entry = RE_BYTES.match(value)
+
+        if entry is None:
+            raise ValueError(value)
+
+        base = 1024 if entry.group("binary") else 1000
+        power = _BYTES_UNITS[entry.group("unit").lower()]
+
+        return int(float(entry.group("value")) * base**power)
+
+    return _to_int(value)
+
+
+# conversions of typed getters and schema types
+_CONVERTERS = {
+    "int": _to_int,
+    "float": _to_float,
+    "bool": _to_bool,
+    "str": _to_str,
+    "list": _to_list,
+    "duration": _to_duration,
+    "bytes": _to_bytes,
+}
+
+
+class _CacheUnpickler(pickle.Unpickler):
+    """Unpickler restricted to types produced by YAML safe loader"""
+
+    def find_class(self, module, name):
+        if (module, name) in _CACHE_CLASSES:
+            return pickle.Unpickler.find_class(self, module, name)
+
+        raise pickle.UnpicklingError("%s.%s is not allowed" % (module, name))
+
+
+class _LazyFlatDict(object):
+    """Read-only view of nested configuration resolving dotted keys on demand"""
+
+    __slots__ = ("__tree", "__flat", "__resolved", "__indexes", "__flatten")
+
+    def __init__(self, tree, flatten):
+        """Create lazy view over nested configuration
+
+        :param dict tree: nested configuration
+        :param callable flatten: function to build flat dict from tree
+        """
+        self.__tree = tree  # type: dict
+        self.__flat = None  # type: dict
+        self.__resolved = {}  # type: dict
+        self.__indexes = {}  # type: dict
+        self.__flatten = flatten
+
+    def __child(self, node, name):
+        """Get child of dict or list node by name, same as flat key part
+
+        :param any node: dict or list
+        :param str name: key part
+        :return: any or _MISSING
+        """
+        if isinstance(node, dict):
+            if name in node:
+                return node[name]
+
+            # flat keys are built with str() from non string keys too, they are
+            # indexed once per node, so misses do not scan node again
+            index = self.__indexes.get(id(node))
+
+            if index is None:
+                index = {}
+
+                for key_, value_ in node.items():
+                    if not isinstance(key_, string_types):
+                        index.setdefault(str(key_), value_)
+
+                self.__indexes[id(node)] = index
+
+            return index.get(name, _MISSING)
+
+        elif isinstance(node, list) and name.isdigit() and str(int(name)) == name:
+            if int(name) < len(node):
+                return node[int(name)]
+
+        return _MISSING
+
+    def __walk(self, node, parts, start):
+        """Walk tree by key parts, names with '.' inside are checked as well
+
+        :param any node: current node
+        :param list parts: key split by '.'
+        :param int start: index of first not resolved part
+        :return: any or _MISSING
+        """
+        if start == len(parts):
+            return node
+
+        for end in range(start + 1, len(parts) + 1):
+            child = self.__child(node, ".".join(parts[start:end]))
+
+            if child is not _MISSING:
+                child = self.__walk(child, parts, end)
+
+                if child is not _MISSING:
+                    return child
+
+            # lists has only numeric keys without '.'
+            if isinstance(node, list):
+                break
+
+        return _MISSING
+
+    def __resolve(self, key):
+        """Resolve dotted key and cache found value
+
+        :param any key: flat key
+        :return: any or _MISSING
+        """
+        if self.__flat is not None:
+            return self.__flat.get(key, _MISSING)
+
+        value = self.__resolved.get(key, _MISSING)
+
+        if value is _MISSING and isinstance(key, string_types):
+            value = self.__walk(self.__tree, key.split("."), 0)
+
+            if value is not _MISSING:
+                self.__resolved[key] = value
+
+        return value
+
+    def materialize(self):
+        """Build flat dict for whole tree
+
+        :return: dict
+        """
+        if self.__flat is None:
+            self.__flat = self.__flatten(self.__tree)
+            self.__resolved = {}
+            self.__indexes = {}
+
+        return self.__flat
+
+    def get(self, key, default=None):
+        value = self.__resolve(key)
+
+        return default if value is _MISSING else value
+
+    def keys(self):
+        return self.materialize().keys()
+
+    def items(self):
+        return self.materialize().items()
+
+    def copy(self):
+        return self.materialize().copy()
+
+    def __contains__(self, key):
+        return self.__resolve(key) is not _MISSING
+
+    def __getitem__(self, key):
+        value = self.__resolve(key)
+
+        if value is _MISSING:
+            raise KeyError(key)
+
+        return value
+
+
+class _LayeredDict(object):
+    """Read-only view of several mappings, first mapping with key wins"""
+
+    __slots__ = ("maps",)
+
+    def __init__(self, maps):
+        """Create view over mappings
+
+        :param tuple maps: mappings from highest to lowest precedence
+        """
+        self.maps = maps  # type: tuple
+
+    def __lookup(self, key):
+        """Find key in mappings
+
+        :param any key: key
+        :return: any or _MISSING
+        """
+        for mapping in self.maps:
+            value = mapping.get(key, _MISSING)
+
+            if value is _DELETED:
+                break
+
+            if value is not _MISSING:
+                return value
+
+        return _MISSING
+
+    def materialize(self):
+        """Merge all mappings into one dict
+
+        :return: dict
+        """
+        merged = {}
+
+        for mapping in reversed(self.maps):
+            merged.update(
+                mapping.materialize()
+                if isinstance(mapping, (_LazyFlatDict, _EnvironSnapshot))
+                else mapping
+            )
+
+        return dict(
+            (key, value) for key, value in merged.items() if value is not _DELETED
+        )
+
+    def get(self, key, default=None):
+        value = self.__lookup(key)
+
+        return default if value is _MISSING else value
+
+    def keys(self):
+        return self.materialize().keys()
+
+    def items(self):
+        return self.materialize().items()
+
+    def copy(self):
+        return self.materialize()
+
+    def __contains__(self, key):
+        return self.__lookup(key) is not _MISSING
+
+    def __getitem__(self, key):
+        value = self.__lookup(key)
+
+        if value is _MISSING:
+            raise KeyError(key)
+
+        return value
+
+
+def _identity(value):
+    return value
+
+
+class _EnvironSnapshot(object):
+    """Read-only copy of process environment taken on construction. Encoded entries
+    of os.environ are copied at once and decoded only when read, which costs much
+    less than decoding whole environment."""
+
+    __slots__ = ("__data", "__encode_key", "__decode_key", "__decode_value")
+
+    def __init__(self, environ=None):
+        """Copy environment
+
+        :param os._Environ environ: environment mapping, os.environ by default
+        """
+        environ = os.environ if environ is None else environ
+
+        # python 3 keeps encoded entries in dict
+        if hasattr(environ, "_data") and hasattr(environ, "encodekey"):
+            self.__data = dict(environ._data)  # type: dict
+            self.__encode_key = environ.encodekey
+            self.__decode_key = environ.decodekey
+            self.__decode_value = environ.decodevalue
+        else:
+            self.__data = dict(environ)  # type: dict
+            self.__encode_key = self.__decode_key = self.__decode_value = _identity
+
+    def materialize(self):
+        """Decode all entries into one dict
+
+        :return: dict
+        """
+        return dict(
+            (self.__decode_key(key), self.__decode_value(value))
+            for key, value in self.__data.items()
+        )
+
+    def get(self, key, default=None):
+        # environment has only string names
+        if not isinstance(key, string_types):
+            return default
+
+        value = self.__data.get(self.__encode_key(key), _MISSING)
+
+        return default if value is _MISSING else self.__decode_value(value)
+
+    def keys(self):
+        return self.materialize().keys()
+
+    def copy(self):
+        return self.materialize()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+
+        if value is _MISSING:
+            raise KeyError(key)
+
+        return value
+
+    def __len__(self):
+        return len(self.__data)
+
+
+class _FrozenDict(object):
+    """Compact read-only flat config for forked workers. Keys and scalar values are
+    serialized into one buffer and found by crc32 hashes kept in array, so reading
+    them does not change reference counts of shared objects and memory pages of
+    config stay shared with master process. Dicts, lists and other values are kept
+    as is."""
+
+    __slots__ = ("__hashes", "__positions", "__offsets", "__data", "__objects")
+
+    def __init__(self, mapping):
+        """Create storage from flat config
+
+        :param dict mapping: flat config
+        """
+        keys = list(mapping.keys())
+        entries = []
+        objects = []
+        offsets = array("L", [0])
+
+        for key in keys:
+            value = mapping[key]
+            entry = None
+
+            if not isinstance(value, (dict, list)):
+                try:
+                    entry = marshal.dumps((key, value))
+                except ValueError:
+                    pass
+
+            # values which could not be serialized are referenced by index
+            if entry is None:
+                entry = marshal.dumps((key, None, len(objects)))
+                objects.append(value)
+
+            entries.append(entry)
+            offsets.append(offsets[-1] + len(entry))
+
+        # hashes are sorted, positions keep order of entries
+        hashes = sorted(
+            (self.__hash(key), position) for position, key in enumerate(keys)
+        )
+
+        # crc32 fits unsigned long on every platform
+        self.__hashes = array("L", [entry[0] for entry in hashes])
+        self.__positions = array("L", [entry[1] for entry in hashes])
+        self.__offsets = offsets
+        self.__data = b"".join(entries)
+        self.__objects = tuple(objects)
+
+    @staticmethod
+    def __hash(key):
+        """Hash of key which is same in every process, so storage could be shared
+
+        :param str key: key
+        :return: int
+        """
+        return zlib.crc32(key.encode("utf8", "surrogatepass")) & 0xFFFFFFFF
+
+    def __entry(self, position):
+        """Read key and value of entry
+
+        :param int position: position of entry
+        :return: (key, value)
+        """
+        entry = marshal.loads(
+            self.__data[self.__offsets[position] : self.__offsets[position + 1]]
+        )
+
+        if len(entry) == 3:
+            return entry[0], self.__objects[entry[2]]
+
+        return entry
+
+    def __find(self, key):
+        """Find value of key
+
+        :param any key: key
+        :return: any or _MISSING
+        """
+        # keys of flat config are strings
+        if not isinstance(key, string_types):
+            return _MISSING
+
+        key_hash = self.__hash(key)
+
+        index = bisect_left(self.__hashes, key_hash)
+
+        while index < len(self.__hashes) and self.__hashes[index] == key_hash:
+            name, value = self.__entry(self.__positions[index])
+
+            if name == key:
+                return value
+
+            index += 1
+
+        return _MISSING
+
+    def get(self, key, default=None):
+        value = self.__find(key)
+
+        return default if value is _MISSING else value
+
+    def keys(self):
+        return [key for key, _ in self.items()]
+
+    def items(self):
+        return [self.__entry(position) for position in range(len(self))]
+
+    def copy(self):
+        return dict(self.items())
+
+    def __contains__(self, key):
+        return self.__find(key) is not _MISSING
+
+    def __getitem__(self, key):
+        value = self.__find(key)
+
+        if value is _MISSING:
+            raise KeyError(key)
+
+        return value
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.__offsets) - 1
+
+
+class _ConfigObject(object):
+    """Base of generated read-only objects with config values as attributes"""
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Config object is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError("Config object is read-only")
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "%s(%s)" % (
+            type(self).__name__,
+            ", ".join("%s=%r" % (name, getattr(self, name)) for name in self.__slots__),
+        )
+
+
+# generated classes by their attributes names, dicts with same keys share class
+_OBJECT_CLASSES = {}  # type: dict
+
+
+# tag of plain scalars with variables, resolved after variables are substituted
+_IMPLICIT_TAG = "tag:envyaml,2021:implicit"
+
+
+class _ScalarInterpolation(object):
+    """Loader mixin which substitutes variables into scalars of composed document,
+    text of scalars without "$" is never scanned"""
+
+    # callable to substitute variables into scalar value, set for every parser
+    envyaml_render = None
+
+    def resolve(self, kind, value, implicit):
+        if kind is ScalarNode and implicit[0] and "$" in value:
+            return _IMPLICIT_TAG
+
+        return Resolver.resolve(self, kind, value, implicit)
+
+    def construct_document(self, node):
+        stack = [node]
+        visited = set()
+
+        while stack:
+            item = stack.pop()
+
+            # nodes under anchors are reached once per alias
+            if id(item) in visited:
+                continue
+
+            if isinstance(item, ScalarNode):
+                if "$" in item.value:
+                    visited.add(id(item))
+                    plain = item.tag == _IMPLICIT_TAG
+                    item.value, implicit = self.envyaml_render(item.value, plain)
+
+                    if plain:
+                        item.tag = Resolver.resolve(
+                            self, ScalarNode, item.value, (implicit, True)
+                        )
+
+            elif isinstance(item, SequenceNode):
+                visited.add(id(item))
+                stack.extend(item.value)
+
+            else:
+                visited.add(id(item))
+
+                for key, value in item.value:
+                    stack.append(key)
+                    stack.append(value)
+
+        return super(_ScalarInterpolation, self).construct_document(node)
+
+
+# loaders with scalar interpolation by base loader class
+_SCALAR_LOADERS = {}  # type: dict
+
+# high resolution clock, python 2 has only time
+_timer = getattr(time, "perf_counter", time.time)
+
+# profile of config loaded by current thread
+_profiling = threading.local()
+
+
+class _Profile(object):
+    """Durations of loading stages in seconds and counters of one load"""
+
+    __slots__ = ("stages", "counts", "__lock")
+
+    def __init__(self):
+        self.stages = {}  # type: dict
+        self.counts = {}  # type: dict
+        self.__lock = threading.Lock()
+
+    def add_time(self, stage, seconds):
+        # stages of several files are measured in different threads
+        with self.__lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add(self, name, value=1):
+        with self.__lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def report(self):
+        with self.__lock:
+            return {"stages": dict(self.stages), "counts": dict(self.counts)}
+
+
+class _Stage(object):
+    """Context manager adding its duration to profile"""
+
+    __slots__ = ("profile", "name", "start")
+
+    def __init__(self, profile, name):
+        self.profile = profile  # type: _Profile
+        self.name = name  # type: str
+        self.start = 0.0  # type: float
+
+    def __enter__(self):
+        self.start = _timer()
+
+        return self
+
+    def __exit__(self, *args):
+        self.profile.add_time(self.name, _timer() - self.start)
+
+
+class _NoStage(object):
+    """Context manager used when profile is disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+def _stage(name):
+    profile = getattr(_profiling, "profile", None)
+
+    return _NO_STAGE if profile is None else _Stage(profile, name)
+
+
+def _count(name, value=1):
+    profile = getattr(_profiling, "profile", None)
+
+    if profile is not None:
+        profile.add(name, value)
+
+
+class _AccessCounter(object):
+    """Config view counting reads of every key"""
+
+    __slots__ = ("cfg", "counts")
+
+    def __init__(self, cfg, counts):
+        """Create view over config
+
+        :param dict cfg: config
+        :param dict counts: number of reads by keys
+        """
+        self.cfg = cfg
+        self.counts = counts  # type: dict
+
+    def get(self, key, default=None):
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+        return self.cfg.get(key, default)
+
+    def keys(self):
+        return self.cfg.keys()
+
+    def copy(self):
+        return self.cfg.copy()
+
+    def __contains__(self, key):
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+        return key in self.cfg
+
+    def __getitem__(self, key):
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+        return self.cfg[key]
+
+
+class _Flight(object):
+    """Load of shared instance, callers of same name wait for its result"""
+
+    __slots__ = ("done", "instance", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.instance = None
+        self.error = None
+
+
+# length of pickled snapshot sent by config server
+_FRAME_HEADER = struct.Struct(">Q")
+
+# pickle protocol of snapshots, every supported python version reads it
+_FRAME_PROTOCOL = 2
+
+
+def _send_frame(connection, payload):
+    """Send length of payload and payload
+
+    :param socket.socket connection: connected socket
+    :param bytes payload: pickled snapshot
+    """
+    connection.sendall(_FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exactly(connection, size, stop):
+    """Receive given number of bytes
+
+    :param socket.socket connection: connected socket
+    :param int size: number of bytes
+    :param threading.Event stop: event to stop waiting, timeouts are raised when None
+    :return: bytes or None when connection closed or stopped
+    """
+    chunks = []
+
+    while size:
+        try:
+            chunk = connection.recv(min(size, 1 << 20))
+        except socket.timeout:
+            if stop is None:
+                raise
+
+            if stop.is_set():
+                return None
+
+            continue
+
+        if not chunk:
+            return None
+
+        chunks.append(chunk)
+        size -= len(chunk)
+
+    return b"".join(chunks)
+
+
+def _recv_frame(connection, stop):
+    """Receive snapshot sent by config server, only types produced by YAML safe loader
+    are unpickled
+
+    :param socket.socket connection: connected socket
+    :param threading.Event stop: event to stop waiting, timeouts are raised when None
+    :return: dict or None when connection closed or stopped
+    """
+    header = _recv_exactly(connection, _FRAME_HEADER.size, stop)
+
+    if header is None:
+        return None
+
+    payload = _recv_exactly(connection, _FRAME_HEADER.unpack(header)[0], stop)
+
+    if payload is None:
+        return None
+
+    return _CacheUnpickler(io.BytesIO(payload)).load()
+
+
+class _ConfigClient(object):
+    """Connected process of config server, newest snapshot is sent to it in own
+    thread, so client which does not read delays nobody else"""
+
+    def __init__(self, connection, on_close):
+        """Start sending thread
+
+        :param socket.socket connection: connected socket
+        :param callable on_close: called with client when it is disconnected
+        """
+        self.__connection = connection
+        self.__on_close = on_close
+        self.__frame = None
+        self.__closed = False
+        self.__condition = threading.Condition()
+
+        thread = threading.Thread(target=self.__run, name="envyaml-serve-client")
+        thread.daemon = True
+        thread.start()
+
+    def send(self, frame):
+        """Send snapshot, snapshot which was not sent yet is replaced
+
+        :param bytes frame: pickled snapshot
+        """
+        with self.__condition:
+            self.__frame = frame
+            self.__condition.notify()
+
+    def close(self):
+        """Disconnect client, blocked sending is interrupted"""
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify()
+
+        try:
+            self.__connection.shutdown(socket.SHUT_RDWR)
+        except (socket.error, OSError):
+            pass
+
+    def __run(self):
+        """Send snapshots until client is closed or could not receive them"""
+        while True:
+            with self.__condition:
+                while self.__frame is None and not self.__closed:
+                    self.__condition.wait()
+
+                if self.__closed:
+                    break
+
+                frame, self.__frame = self.__frame, None
+
+            try:
+                _send_frame(self.__connection, frame)
+            except (socket.error, OSError):
+                break
+
+        self.__connection.close()
+        self.__on_close(self)
+
+
+class _ConfigServer(object):
+    """Publishes snapshots of config to local processes over Unix socket, created by
+    EnvYAML.serve"""
+
+    # seconds to wait for client which does not read
+    SEND_TIMEOUT = 5.0  # type: float
+
+    def __init__(self, instance, socket_path, snapshot):
+        """Bind socket and start accepting clients in background thread
+
+        :param EnvYAML instance: published instance
+        :param str socket_path: path of Unix socket
+        :param callable snapshot: function which returns snapshot of current config
+        """
+        self.instance = instance
+        self.socket_path = socket_path
+        self.version = 0
+        self.__snapshot = snapshot
+        self.__frame = None
+        self.__clients = []
+        self.__lock = threading.Lock()
+        self.__closed = threading.Event()
+
+        self.publish()
+
+        # socket file left by stopped server is replaced
+        if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+            try:
+                probe.connect(socket_path)
+            except socket.error:
+                os.remove(socket_path)
+            else:
+                raise RuntimeError(
+                    "EnvYAML server is already running on %s" % socket_path
+                )
+            finally:
+                probe.close()
+
+        self.__listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__listener.bind(socket_path)
+        self.__listener.listen(128)
+
+        # accept is interrupted regularly to check if server is closed
+        self.__listener.settimeout(0.1)
+
+        self.__thread = threading.Thread(target=self.__accept, name="envyaml-serve")
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def publish(self):
+        """Send new version of config to all connected processes"""
+        snapshot = self.__snapshot()
+
+        with self.__lock:
+            self.version += 1
+            snapshot["version"] = self.version
+            self.__frame = pickle.dumps(snapshot, _FRAME_PROTOCOL)
+
+            for client in self.__clients:
+                client.send(self.__frame)
+
+    def wait(self, timeout=None):
+        """Wait until server is closed
+
+        :param float timeout: seconds to wait, forever when None
+        :return: bool True when server is closed
+        """
+        return self.__closed.wait(timeout)
+
+    def close(self):
+        """Stop accepting clients, disconnect them and remove socket file"""
+        if self.__closed.is_set():
+            return
+
+        self.__closed.set()
+        self.instance.unwatch()
+
+        if self.__thread is not threading.current_thread():
+            self.__thread.join()
+
+        self.__listener.close()
+
+        with self.__lock:
+            clients, self.__clients = self.__clients, []
+
+        for client in clients:
+            client.close()
+
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def __remove(self, client):
+        """Forget disconnected client
+
+        :param _ConfigClient client: disconnected client
+        """
+        with self.__lock:
+            if client in self.__clients:
+                self.__clients.remove(client)
+
+    def __accept(self):
+        """Accept clients and send them current snapshot"""
+        while not self.__closed.is_set():
+            try:
+                client, _ = self.__listener.accept()
+            except socket.timeout:
+                continue
+            except (socket.error, OSError):
+                break
+
+            client.settimeout(self.SEND_TIMEOUT)
+            client = _ConfigClient(client, self.__remove)
+
+            with self.__lock:
+                self.__clients.append(client)
+                client.send(self.__frame)
+
+
+class EnvYAML(object):
+    __version__ = __version__
+
+    ENVYAML_STRICT_DISABLE = "ENVYAML_STRICT_DISABLE"  # type: str
+    DEFAULT_ENV_YAML_FILE = "env.yaml"  # type:str
+    DEFAULT_ENV_FILE = ".env"  # type:str
+    DEFAULT_SOCKET_FILE = "envyaml.sock"  # type: str
+    DEFAULT_YAML_LOADER = "auto"  # type: str
+    CACHE_SIZE = 128  # type: int
+    MAX_WORKERS = 8  # type: int
+
+    __env_file = None  # type:str
+    __yaml_file = None  # type: str
+    __cfg = None  # type: dict
+    __strict = True  # type: bool
+    __variables = frozenset()  # type: frozenset
+    __options = None  # type: dict
+    __watcher = None  # type: tuple
+    __environment = None  # type: _LayeredDict
+    __templates = ()  # type: tuple
+    __yaml = None  # type: dict
+    __yaml_cfg = None  # type: dict
+    __yaml_changes = None  # type: dict
+    __loader = None  # type: type
+    __flatten = True  # type: bool
+    __dependencies = None  # type: dict
+    __lock = None  # type: threading.RLock
+    __schema = None  # type: dict
+    __typed = None  # type: dict
+    __objects = None  # type: dict
+    __profile = None  # type: _Profile
+    __accesses = None  # type: dict
+    __frozen = False  # type: bool
+    __cached = False  # type: bool
+    __config_version = None  # type: int
+
+    # process wide cache of shared instances
+    __cache = OrderedDict()  # type: OrderedDict
+    __cache_lock = threading.Lock()
+
+    # process wide registry of named instances and their loads in progress
+    __shared = {}  # type: dict
+    __flights = {}  # type: dict
+    __shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        yaml_file=None,
+        env_file=None,
+        include_environment=True,
+        strict=True,
+        flatten=True,
+        loader=None,
+        cache_dir=None,
+        cache_config=False,
+        schema=None,
+        profile=False,
+        interpolate="text",
+        **kwargs
+    ):
+        """Create EnvYAML class instance and read content from environment and files if they exists
+
+        :param str|list yaml_file: file path for config or env.yaml by default, list of files is merged in order
+        :param str|list env_file: file path for .env file or None by default, list of files is merged in order
+        :param bool include_environment: include environment variable, by default true
+        :param bool strict: use strict mode and throw exception when have unset variable, by default true
+        :param bool|str flatten: whether we should flatten config hierarchy or not, "lazy" to resolve keys on demand
+        :param str loader: YAML loader "c", "python" or "auto" to use LibYAML when available, by default "auto"
+        :param bool|str cache_dir: directory for compiled cache files, True to store them next to yaml file
+        :param bool cache_config: store parsed config with values of variables in compiled cache file too
+        :param dict schema: keys and their types "int", "float", "bool", "str", "list", "duration" or "bytes"
+        :param bool|callable profile: collect durations of loading stages, counters and reads of keys, callable is called with report after every load
+        :param str interpolate: "text" to substitute variables into yaml text, "scalar" into parsed scalars only, by default "text"
+        :param dict kwargs: additional environment variables keys and values
+        :return: new instance of EnvYAML
+        """
+        # raise exception module not found when no pyyaml installed
+        if SafeLoader is None:
+            raise ModuleNotFoundError(
+                'EnvYAML require "pyyaml >= 5" module to work. '
+                "Consider install this module into environment!"
+            )
+
+        # arguments to read config again on reload
+        self.__options = dict(
+            yaml_file=yaml_file,
+            env_file=env_file,
+            include_environment=include_environment,
+            strict=strict,
+            flatten=flatten,
+            loader=loader,
+            cache_dir=cache_dir,
+            cache_config=cache_config,
+            schema=schema,
+            profile=profile,
+            interpolate=interpolate,
+            kwargs=kwargs,
+        )
+
+        report = _Profile() if profile else None
+
+        if profile:
+            self.__accesses = {}
+
+        # stages are collected by thread which loads config
+        _profiling.profile = report
+
+        try:
+            with _stage("total"):
+                # snapshot of environment is lowest layer
+                environ = _EnvironSnapshot() if include_environment else {}
+
+                # set strict mode to false if "ENVYAML_STRICT_DISABLE" presents in env else use "strict" from function
+                strict = False if self.ENVYAML_STRICT_DISABLE in environ else strict
+
+                # default file names
+                self.__env_file = env_file
+                self.__yaml_file = yaml_file
+
+                # environment variables referenced by .env and yaml files
+                variables = set()
+
+                # read .env files
+                env_config = self.__read_env_files(
+                    self.__get_file_paths(env_file, "ENV_FILE", self.DEFAULT_ENV_FILE),
+                    strict,
+                    variables,
+                    environ if include_environment else None,
+                )
+
+                # kwargs have precedence over .env file and environment
+                environment = _LayeredDict((kwargs, env_config, environ))
+
+                loader = self.__get_loader(
+                    loader or self.DEFAULT_YAML_LOADER, interpolate
+                )
+
+                # read yaml files, parse and merge them
+                templates, yaml_config = self.__read_yaml_files(
+                    self.__get_file_paths(
+                        yaml_file, "ENV_YAML_FILE", self.DEFAULT_ENV_YAML_FILE
+                    ),
+                    environment,
+                    strict,
+                    loader,
+                    variables,
+                    cache_dir,
+                    cache_config,
+                )
+
+                self.__setup(
+                    environment,
+                    strict,
+                    templates,
+                    yaml_config,
+                    loader,
+                    flatten,
+                    variables,
+                    schema,
+                )
+        finally:
+            _profiling.profile = None
+
+        self.__profile = report
+
+        if callable(profile):
+            profile(report.report())
+
+    def __setup(
+        self,
+        environment,
+        strict,
+        templates,
+        yaml_config,
+        loader,
+        flatten,
+        variables,
+        schema=None,
+    ):
+        """Set instance state and build config, config is validated before any state is set
+
+        :param _LayeredDict environment: configuration variables (kwargs, .env and environ)
+        :param bool strict: strict mode
+        :param tuple templates: compiled yaml files
+        :param dict|list yaml_config: parsed yaml file
+        :param type loader: YAML loader class
+        :param bool|str flatten: whether we should flatten config hierarchy or not, "lazy" to resolve keys on demand
+        :param set variables: names of variables referenced by yaml and .env files
+        :param dict schema: keys and their types
+        """
+        with _stage("flatten"):
+            yaml_cfg = self.__build_config(yaml_config, flatten)
+
+        cfg = self.__build_layers(yaml_cfg, environment, flatten)
+
+        with _stage("validate"):
+            typed = self.__validate(cfg, schema)
+
+        if self.__accesses is not None:
+            cfg = _AccessCounter(cfg, self.__accesses)
+
+        self.__environment = environment
+        self.__strict = strict
+        self.__templates = templates
+        self.__yaml = yaml_config
+        self.__yaml_changes = None
+        self.__loader = loader
+        self.__flatten = flatten
+        self.__variables = frozenset(variables)
+        self.__schema = schema
+        self.__typed = typed
+        self.__objects = {}
+        self.__dependencies = None
+
+        if self.__lock is None:
+            self.__lock = threading.RLock()
+
+        self.__yaml_cfg = yaml_cfg
+
+        # config is replaced at once, so readers never see partially built one
+        self.__cfg = cfg
+
+    @staticmethod
+    def __build_config(yaml_config, flatten):
+        """Flatten parsed yaml file
+
+        :param dict|list yaml_config: parsed yaml file
+        :param bool|str flatten: whether we should flatten config hierarchy or not, "lazy" to resolve keys on demand
+        :return: dict
+        """
+        if isinstance(yaml_config, list):
+            yaml_config = {k: v for k, v in enumerate(yaml_config)}
+
+        # resolve keys with '.' only when requested
+        if flatten == "lazy":
+            return _LazyFlatDict(yaml_config, EnvYAML.__flat)
+
+        # make config as flat dict with '.'
+        elif flatten:
+            yaml_config = EnvYAML.__flat(yaml_config)
+
+        _count("keys", len(yaml_config))
+
+        return yaml_config
+
+    @staticmethod
+    def __build_layers(yaml_cfg, environment, flatten):
+        """Put yaml config over environment layers
+
+        :param dict yaml_cfg: flattened yaml config
+        :param _LayeredDict environment: configuration variables (kwargs, .env and environ)
+        :param bool|str flatten: whether we should flatten config hierarchy or not, "lazy" to resolve keys on demand
+        :return: dict or _LayeredDict
+        """
+        kwargs, env_config, environ = environment.maps
+
+        # kwargs could have nested values
+        if flatten and kwargs:
+            kwargs = EnvYAML.__flat(kwargs)
+
+        # values changed by update_env are layer over previous yaml config
+        yaml_layers = (
+            yaml_cfg.maps if isinstance(yaml_cfg, _LayeredDict) else (yaml_cfg,)
+        )
+
+        layers = tuple(
+            layer for layer in yaml_layers + (kwargs, env_config, environ) if layer
+        )
+
+        # single layer is used as is
+        if len(layers) == 1 and layers[0] is yaml_cfg:
+            return yaml_cfg
+
+        return _LayeredDict(layers or ({},))
+
+    @classmethod
+    def compile(
+        cls,
+        yaml_file=None,
+        env_file=None,
+        include_environment=True,
+        strict=True,
+        flatten=True,
+        loader=None,
+        schema=None,
+        interpolate="text",
+    ):
+        """Read yaml and .env files once and compile them into template, which could be
+        rendered against many environments without file reading and variables search.
+
+        :param str|list yaml_file: file path for config or env.yaml by default, list of files is merged in order
+        :param str|list env_file: file path for .env file or None by default, list of files is merged in order
+        :param bool include_environment: include environment variable, by default true
+        :param bool strict: use strict mode and throw exception when have unset variable, by default true
+        :param bool|str flatten: whether we should flatten config hierarchy or not, "lazy" to resolve keys on demand
+        :param str loader: YAML loader "c", "python" or "auto" to use LibYAML when available, by default "auto"
+        :param dict schema: keys and their types "int", "float", "bool", "str", "list", "duration" or "bytes"
+        :param str interpolate: "text" to substitute variables into yaml text, "scalar" into parsed scalars only, by default "text"
+        :return: EnvYAMLTemplate
+        """
+        if SafeLoader is None:
+            raise ModuleNotFoundError(
+                'EnvYAML require "pyyaml >= 5" module to work. '
+                "Consider install this module into environment!"
+            )
+
+        variables = set()
+
+        # .env values are expanded against environment of every render
+        env_config, env_defined = cls.__load_env_files(
+            cls.__get_file_paths(env_file, "ENV_FILE", cls.DEFAULT_ENV_FILE)
+        )
+
+        for names in cls.__get_env_references(env_config).values():
+            variables.update(names)
+
+        loader = cls.__get_loader(loader or cls.DEFAULT_YAML_LOADER, interpolate)
+
+        def read(file_path):
+            with io.open(file_path, encoding="utf8") as f:
+                content = f.read()
+
+            if issubclass(loader, _ScalarInterpolation):
+                # variables are found in scalars by parsing without substitution
+                pieces = []
+                cls.__load_template([content], {}, False, loader, pieces)
+
+                return [content] + pieces
+
+            return cls.__compile_template(RE_COMMENTS.sub("", content))
+
+        templates = tuple(
+            cls.__map(
+                read,
+                cls.__get_file_paths(
+                    yaml_file, "ENV_YAML_FILE", cls.DEFAULT_ENV_YAML_FILE
+                ),
+            )
+        )
+
+        for template in templates:
+            variables.update(cls.__get_template_variables(template))
+
+        return EnvYAMLTemplate(
+            cls.__render,
+            templates,
+            env_config,
+            frozenset(variables),
+            include_environment,
+            strict,
+            flatten,
+            loader,
+            schema,
+            frozenset(env_defined),
+        )
+
+    @classmethod
+    def __render(cls, compiled, env, kwargs):
+        """Create EnvYAML instance from compiled template
+
+        :param EnvYAMLTemplate compiled: compiled template
+        :param dict env: environment variables, os.environ when None
+        :param dict kwargs: additional environment variables keys and values
+        :return: new instance of EnvYAML
+        """
+        instance = cls.__new__(cls)
+
+        # given environment replaces os.environ, also in values of .env files
+        if env is None:
+            environ = _EnvironSnapshot()
+            env = environ if compiled.include_environment else {}
+        else:
+            environ = env
+
+        strict = False if cls.ENVYAML_STRICT_DISABLE in env else compiled.strict
+
+        env_config = cls.__expand_env_files(
+            compiled.env_config, compiled.env_defined, strict, None, environ
+        )
+
+        environment = _LayeredDict((kwargs, env_config, env))
+
+        instance.__setup(
+            environment,
+            strict,
+            compiled.templates,
+            cls.__load_templates(
+                compiled.templates, environment, strict, compiled.loader
+            ),
+            compiled.loader,
+            compiled.flatten,
+            compiled.variables,
+            compiled.schema,
+        )
+
+        return instance
+
+    @classmethod
+    def iter_documents(
+        cls,
+        yaml_file=None,
+        env_file=None,
+        include_environment=True,
+        strict=True,
+        flatten=True,
+        loader=None,
+        **kwargs
+    ):
+        """Read yaml file document by document. File is parsed as stream, variables are
+        substituted into scalars of every document once it is composed and only one
+        document is kept in memory at a time. Value of variable is always single
+        scalar, it could not inject new keys or lists as with whole file substitution.
+
+        :param str|file yaml_file: file path for config or env.yaml by default, or opened file
+        :param str|list env_file: file path for .env file or None by default, list of files is merged in order
+        :param bool include_environment: include environment variable, by default true
+        :param bool strict: use strict mode and throw exception when have unset variable, by default true
+        :param bool|str flatten: whether we should flatten config hierarchy or not, "lazy" to resolve keys on demand
+        :param str loader: YAML loader "c", "python" or "auto" to use LibYAML when available, by default "auto"
+        :param dict kwargs: additional environment variables keys and values
+        :return: iterator over configs of documents
+        """
+        # raise exception module not found when no pyyaml installed
+        if SafeLoader is None:
+            raise ModuleNotFoundError(
+                'EnvYAML require "pyyaml >= 5" module to work. '
+                "Consider install this module into environment!"
+            )
+
+        environ = _EnvironSnapshot() if include_environment else {}
+
+        strict = False if cls.ENVYAML_STRICT_DISABLE in environ else strict
+
+        env_config = cls.__read_env_files(
+            cls.__get_file_paths(env_file, "ENV_FILE", cls.DEFAULT_ENV_FILE),
+            strict,
+            None,
+            environ if include_environment else None,
+        )
+
+        # kwargs have precedence over .env file and environment
+        environment = _LayeredDict((kwargs, env_config, environ))
+
+        scalar_loader = cls.__get_loader(loader or cls.DEFAULT_YAML_LOADER, "scalar")
+
+        # variables found in scalars of current document and not defined ones
+        pieces = []
+        not_found = set()
+
+        if hasattr(yaml_file, "read"):
+            stream = yaml_file
+        else:
+            file_path = cls.__get_file_path(
+                yaml_file, "ENV_YAML_FILE", cls.DEFAULT_ENV_YAML_FILE
+            )
+
+            if not file_path:
+                return
+
+            stream = io.open(file_path, encoding="utf8")
+
+        try:
+            parser = scalar_loader(stream)
+            parser.envyaml_render = cls.__get_scalar_render(
+                environment, not_found, pieces
+            )
+
+            try:
+                while parser.check_data():
+                    document = parser.get_data()
+
+                    # strict mode
+                    if strict and not_found:
+                        raise ValueError(
+                            "Strict mode enabled, variables "
+                            + ", ".join(["$" + v for v in not_found])
+                            + " are not defined!"
+                        )
+
+                    if not document or not isinstance(document, (dict, list)):
+                        document = {}
+
+                    if cls.__has_references((pieces,), environment):
+                        document = cls.__resolve_references(document, strict)
+
+                    del pieces[:]
+
+                    yield cls.__build_config(document, flatten)
+            finally:
+                parser.dispose()
+        finally:
+            if stream is not yaml_file:
+                stream.close()
+
+    def get(self, key, default=None):
+        """Get configuration variable with default value. If no `default` value set use None
+
+        :param any key: name for the configuration key
+        :param any default: default value if no key found
+        :return: any
+        """
+
+        return self.__cfg.get(key, default)
+
+    def get_int(self, key, default=None):
+        """Get configuration value converted to int, conversion result is memoized
+
+        :param any key: name for the configuration key
+        :param any default: default value if no key found
+        :return: int
+        """
+        return self.__get_typed(key, "int", default)
+
+    def get_float(self, key, default=None):
+        """Get configuration value converted to float, conversion result is memoized
+
+        :param any key: name for the configuration key
+        :param any default: default value if no key found
+        :return: float
+        """
+        return self.__get_typed(key, "float", default)
+
+    def get_bool(self, key, default=None):
+        """Get configuration value converted to bool, strings 1, true, yes, y, on and
+        0, false, no, n, off or empty are accepted. Conversion result is memoized.
+
+        :param any key: name for the configuration key
+        :param any default: default value if no key found
+        :return: bool
+        """
+        return self.__get_typed(key, "bool", default)
+
+    def get_list(self, key, default=None):
+        """Get configuration value as list, strings are split by comma. Conversion result
+        is memoized, every call returns its copy.
+
+        :param any key: name for the configuration key
+        :param any default: default value if no key found
+        :return: list
+        """
+        value = self.__get_typed(key, "list", _MISSING)
+
+        # memoized list is shared by all calls, so caller could not change it
+        return default if value is _MISSING else list(value)
+
+    def get_duration(self, key, default=None):
+        """Get configuration value as seconds, strings like 1.5, 500ms or 1h30m with
+        us, ms, s, m, h, d and w units are accepted. Conversion result is memoized.
+
+        :param any key: name for the configuration key
+        :param any default: default value if no key found
+        :return: float
+        """
+        return self.__get_typed(key, "duration", default)
+
+    def get_bytes(self, key, default=None):
+        """Get configuration value as number of bytes, strings like 512, 10k, 1.5MB or
+        256Mi are accepted, units with i are powers of 1024. Conversion result is memoized.
+
+        :param any key: name for the configuration key
+        :param any default: default value if no key found
+        :return: int
+        """
+        return self.__get_typed(key, "bytes", default)
+
+    def __get_typed(self, key, kind, default):
+        """Get configuration value converted to type, conversion runs once per value
+
+        :param any key: name for the configuration key
+        :param str kind: type name
+        :param any default: default value if no key found
+        :return: any
+        """
+        value = self.__cfg.get(key, _MISSING)
+
+        if value is _MISSING:
+            return default
+
+        # environment values are decoded on every read, so memoized result is checked against value
+        memoized = self.__typed.get((kind, key))
+
+        if memoized is not None and (
+            memoized[0] is value
+            or isinstance(value, string_types)
+            and memoized[0] == value
+        ):
+            return memoized[1]
+
+        try:
+            converted = _CONVERTERS[kind](value)
+        except (ValueError, TypeError, KeyError):
+            raise ValueError('Value of "%s" could not be converted to %s' % (key, kind))
+
+        self.__typed[(kind, key)] = (value, converted)
+
+        return converted
+
+    @staticmethod
+    def __validate(cfg, schema):
+        """Check all schema keys at once and convert their values
+
+        :param dict cfg: configuration
+        :param dict schema: keys and their types
+        :return: dict of memoized conversions
+        """
+        typed = {}
+
+        if not schema:
+            return typed
+
+        missing = []
+        invalid = []
+
+        for key, kind in schema.items():
+            # python types could be used instead of names
+            kind = getattr(kind, "__name__", kind)
+
+            if kind not in _CONVERTERS:
+                raise ValueError('Unknown schema type "%s" of "%s"!' % (kind, key))
+
+            value = cfg.get(key, _MISSING)
+
+            if value is _MISSING:
+                missing.append(key)
+                continue
+
+            try:
+                typed[(kind, key)] = (value, _CONVERTERS[kind](value))
+            except (ValueError, TypeError, KeyError):
+                invalid.append("%s (%s)" % (key, kind))
+
+        EnvYAML.__raise_errors("Schema validation failed", missing, invalid)
+
+        return typed
+
+    @staticmethod
+    def __raise_errors(title, missing, invalid):
+        """Raise one exception for all missing and invalid keys
+
+        :param str title: beginning of message
+        :param list missing: not defined keys
+        :param list invalid: keys with their types
+        """
+        if missing or invalid:
+            errors = []
+
+            if missing:
+                errors.append("keys " + ", ".join(missing) + " are not defined")
+
+            if invalid:
+                errors.append("keys " + ", ".join(invalid) + " have wrong type")
+
+            raise ValueError(title + ", " + " and ".join(errors) + "!")
+
+    def to_object(self, cls=None):
+        """Build object with yaml config values as attributes, `env.to_object().database.host`.
+        Without cls nested dicts become generated read-only objects with __slots__ and
+        lists become tuples, keys which are not identifiers are skipped. With dataclass
+        nested dataclasses are bound to nested dicts and values converted same as
+        typed getters, type could be set by field metadata {"envyaml": "duration"}.
+        Object is built once for current config.
+
+        :param type cls: dataclass to bind config to
+        :return: object
+        """
+        objects = self.__objects
+        instance = objects.get(cls, _MISSING)
+
+        if instance is _MISSING:
+            if cls is None:
+                instance = self.__build_object(self.__get_yaml())
+            else:
+                missing = []
+                invalid = []
+
+                instance = self.__bind(cls, self.__get_yaml(), "", missing, invalid)
+
+                self.__raise_errors(
+                    "Binding to %s failed" % cls.__name__, missing, invalid
+                )
+
+            objects[cls] = instance
+
+        return instance
+
+    @staticmethod
+    def __build_object(node):
+        """Convert dicts into generated objects and lists into tuples
+
+        :param any node: config value
+        :return: any
+        """
+        if isinstance(node, list):
+            return tuple(EnvYAML.__build_object(value) for value in node)
+
+        if not isinstance(node, dict):
+            return node
+
+        values = {}
+
+        for key, value in node.items():
+            if isinstance(key, string_types):
+                name = re.sub(r"\W", "_", key)
+
+                # private names would be mangled in __slots__
+                if (
+                    name
+                    and not name[0].isdigit()
+                    and not name.startswith("__")
+                    and not keyword.iskeyword(name)
+                ):
+                    values.setdefault(name, value)
+
+        names = tuple(sorted(values))
+        cls = _OBJECT_CLASSES.get(names)
+
+        if cls is None:
+            cls = _OBJECT_CLASSES.setdefault(
+                names, type("EnvYAMLObject", (_ConfigObject,), {"__slots__": names})
+            )
+
+        instance = cls.__new__(cls)
+
+        for name in names:
+            object.__setattr__(instance, name, EnvYAML.__build_object(values[name]))
+
+        return instance
+
+    @staticmethod
+    def __bind(cls, node, prefix, missing, invalid):
+        """Create dataclass instance from dict, errors are collected for all fields
+
+        :param type cls: dataclass
+        :param dict node: config values
+        :param str prefix: dotted key of node
+        :param list missing: not defined keys
+        :param list invalid: keys with wrong types
+        :return: instance of cls or None when binding failed
+        """
+        if dataclasses is None or not dataclasses.is_dataclass(cls):
+            raise TypeError("%r is not a dataclass" % (cls,))
+
+        if not isinstance(node, dict):
+            invalid.append("%s (%s)" % (prefix[:-1] or "root", cls.__name__))
+            return None
+
+        hints = get_type_hints(cls)
+        values = {}
+
+        for field in dataclasses.fields(cls):
+            if not field.init:
+                continue
+
+            key = prefix + field.name
+            value = node.get(field.name, _MISSING)
+
+            if value is _MISSING:
+                if (
+                    field.default is dataclasses.MISSING
+                    and field.default_factory is dataclasses.MISSING
+                ):
+                    missing.append(key)
+
+                continue
+
+            kind = field.metadata.get("envyaml") or hints.get(field.name, field.type)
+
+            if dataclasses.is_dataclass(kind):
+                values[field.name] = EnvYAML.__bind(
+                    kind, value, key + ".", missing, invalid
+                )
+                continue
+
+            # typing.List[int] and similar
+            kind = getattr(kind, "__origin__", kind)
+            kind = getattr(kind, "__name__", kind)
+
+            if kind in _CONVERTERS:
+                try:
+                    value = _CONVERTERS[kind](value)
+                except (ValueError, TypeError, KeyError):
+                    invalid.append("%s (%s)" % (key, kind))
+                    continue
+
+            values[field.name] = value
+
+        if missing or invalid:
+            return None
+
+        return cls(**values)
+
+    @classmethod
+    def aload(
+        cls,
+        yaml_file=None,
+        env_file=None,
+        include_environment=True,
+        strict=True,
+        flatten=True,
+        loader=None,
+        cache_dir=None,
+        cache_config=False,
+        schema=None,
+        profile=False,
+        interpolate="text",
+        **kwargs
+    ):
+        """Create EnvYAML instance in default executor of running event loop, files are
+        read and parsed off the loop. Use as `env = await EnvYAML.aload('env.yaml')`.
+
+        :param str|list yaml_file: file path for config or env.yaml by default, list of files is merged in order
+        :param str|list env_file: file path for .env file or None by default, list of files is merged in order
+        :param bool include_environment: include environment variable, by default true
+        :param bool strict: use strict mode and throw exception when have unset variable, by default true
+        :param bool|str flatten: whether we should flatten config hierarchy or not, "lazy" to resolve keys on demand
+        :param str loader: YAML loader "c", "python" or "auto" to use LibYAML when available, by default "auto"
+        :param bool|str cache_dir: directory for compiled cache files, True to store them next to yaml file
+        :param bool cache_config: store parsed config with values of variables in compiled cache file too
+        :param dict schema: keys and their types "int", "float", "bool", "str", "list", "duration" or "bytes"
+        :param bool|callable profile: collect durations of loading stages, counters and reads of keys, callable is called with report after every load
+        :param str interpolate: "text" to substitute variables into yaml text, "scalar" into parsed scalars only, by default "text"
+        :param dict kwargs: additional environment variables keys and values
+        :return: asyncio.Future with new instance of EnvYAML
+        """
+        return cls.__run_in_executor(
+            lambda: cls(
+                yaml_file,
+                env_file,
+                include_environment=include_environment,
+                strict=strict,
+                flatten=flatten,
+                loader=loader,
+                cache_dir=cache_dir,
+                cache_config=cache_config,
+                schema=schema,
+                profile=profile,
+                interpolate=interpolate,
+                **kwargs
+            )
+        )
+
+    def areload(self):
+        """Reload config in default executor of running event loop, same as reload.
+        Use as `changed = await env.areload()`.
+
+        :return: asyncio.Future with set of added, removed or changed keys
+        """
+        return self.__run_in_executor(self.reload)
+
+    @staticmethod
+    def __run_in_executor(function):
+        """Run function in default executor of current event loop
+
+        :param callable function: function without arguments
+        :return: asyncio.Future
+        """
+        if asyncio is None:
+            raise RuntimeError("EnvYAML async API requires asyncio module")
+
+        # get_running_loop is available since python 3.7
+        get_loop = getattr(asyncio, "get_running_loop", asyncio.get_event_loop)
+
+        return get_loop().run_in_executor(None, function)
+
+    @classmethod
+    def cached(
+        cls,
+        yaml_file=None,
+        env_file=None,
+        include_environment=True,
+        strict=True,
+        flatten=True,
+        loader=None,
+        cache_dir=None,
+        cache_config=False,
+        schema=None,
+        profile=False,
+        interpolate="text",
+        **kwargs
+    ):
+        """Get shared EnvYAML instance from process wide cache, create and cache it when not found.
+
+        Instance is reused while files have same path, mtime, size and inode and environment
+        variables referenced from files have same values. Least recently used instances
+        are dropped when cache has more than `EnvYAML.CACHE_SIZE` entries. Shared instance
+        could not be reloaded or updated, next call of cached returns fresh one instead.
+
+        :param str|list yaml_file: file path for config or env.yaml by default, list of files is merged in order
+        :param str|list env_file: file path for .env file or None by default, list of files is merged in order
+        :param bool include_environment: include environment variable, by default true
+        :param bool strict: use strict mode and throw exception when have unset variable, by default true
+        :param bool|str flatten: whether we should flatten config hierarchy or not, "lazy" to resolve keys on demand
+        :param str loader: YAML loader "c", "python" or "auto" to use LibYAML when available, by default "auto"
+        :param bool|str cache_dir: directory for compiled cache files, True to store them next to yaml file
+        :param bool cache_config: store parsed config with values of variables in compiled cache file too
+        :param dict schema: keys and their types "int", "float", "bool", "str", "list", "duration" or "bytes"
+        :param bool|callable profile: collect durations of loading stages, counters and reads of keys, callable is called with report after every load
+        :param str interpolate: "text" to substitute variables into yaml text, "scalar" into parsed scalars only, by default "text"
+        :param dict kwargs: additional environment variables keys and values
+        :return: shared instance of EnvYAML
+        """
+        key = (
+            cls,
+            cls.__get_files_identity(yaml_file, env_file),
+            include_environment,
+            include_environment and cls.ENVYAML_STRICT_DISABLE in os.environ,
+            strict,
+            flatten,
+            loader or cls.DEFAULT_YAML_LOADER,
+            repr(sorted(kwargs.items())),
+            repr(sorted((schema or {}).items())),
+            profile,
+            interpolate,
+        )
+
+        with cls.__cache_lock:
+            entry = cls.__cache.get(key)
+
+            if entry is not None:
+                instance, fingerprint = entry
+
+                if fingerprint == cls.__get_fingerprint(instance, include_environment):
+                    # mark as recently used
+                    cls.__cache[key] = cls.__cache.pop(key)
+
+                    return instance
+
+        instance = cls(
+            yaml_file,
+            env_file,
+            include_environment=include_environment,
+            strict=strict,
+            flatten=flatten,
+            loader=loader,
+            cache_dir=cache_dir,
+            cache_config=cache_config,
+            schema=schema,
+            profile=profile,
+            interpolate=interpolate,
+            **kwargs
+        )
+
+        # other users of shared instance would see changes made in place
+        instance.__cached = True
+
+        with cls.__cache_lock:
+            cls.__cache.pop(key, None)
+            cls.__cache[key] = (
+                instance,
+                cls.__get_fingerprint(instance, include_environment),
+            )
+
+            # drop least recently used
+            while len(cls.__cache) > cls.CACHE_SIZE:
+                cls.__cache.popitem(last=False)
+
+        return instance
+
+    @classmethod
+    def cache_clear(cls):
+        """Remove all instances from process wide cache"""
+        with cls.__cache_lock:
+            cls.__cache.clear()
+
+    @classmethod
+    def shared(
+        cls,
+        name="default",
+        yaml_file=None,
+        env_file=None,
+        include_environment=True,
+        strict=True,
+        flatten=True,
+        loader=None,
+        cache_dir=None,
+        cache_config=False,
+        schema=None,
+        profile=False,
+        interpolate="text",
+        **kwargs
+    ):
+        """Get named instance from process wide registry, create and register it on first use.
+
+        Concurrent callers of same name wait for single load and get its instance or
+        exception, failed load is tried again by next call. Registered instance is
+        returned without locking and arguments of later calls are ignored, use reload
+        or update_env to change it.
+
+        :param str name: name of instance in registry
+        :param str|list yaml_file: file path for config or env.yaml by default, list of files is merged in order
+        :param str|list env_file: file path for .env file or None by default, list of files is merged in order
+        :param bool include_environment: include environment variable, by default true
+        :param bool strict: use strict mode and throw exception when have unset variable, by default true
+        :param bool|str flatten: whether we should flatten config hierarchy or not, "lazy" to resolve keys on demand
+        :param str loader: YAML loader "c", "python" or "auto" to use LibYAML when available, by default "auto"
+        :param bool|str cache_dir: directory for compiled cache files, True to store them next to yaml file
+        :param bool cache_config: store parsed config with values of variables in compiled cache file too
+        :param dict schema: keys and their types "int", "float", "bool", "str", "list", "duration" or "bytes"
+        :param bool|callable profile: collect durations of loading stages, counters and reads of keys, callable is called with report after every load
+        :param str interpolate: "text" to substitute variables into yaml text, "scalar" into parsed scalars only, by default "text"
+        :param dict kwargs: additional environment variables keys and values
+        :return: shared instance of EnvYAML
+        """
+        key = (cls, name)
+
+        # registered instance is never replaced, so it is read without lock
+        instance = cls.__shared.get(key)
+
+        if instance is not None:
+            return instance
+
+        with cls.__shared_lock:
+            instance = cls.__shared.get(key)
+
+            if instance is not None:
+                return instance
+
+            flight = cls.__flights.get(key)
+            leader = flight is None
+
+            if leader:
+                flight = cls.__flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+
+            if flight.error is not None:
+                raise flight.error
+
+            return flight.instance
+
+        try:
+            flight.instance = cls(
+                yaml_file,
+                env_file,
+                include_environment=include_environment,
+                strict=strict,
+                flatten=flatten,
+                loader=loader,
+                cache_dir=cache_dir,
+                cache_config=cache_config,
+                schema=schema,
+                profile=profile,
+                interpolate=interpolate,
+                **kwargs
+            )
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with cls.__shared_lock:
+                if flight.instance is not None:
+                    cls.__shared[key] = flight.instance
+
+                del cls.__flights[key]
+
+            flight.done.set()
+
+        return flight.instance
+
+    @classmethod
+    def shared_clear(cls, name=None):
+        """Remove named instance or all instances from process wide registry, loads in
+        progress are not affected
+
+        :param str name: name of instance, all instances when None
+        """
+        with cls.__shared_lock:
+            if name is None:
+                cls.__shared.clear()
+            else:
+                cls.__shared.pop((cls, name), None)
+
+    @classmethod
+    def preload(cls, name="default", gc_freeze=False, **kwargs):
+        """Load shared instance in master process before workers are forked and freeze
+        it, workers get it by `EnvYAML.shared(name)` and share its memory copy-on-write.
+
+        :param str name: name of instance in registry
+        :param bool gc_freeze: move all objects of process to permanent generation of garbage collector
+        :param dict kwargs: arguments of EnvYAML and additional environment variables keys and values
+        :return: frozen shared instance of EnvYAML
+        """
+        return cls.shared(name, **kwargs).freeze(gc_freeze)
+
+    def freeze(self, gc_freeze=False):
+        """Replace flat config by compact read-only storage, config could not be
+        reloaded or updated after that. Nested config without flattening is kept as is.
+        Every read decodes its value again, so reads are many times slower than from
+        dict. Environment is kept as snapshot taken when config was loaded.
+
+        With gc_freeze all objects of process are moved to permanent generation of
+        garbage collector (python 3.7+), so collections in forked workers do not write
+        to memory pages of config and they stay shared.
+
+        :param bool gc_freeze: move all objects of process to permanent generation of garbage collector
+        :return: self
+        """
+        with self.__lock:
+            if not self.__frozen:
+                yaml_cfg = self.__yaml_cfg
+
+                if isinstance(yaml_cfg, (_LazyFlatDict, _LayeredDict)):
+                    yaml_cfg = yaml_cfg.materialize()
+
+                if self.__flatten:
+                    yaml_cfg = _FrozenDict(yaml_cfg)
+
+                cfg = self.__build_layers(yaml_cfg, self.__environment, self.__flatten)
+
+                if self.__accesses is not None:
+                    cfg = _AccessCounter(cfg, self.__accesses)
+
+                self.__frozen = True
+                self.__yaml_cfg = yaml_cfg
+                self.__cfg = cfg
+
+        # freeze is available since python 3.7
+        if gc_freeze and hasattr(gc, "freeze"):
+            gc.collect()
+            gc.freeze()
+
+        return self
+
+    @classmethod
+    def serve(cls, socket_path=None, interval=1.0, on_error=None, **kwargs):
+        """Load config once and publish its snapshot to local processes over Unix
+        socket, they get it by `EnvYAML.connect`. Files are watched and new version of
+        config is published after every change. Same as `python -m envyaml serve`.
+
+        :param str socket_path: path of Unix socket, ENVYAML_SOCKET or envyaml.sock in runtime directory of user by default
+        :param float interval: seconds between checks of files
+        :param callable on_error: called with exception when reload failed
+        :param dict kwargs: arguments of EnvYAML and additional environment variables keys and values
+        :return: server with publish, wait and close methods
+        """
+        if not hasattr(socket, "AF_UNIX"):
+            raise RuntimeError("EnvYAML server requires Unix sockets")
+
+        instance = cls(**kwargs)
+        server = _ConfigServer(
+            instance, cls.__get_socket_path(socket_path, True), instance.__get_snapshot
+        )
+
+        instance.watch(interval, lambda changed: server.publish(), on_error)
+
+        return server
+
+    @classmethod
+    def connect(cls, socket_path=None, timeout=5.0, interval=1.0, callback=None):
+        """Create EnvYAML instance with config published by `python -m envyaml serve`.
+        Config is received in compact storage of freeze without reading, parsing and
+        flattening files. New versions are received in background thread, connection
+        is restored after server restart and unwatch stops updates.
+
+        :param str socket_path: path of Unix socket, ENVYAML_SOCKET or envyaml.sock in runtime directory of user by default
+        :param float timeout: seconds to wait for server and first snapshot
+        :param float interval: seconds between attempts to connect again
+        :param callable callback: called with set of changed keys after update
+        :return: new instance of EnvYAML
+        """
+        if not hasattr(socket, "AF_UNIX"):
+            raise RuntimeError("EnvYAML server requires Unix sockets")
+
+        socket_path = cls.__get_socket_path(socket_path)
+        connection, snapshot = cls.__connect_server(socket_path, timeout)
+
+        instance = cls.__new__(cls)
+        instance.__lock = threading.RLock()
+        instance.__frozen = True
+        instance.__attach(snapshot)
+
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=instance.__follow,
+            args=(stop, socket_path, connection, interval, callback),
+            name="envyaml-connect",
+        )
+        thread.daemon = True
+
+        instance.__watcher = (stop, thread)
+        thread.start()
+
+        return instance
+
+    @classmethod
+    def __get_socket_path(cls, socket_path, create=False):
+        """Construct path of config server socket, default one is in runtime directory
+        of user, so other users could not replace it
+
+        :param str socket_path: path of Unix socket
+        :param bool create: create private directory of default socket when missing
+        :return: str
+        """
+        socket_path = socket_path or os.environ.get("ENVYAML_SOCKET")
+
+        if socket_path:
+            return socket_path
+
+        directory = os.environ.get("XDG_RUNTIME_DIR")
+
+        if not directory:
+            directory = os.path.join(tempfile.gettempdir(), "envyaml-%d" % os.getuid())
+
+            if create and not os.path.isdir(directory):
+                try:
+                    os.makedirs(directory, 0o700)
+                except OSError:
+                    # created by other process meanwhile
+                    pass
+
+            # shared temp directory, it should be private directory of user
+            if os.path.isdir(directory):
+                info = os.lstat(directory)
+
+                if info.st_uid != os.getuid() or info.st_mode & 0o077:
+                    raise RuntimeError(
+                        "EnvYAML socket directory %s is not private" % directory
+                    )
+
+        return os.path.join(os.path.abspath(directory), cls.DEFAULT_SOCKET_FILE)
+
+    @staticmethod
+    def __connect_server(socket_path, timeout):
+        """Connect to config server and receive current snapshot, server which is not
+        started yet is waited for
+
+        :param str socket_path: path of Unix socket
+        :param float timeout: seconds to wait for server and snapshot
+        :return: (socket.socket, dict)
+        """
+        deadline = _timer() + timeout
+
+        while True:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.settimeout(max(deadline - _timer(), 0.001))
+
+            try:
+                connection.connect(socket_path)
+                snapshot = _recv_frame(connection, None)
+
+                if snapshot is None:
+                    raise socket.error("EnvYAML server closed connection")
+
+                return connection, snapshot
+
+            except (socket.error, OSError):
+                connection.close()
+
+                if _timer() >= deadline:
+                    raise
+
+            time.sleep(0.05)
+
+    def __follow(self, stop, socket_path, connection, interval, callback):
+        """Receive new versions of config, connect again when connection is lost
+
+        :param threading.Event stop: event to stop receiving
+        :param str socket_path: path of Unix socket
+        :param socket.socket connection: connected socket
+        :param float interval: seconds between attempts to connect again
+        :param callable callback: called with set of changed keys after update
+        """
+        while not stop.is_set():
+            if connection is None:
+                try:
+                    connection, snapshot = self.__connect_server(socket_path, interval)
+                except (socket.error, OSError):
+                    stop.wait(interval)
+                    continue
+
+            else:
+                connection.settimeout(interval)
+
+                try:
+                    snapshot = _recv_frame(connection, stop)
+                except Exception:
+                    snapshot = None
+
+                if snapshot is None:
+                    connection.close()
+                    connection = None
+                    continue
+
+            changed = self.__attach(snapshot)
+
+            if changed and callback is not None:
+                callback(changed)
+
+        if connection is not None:
+            connection.close()
+
+    def __get_snapshot(self):
+        """Get flat and nested config to publish them, values shared by both are
+        pickled once
+
+        :return: dict
+        """
+        with self.__lock:
+            yaml_config = self.__get_yaml()
+            yaml_cfg = self.__yaml_cfg
+
+        if isinstance(yaml_cfg, (_LazyFlatDict, _LayeredDict)):
+            yaml_cfg = yaml_cfg.materialize()
+
+        elif not self.__flatten:
+            yaml_cfg = self.__build_config(yaml_config, True)
+
+        return {"config": yaml_config, "flat": yaml_cfg}
+
+    def __attach(self, snapshot):
+        """Replace config by snapshot published by config server
+
+        :param dict snapshot: version, nested config and buffers of flat config
+        :return: set of added, removed or changed keys
+        """
+        # storage is built by client, so its format does not depend on server
+        storage = _FrozenDict(snapshot["flat"])
+
+        with self.__lock:
+            previous = self.__cfg
+
+            self.__yaml = snapshot["config"]
+            self.__yaml_changes = None
+            self.__yaml_cfg = storage
+            self.__typed = {}
+            self.__objects = {}
+            self.__config_version = snapshot["version"]
+            self.__cfg = storage
+
+        if previous is None:
+            return set()
+
+        return self.__get_changed_keys(previous, storage)
+
+    @staticmethod
+    def __get_file_identity(file_path):
+        """Get resolved path, mtime, size and inode of file
+
+        :param str file_path: path to file
+        :return: tuple or None if no file
+        """
+        if not file_path:
+            return None
+
+        stat = os.stat(file_path)
+
+        return (
+            os.path.realpath(file_path),
+            getattr(stat, "st_mtime_ns", stat.st_mtime),
+            stat.st_size,
+            stat.st_ino,
+        )
+
+    @staticmethod
+    def __get_fingerprint(instance, include_environment):
+        """Get values of environment variables referenced by instance files
+
+        :param EnvYAML instance: instance of EnvYAML
+        :param bool include_environment: whether environment variables were used
+        :return: tuple
+        """
+        if not include_environment:
+            return ()
+
+        return tuple(
+            (name, os.environ.get(name)) for name in sorted(instance.__variables)
+        )
+
+    def reload(self):
+        """Read files and environment again and replace config at once. When reading
+        fails exception is raised and current config is kept.
+
+        :return: set of added, removed or changed keys
+        """
+        if self.__frozen:
+            raise RuntimeError("Frozen EnvYAML could not be reloaded")
+
+        if self.__cached:
+            raise RuntimeError("Cached EnvYAML could not be reloaded")
+
+        if self.__options is None:
+            raise RuntimeError("EnvYAML rendered from template could not be reloaded")
+
+        options = dict(self.__options)
+        fresh = self.__class__(**dict(options, **options.pop("kwargs")))
+
+        with self.__lock:
+            previous = self.__cfg
+
+            self.__setup(
+                fresh.__environment,
+                fresh.__strict,
+                fresh.__templates,
+                fresh.__yaml,
+                fresh.__loader,
+                fresh.__flatten,
+                fresh.__variables,
+                fresh.__schema,
+            )
+
+            self.__profile = fresh.__profile
+
+        return self.__get_changed_keys(previous, self.__cfg)
+
+    def update_env(self, variables):
+        """Set variables and recompute only config values which depend on them. Variables
+        with None value are removed. When update fails exception is raised and current
+        config is kept.
+
+        :param dict variables: variables names and values
+        :return: set of added, removed or changed keys
+        """
+        if self.__frozen:
+            raise RuntimeError("Frozen EnvYAML could not be updated")
+
+        if self.__cached:
+            raise RuntimeError("Cached EnvYAML could not be updated")
+
+        with self.__lock:
+            kwargs, env_config, environ = self.__environment.maps
+            kwargs = dict(kwargs)
+
+            for name, value in variables.items():
+                kwargs[name] = _DELETED if value is None else value
+
+            environment = _LayeredDict((kwargs, env_config, environ))
+
+            names = set(
+                name
+                for name in variables
+                if self.__environment.get(name, _MISSING)
+                != environment.get(name, _MISSING)
+            )
+
+            if not names:
+                return set()
+
+            previous = self.__cfg
+            updated = self.__update_values(environment, names)
+
+            if updated is None:
+                # variables could change structure of config, read it again
+                self.__setup(
+                    environment,
+                    self.__strict,
+                    self.__templates,
+                    self.__load_templates(
+                        self.__templates, environment, self.__strict, self.__loader
+                    ),
+                    self.__loader,
+                    self.__flatten,
+                    self.__variables,
+                )
+
+                return self.__get_changed_keys(previous, self.__cfg)
+
+            changes, paths = updated
+            yaml_config = self.__yaml
+            changed = set()
+
+            if self.__flatten and self.__flatten != "lazy":
+                overlay, yaml_cfg = {}, self.__yaml_cfg
+
+                # changed values are kept over previous flat config, so update does
+                # not copy it, previous overlay is copied instead
+                if isinstance(yaml_cfg, _LayeredDict):
+                    overlay, yaml_cfg = yaml_cfg.maps
+                    overlay = dict(overlay)
+
+                # update values and their parents
+                for path in paths:
+                    node = changes
+
+                    for index in range(len(path)):
+                        node = node[path[index]]
+                        key = ".".join(str(part) for part in path[: index + 1])
+
+                        overlay[key] = node
+                        changed.add(key)
+
+                # overlay is merged when it is not small anymore
+                if len(overlay) * _OVERLAY_RATIO > len(yaml_cfg):
+                    yaml_cfg = dict(yaml_cfg)
+                    yaml_cfg.update(overlay)
+                else:
+                    yaml_cfg = _LayeredDict((overlay, yaml_cfg))
+
+                if changes and len(changes) * _OVERLAY_RATIO > len(yaml_config):
+                    yaml_config = self.__merge_changes(yaml_config, changes)
+                    changes = None
+
+            else:
+                if changes:
+                    yaml_config = self.__merge_changes(yaml_config, changes)
+                    changes = None
+
+                yaml_cfg = self.__build_config(yaml_config, self.__flatten)
+
+                for path in paths:
+                    changed.update(
+                        ".".join(str(part) for part in path[: index + 1])
+                        for index in range(len(path))
+                    )
+
+            # yaml keys have precedence over variables
+            changed.update(name for name in names if name not in yaml_cfg)
+
+            cfg = self.__build_layers(yaml_cfg, environment, self.__flatten)
+            typed = self.__validate(cfg, self.__schema)
+
+            if self.__accesses is not None:
+                cfg = _AccessCounter(cfg, self.__accesses)
+
+            self.__environment = environment
+            self.__yaml = yaml_config
+            self.__yaml_changes = changes
+            self.__yaml_cfg = yaml_cfg
+            self.__typed = typed
+            self.__objects = {}
+            self.__cfg = cfg
+
+            return changed
+
+    def __get_yaml(self):
+        """Get nested config, top level values changed by update_env are put into it on
+        first use
+
+        :return: dict or list
+        """
+        with self.__lock:
+            if self.__yaml_changes:
+                self.__yaml = self.__merge_changes(self.__yaml, self.__yaml_changes)
+                self.__yaml_changes = None
+
+            return self.__yaml
+
+    @staticmethod
+    def __merge_changes(yaml_config, changes):
+        """Copy nested config with changed top level values
+
+        :param dict|list yaml_config: nested config
+        :param dict changes: top level keys and their new values
+        :return: dict or list
+        """
+        yaml_config = (
+            list(yaml_config) if isinstance(yaml_config, list) else dict(yaml_config)
+        )
+
+        for key, value in changes.items():
+            yaml_config[key] = value
+
+        return yaml_config
+
+    def __update_values(self, environment, names):
+        """Recompute yaml values which depend on variables, parents of changed values
+        are copied and rest of config is shared with current one.
+
+        :param dict environment: configuration variables with new values
+        :param set names: names of changed variables
+        :return: (changed top level values, paths of changed values) or None when config should be read again
+        """
+        # values from several files are merged, config is read again
+        if len(self.__templates) != 1:
+            return None
+
+        # variables are substituted into parsed scalars, config is read again
+        if issubclass(self.__loader, _ScalarInterpolation):
+            return None
+
+        dependencies = self.__dependencies
+
+        # values of references to config keys are resolved after parsing, index is
+        # built for config without them
+        if dependencies is None:
+            if self.__has_references(self.__templates, self.__environment):
+                return None
+
+            dependencies = self.__get_dependencies()
+
+        # removed variables could become references
+        if any(
+            name in dependencies["references"] and name not in environment
+            for name in names
+        ):
+            return None
+
+        # values of variables could change structure of config
+        if names & dependencies["structural"]:
+            return None
+
+        for name in names:
+            value = self.__environment.get(name)
+
+            if isinstance(value, (dict, list)) or isinstance(
+                environment.get(name), (dict, list)
+            ):
+                return None
+
+        sites = set()
+
+        for name in names:
+            sites.update(dependencies["variables"].get(name, ()))
+
+        yaml_config = self.__yaml
+
+        # top level values are changed apart from root of config, so it is not copied
+        changes = dict(self.__yaml_changes or ())
+
+        # copies of containers by id of original one and ids of copies
+        copies = {}
+        copied = set()
+
+        paths = []
+
+        for site in sorted(sites):
+            template, site_paths, flow = dependencies["sites"][site]
+
+            value = self.__load_scalar(template, environment, flow)
+
+            if value is _MISSING:
+                return None
+
+            for path in site_paths:
+                node = changes
+
+                for part in path[:-1]:
+                    child = node.get(part, _MISSING) if node is changes else _MISSING
+
+                    if child is _MISSING:
+                        child = (yaml_config if node is changes else node)[part]
+
+                    if id(child) not in copied:
+                        if id(child) not in copies:
+                            copies[id(child)] = (
+                                list(child) if isinstance(child, list) else dict(child)
+                            )
+                            copied.add(id(copies[id(child)]))
+
+                        child = node[part] = copies[id(child)]
+
+                    node = child
+
+                node[path[-1]] = value
+                paths.append(path)
+
+        return changes or None, paths
+
+    def __load_scalar(self, template, environment, flow):
+        """Substitute variables into scalar source and parse it alone
+
+        :param list template: scalar source split into text pieces and variable references
+        :param dict environment: configuration variables
+        :param bool flow: scalar is inside flow collection
+        :return: any or _MISSING when scalar could not be parsed alone
+        """
+        for piece in template:
+            if isinstance(piece, tuple) and piece[0] in environment:
+                value = environment[piece[0]]
+
+                if (
+                    not isinstance(value, string_types)
+                    or "\n" in value
+                    or "\r" in value
+                ):
+                    return _MISSING
+
+                # comments could hide rest of line with closing brackets
+                if "#" in value:
+                    return _MISSING
+
+                if flow and any(c in value for c in ",[]{}:?"):
+                    return _MISSING
+
+        content = self.__render_template(template, environment, self.__strict)
+
+        if content.startswith(("---", "...")):
+            return _MISSING
+
+        # empty scalar is dropped from flow collection
+        if flow and not content.strip():
+            return _MISSING
+
+        # value at start of scalar could turn it into block scalar, quoted one or alias
+        if not template[0] and RE_INDICATOR.match(content):
+            return _MISSING
+
+        try:
+            value = load(content, Loader=self.__loader)
+        except Exception:
+            return _MISSING
+
+        if isinstance(value, (dict, list)):
+            return _MISSING
+
+        return value
+
+    def __get_dependencies(self):
+        """Build index from variables names to yaml scalars with their references
+
+        :return: dict
+        """
+        if self.__dependencies is not None:
+            return self.__dependencies
+
+        # positions of variables in yaml text
+        offsets = []
+        content = self.__render_template(
+            self.__templates[0], self.__environment, False, offsets
+        )
+
+        # value scalars as (start, end, path, flow) and regions with structural references
+        scalars = []
+        structural = []
+
+        # same loader as config was read with, LibYAML composes nodes much faster
+        loader = self.__loader(content)
+
+        try:
+            root = loader.get_single_node()
+
+            stack = [(root, (), False, ())] if root is not None else []
+
+            while stack:
+                node, path, flow, parents = stack.pop()
+
+                if isinstance(node, ScalarNode):
+                    start, end = node.start_mark.index, node.end_mark.index
+
+                    # block scalars with explicit indentation or keep chomping
+                    if node.style in ("|", ">") and content[start:end].split("\n", 1)[
+                        0
+                    ].strip() not in (node.style, node.style + "-"):
+                        structural.append((start, end))
+                    else:
+                        scalars.append((start, end, path, flow))
+
+                    continue
+
+                # recursive aliases
+                if id(node) in parents:
+                    continue
+
+                parents = parents + (id(node),)
+                flow = flow or bool(node.flow_style)
+
+                if isinstance(node, SequenceNode):
+                    for index, child in enumerate(node.value):
+                        stack.append((child, path + (index,), flow, parents))
+
+                    continue
+
+                for key_node, value_node in node.value:
+                    structural.append(
+                        (key_node.start_mark.index, key_node.end_mark.index)
+                    )
+
+                    if key_node.tag == "tag:yaml.org,2002:merge":
+                        structural.append(
+                            (value_node.start_mark.index, value_node.end_mark.index)
+                        )
+                        merged = (
+                            value_node.value
+                            if isinstance(value_node, SequenceNode)
+                            else [value_node]
+                        )
+
+                        for child in merged:
+                            structural.append(
+                                (child.start_mark.index, child.end_mark.index)
+                            )
+
+                        continue
+
+                    # plain string keys are most common, they need no constructor
+                    if key_node.tag == "tag:yaml.org,2002:str" and isinstance(
+                        key_node.value, string_types
+                    ):
+                        key = key_node.value
+                    else:
+                        key = loader.construct_object(key_node, deep=True)
+
+                    stack.append((value_node, path + (key,), flow, parents))
+        finally:
+            loader.dispose()
+
+        # group aliased scalars by source position
+        spans = OrderedDict()
+        owners = {}
+
+        for start, end, path, flow in sorted(scalars, key=lambda scalar: scalar[:2]):
+            spans.setdefault((start, end), ([], flow))[0].append(path)
+
+            # duplicated keys, last one wins
+            if path in owners and owners[path] != (start, end):
+                structural.append(owners[path])
+                structural.append((start, end))
+
+            owners[path] = (start, end)
+
+        starts = [start for start, _ in spans]
+        ends = [end for _, end in spans]
+
+        # scalars inside regions with structural references
+        excluded = set()
+
+        for start, end in structural:
+            index = bisect_right(starts, start) - 1
+
+            # region could start inside scalar
+            index = max(index, 0)
+
+            while index < len(starts) and starts[index] <= end:
+                if ends[index] >= start:
+                    excluded.add(index)
+
+                index += 1
+
+        dependencies = {
+            "variables": {},
+            "structural": set(),
+            "sites": [],
+            # names without default, they refer to config keys when not defined
+            "references": set(
+                piece[0]
+                for piece in self.__templates[0]
+                if isinstance(piece, tuple)
+                and piece[1] is None
+                and RE_KEY.match(piece[0])
+            ),
+        }
+        references = {}
+
+        for start, end, piece in offsets:
+            index = bisect_right(starts, start) - 1
+
+            if index < 0 or ends[index] < end or index in excluded:
+                dependencies["structural"].add(piece[0])
+            else:
+                references.setdefault(index, []).append((start, end, piece))
+
+        for index, pieces in references.items():
+            start, end = starts[index], ends[index]
+            paths, flow = spans[(start, end)]
+
+            template = []
+            position = start
+
+            for piece_start, piece_end, piece in pieces:
+                template.append(content[position:piece_start])
+                template.append(piece)
+                position = piece_end
+
+            template.append(content[position:end])
+
+            for piece_start, piece_end, piece in pieces:
+                dependencies["variables"].setdefault(piece[0], set()).add(
+                    len(dependencies["sites"])
+                )
+
+            dependencies["sites"].append((template, paths, flow))
+
+        self.__dependencies = dependencies
+
+        return dependencies
+
+    def watch(self, interval=1.0, callback=None, on_error=None):
+        """Check yaml and .env files in background thread and reload config when they changed
+
+        :param float interval: seconds between checks
+        :param callable callback: called with set of changed keys after reload
+        :param callable on_error: called with exception when reload failed
+        """
+        if self.__frozen:
+            raise RuntimeError("Frozen EnvYAML could not be reloaded")
+
+        if self.__cached:
+            raise RuntimeError("Cached EnvYAML could not be reloaded")
+
+        if self.__options is None:
+            raise RuntimeError("EnvYAML rendered from template could not be reloaded")
+
+        self.unwatch()
+
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=self.__watch,
+            args=(stop, interval, callback, on_error),
+            name="envyaml-watch",
+        )
+        thread.daemon = True
+
+        self.__watcher = (stop, thread)
+        thread.start()
+
+    def unwatch(self):
+        """Stop background thread started by watch"""
+        if self.__watcher is not None:
+            stop, thread = self.__watcher
+            self.__watcher = None
+
+            stop.set()
+
+            if thread is not threading.current_thread():
+                thread.join()
+
+    def __watch(self, stop, interval, callback, on_error):
+        """Reload config every time when files identity changed
+
+        :param threading.Event stop: event to stop watching
+        :param float interval: seconds between checks
+        :param callable callback: called with set of changed keys after reload
+        :param callable on_error: called with exception when reload failed
+        """
+        identity = None
+
+        # files which could not be checked are reported once, until they could be again
+        failing = False
+
+        while True:
+            try:
+                current = self.__get_files_identity(
+                    self.__options["yaml_file"], self.__options["env_file"]
+                )
+            except Exception as e:
+                if on_error is not None and not failing:
+                    on_error(e)
+
+                failing = True
+            else:
+                failing = False
+
+                if identity is None:
+                    identity = current
+
+                elif current != identity:
+                    # each change is read and reported once, even when reading fails
+                    identity = current
+
+                    try:
+                        changed = self.reload()
+
+                        if changed and callback is not None:
+                            callback(changed)
+
+                    except Exception as e:
+                        if on_error is not None:
+                            on_error(e)
+
+            if stop.wait(interval):
+                break
+
+    @classmethod
+    def __get_files_identity(cls, yaml_file, env_file):
+        """Get identity of yaml and .env files
+
+        :param str|list yaml_file: file path for config or list of them
+        :param str|list env_file: file path for .env file or list of them
+        :return: tuple
+        """
+        return (
+            tuple(
+                cls.__get_file_identity(file_path)
+                for file_path in cls.__get_file_paths(
+                    yaml_file, "ENV_YAML_FILE", cls.DEFAULT_ENV_YAML_FILE
+                )
+            ),
+            tuple(
+                cls.__get_file_identity(file_path)
+                for file_path in cls.__get_file_paths(
+                    env_file, "ENV_FILE", cls.DEFAULT_ENV_FILE
+                )
+            ),
+        )
+
+    @staticmethod
+    def __get_changed_keys(previous, current):
+        """Compare two configs
+
+        :param dict previous: previous config
+        :param dict current: current config
+        :return: set of added, removed or changed keys
+        """
+        # reads for comparison are not counted
+        previous = getattr(previous, "cfg", previous)
+        current = getattr(current, "cfg", current)
+
+        previous_keys = set(previous.keys())
+        current_keys = set(current.keys())
+
+        return (previous_keys ^ current_keys) | set(
+            key for key in previous_keys & current_keys if previous[key] != current[key]
+        )
+
+    def export(self):
+        """Export config as read-only mapping. Config is never changed in place, so
+        without environment layers mapping is a view of current config without copying.
+
+        :return: read-only mapping with config
+        """
+        cfg = self.__cfg
+
+        if isinstance(cfg, _AccessCounter):
+            cfg = cfg.cfg
+
+        if not isinstance(cfg, (dict, _FrozenDict)):
+            cfg = cfg.copy()
+
+        return MappingProxyType(cfg)
+
+    @staticmethod
+    def environ():
+        """Get os.environ mapping object
+
+        :return: A mapping object representing the string environment
+        """
+        return os.environ
+
+    @staticmethod
+    def __read_env_file(file_path):
+        """read and parse env file
+
+        :param str file_path: path to file
+        :return: (dict, set of variables defined several times)
+        """
+        config = dict()
+        defined = set()
+
+        if file_path:
+            with io.open(file_path, encoding="utf8") as f:
+                # read file line by line, whole content is never kept in memory
+                for line in f:
+                    entry = RE_DOT_ENV.match(line.rstrip("\n"))
+
+                    if entry is None:
+                        continue
+
+                    name = entry.group("name")
+                    value = entry.group("value")
+
+                    # check double definition
+                    if name in config:
+                        defined.add(name)
+
+                    # variables are expanded when all files are read
+                    config[name] = value
+
+        return config, defined
+
+    @staticmethod
+    def __read_env_files(file_paths, strict, variables=None, environ=None):
+        """read .env files, merge them in order and expand variables
+
+        :param list file_paths: paths to files
+        :param bool strict: strict mode
+        :param set variables: set to collect names of expanded environment variables
+        :param dict environ: environment for variables not defined in .env files, os.environ by default
+        :return: dict
+        """
+        config, defined = EnvYAML.__load_env_files(file_paths)
+
+        return EnvYAML.__expand_env_files(config, defined, strict, variables, environ)
+
+    @staticmethod
+    def __load_env_files(file_paths):
+        """read .env files concurrently and merge them in order, variables are not expanded
+
+        :param list file_paths: paths to files
+        :return: (dict, set of variables defined several times)
+        """
+        with _stage("read_env"):
+            configs = EnvYAML.__map(EnvYAML.__read_env_file, file_paths)
+
+        config = dict()
+        defined = set()
+
+        for entry, entry_defined in configs:
+            # check definition in one file and in several files
+            defined.update(entry_defined)
+            defined.update(name for name in entry if name in config)
+
+            config.update(entry)
+
+        return config, defined
+
+    @staticmethod
+    def __expand_env_files(config, defined, strict, variables=None, environ=None):
+        """Check and expand variables read by __load_env_files
+
+        :param dict config: variables from .env files
+        :param set defined: variables defined several times
+        :param bool strict: strict mode
+        :param set variables: set to collect names of expanded environment variables
+        :param dict environ: environment for variables not defined in .env files, os.environ by default
+        :return: dict
+        """
+        # strict mode
+        if strict and defined:
+            raise ValueError(
+                "Strict mode enabled, variables "
+                + ", ".join(["$" + v for v in defined])
+                + " defined several times!"
+            )
+
+        _count("env_variables", len(config))
+
+        with _stage("expand_env"):
+            return EnvYAML.__expand_env(config, variables, environ)
+
+    @staticmethod
+    def __get_env_references(config):
+        """Find variables referenced by values of .env files
+
+        :param dict config: variables from .env files
+        :return: dict of names and lists of referenced names
+        """
+        return dict(
+            (
+                name,
+                [
+                    entry.group("named") or entry.group("braced")
+                    for entry in RE_EXPAND_VARS.finditer(value)
+                ],
+            )
+            for name, value in config.items()
+            if "$" in value
+        )
+
+    @staticmethod
+    def __expand_env(config, variables=None, environ=None):
+        """Expand $NAME and ${NAME} in .env values. Variables defined in .env files are
+        expanded first in dependency order, other names are taken from environment and
+        unknown ones are left as is. Variable referring to itself gets environment value.
+
+        :param dict config: variables from .env files
+        :param set variables: set to collect names of expanded environment variables
+        :param dict environ: environment, os.environ by default
+        :return: dict
+        """
+        environ = os.environ if environ is None else environ
+        references = EnvYAML.__get_env_references(config)
+        pattern = RE_EXPAND_NT_VARS if os.name == "nt" else RE_EXPAND_VARS
+
+        if variables is not None:
+            for name, names in references.items():
+                variables.update(names)
+
+                # %NAME% is taken from environment only
+                if pattern is RE_EXPAND_NT_VARS:
+                    variables.update(
+                        entry.group("percent")
+                        for entry in pattern.finditer(config[name])
+                        if entry.group("percent")
+                    )
+
+        if not references:
+            return config
+
+        config = dict(config)
+
+        def expand(name):
+            def substitute(entry):
+                variable = entry.group("named") or entry.group("braced")
+
+                if variable is None:
+                    variable = entry.group("percent")
+
+                    if not variable:
+                        return "%"
+
+                elif variable != name and variable in config:
+                    return config[variable]
+
+                return environ.get(variable, entry.group(0))
+
+            config[name] = pattern.sub(substitute, config[name])
+
+        EnvYAML.__resolve_in_order(
+            references,
+            lambda name: [
+                variable
+                for variable in references[name]
+                if variable != name and variable in references
+            ],
+            expand,
+            lambda cycle: "Variables "
+            + ", ".join("$" + name for name in cycle)
+            + " have circular references!",
+        )
+
+        return config
+
+    @staticmethod
+    def __resolve_in_order(nodes, get_dependencies, resolve, get_error):
+        """Resolve every node once after all its dependencies, depth first without
+        recursion. Time is linear in number of nodes and dependencies.
+
+        :param iterable nodes: nodes to resolve
+        :param callable get_dependencies: returns nodes which should be resolved before
+        :param callable resolve: called once for every node in dependency order
+        :param callable get_error: returns error message for list of nodes in cycle
+        """
+        # nodes on stack are visiting, resolved nodes are done
+        visiting = set()
+        done = set()
+
+        for start in nodes:
+            if start in done:
+                continue
+
+            visiting.add(start)
+            stack = [(start, iter(get_dependencies(start)))]
+
+            while stack:
+                node, dependencies = stack[-1]
+
+                for dependency in dependencies:
+                    if dependency in done:
+                        continue
+
+                    if dependency in visiting:
+                        cycle = [entry[0] for entry in stack]
+
+                        raise ValueError(get_error(cycle[cycle.index(dependency) :]))
+
+                    visiting.add(dependency)
+                    stack.append((dependency, iter(get_dependencies(dependency))))
+                    break
+
+                else:
+                    stack.pop()
+                    visiting.discard(node)
+                    resolve(node)
+                    done.add(node)
+
+    @staticmethod
+    def __has_references(templates, cfg):
+        """Check if templates refer to config keys, names without default which are not
+        variables
+
+        :param tuple templates: compiled templates
+        :param dict cfg: configuration variables (environ and .env)
+        :return: bool
+        """
+        for template in templates:
+            for piece in template:
+                if (
+                    isinstance(piece, tuple)
+                    and piece[1] is None
+                    and piece[0] not in cfg
+                    and RE_KEY.match(piece[0])
+                ):
+                    return True
+
+        return False
+
+    @staticmethod
+    def __resolve_references(config, strict):
+        """Replace references to config keys left in parsed yaml by their values. Values
+        are resolved in dependency order, references could point to other references,
+        nested dicts and lists.
+
+        :param dict|list config: parsed and merged yaml files
+        :param bool strict: strict mode
+        :return: dict or list
+        """
+        # strings with references by flat keys as (container, key or index, text)
+        sites = {}
+        not_found = set()
+
+        def restore(entry):
+            not_found.add(entry.group(1))
+
+            return EnvYAML.__get_reference_text(entry)
+
+        stack = [("", config)]
+
+        while stack:
+            prefix, node = stack.pop()
+
+            if isinstance(node, dict):
+                # references in keys are not supported, original text is restored
+                if any(
+                    isinstance(key, string_types) and u"\ue000" in key for key in node
+                ):
+                    items = list(node.items())
+                    node.clear()
+
+                    for key, value in items:
+                        if isinstance(key, string_types):
+                            key = RE_REFERENCE.sub(restore, key)
+
+                        node[key] = value
+
+                elements = node.items()
+
+            elif isinstance(node, list):
+                elements = enumerate(node)
+
+            else:
+                continue
+
+            for name, value in elements:
+                key = prefix + str(name)
+
+                if isinstance(value, string_types):
+                    if u"\ue000" in value:
+                        sites[key] = (node, name, value)
+
+                else:
+                    stack.append((key + ".", value))
+
+        view = _LazyFlatDict(config, EnvYAML.__flat)
+        keys = sorted(sites)
+        references = {}
+
+        for key, (_, _, text) in sites.items():
+            references[key] = [entry.group(1) for entry in RE_REFERENCE.finditer(text)]
+
+        def get_dependencies(key):
+            dependencies = []
+
+            for name in references[key]:
+                # referenced value could be inside of dict or list given by reference
+                parts = name.split(".")
+                dependencies.extend(
+                    prefix
+                    for prefix in (
+                        ".".join(parts[:end]) for end in range(1, len(parts) + 1)
+                    )
+                    if prefix in sites
+                )
+
+                # or dict or list with references inside
+                start = bisect_right(keys, name + ".")
+
+                while start < len(keys) and keys[start].startswith(name + "."):
+                    dependencies.append(keys[start])
+                    start += 1
+
+            return dependencies
+
+        def substitute(entry):
+            value = view.get(entry.group(1), _MISSING)
+
+            if value is _MISSING:
+                return restore(entry)
+
+            return value if isinstance(value, string_types) else str(value)
+
+        def resolve(key):
+            container, name, text = sites[key]
+            entry = RE_REFERENCE.match(text)
+
+            # whole value is reference, value keeps its type
+            if entry is not None and entry.end() == len(text):
+                value = view.get(entry.group(1), _MISSING)
+
+                if value is _MISSING:
+                    value = restore(entry)
+
+            else:
+                value = RE_REFERENCE.sub(substitute, text)
+
+            container[name] = value
+
+        EnvYAML.__resolve_in_order(
+            keys,
+            get_dependencies,
+            resolve,
+            lambda cycle: "Config keys "
+            + ", ".join(cycle)
+            + " have circular references!",
+        )
+
+        # strict mode
+        if strict and not_found:
+            raise ValueError(
+                "Strict mode enabled, variables "
+                + ", ".join(["$" + v for v in not_found])
+                + " are not defined!"
+            )
+
+        return config
+
+    @staticmethod
+    def __get_reference_text(entry):
+        """Original text of reference to config key
+
+        :param re.Match entry: found reference
+        :return: str
+        """
+        if entry.group(2) == u"\ue001":
+            return "${" + entry.group(1) + "}"
+
+        return "$" + entry.group(1)
+
+    @staticmethod
+    def __read_yaml_files(
+        file_paths, cfg, strict, loader, variables, cache_dir, cache_config=False
+    ):
+        """read and parse yaml files concurrently and merge them in order
+
+        :param list file_paths: paths to files
+        :param dict cfg: configuration variables (environ and .env)
+        :param bool strict: strict mode
+        :param type loader: YAML loader class
+        :param set variables: set to collect names of referenced variables
+        :param bool|str cache_dir: directory for compiled cache files
+        :param bool cache_config: store parsed config in compiled cache files
+        :return: (tuple of compiled templates, dict)
+        """
+        results = EnvYAML.__map(
+            lambda file_path: EnvYAML.__read_yaml_file(
+                file_path,
+                cfg,
+                strict,
+                loader,
+                variables,
+                EnvYAML.__get_cache_file(file_path, cache_dir),
+                cache_config,
+            ),
+            file_paths,
+        )
+
+        templates = tuple(template for template, _ in results)
+
+        with _stage("merge"):
+            yaml = EnvYAML.__merge([yaml for _, yaml in results])
+
+        # references to config keys are resolved in merged config
+        if EnvYAML.__has_references(templates, cfg):
+            with _stage("references"):
+                yaml = EnvYAML.__resolve_references(yaml, strict)
+
+        return templates, yaml
+
+    @staticmethod
+    def __read_yaml_file(
+        file_path,
+        cfg,
+        strict,
+        loader,
+        variables=None,
+        cache_file=None,
+        cache_config=False,
+    ):
+        """read and parse yaml file
+
+        :param str file_path: path to file
+        :param dict cfg: configuration variables (environ and .env)
+        :param bool strict: strict mode
+        :param type loader: YAML loader class
+        :param set variables: set to collect names of referenced variables
+        :param str cache_file: path to compiled cache file or None
+        :param bool cache_config: store parsed config in compiled cache file
+        :return: (compiled template, dict)
+        """
+        compiled = None
+
+        # template of scalar interpolation is yaml text, there is nothing to cache
+        if issubclass(loader, _ScalarInterpolation):
+            cache_file = None
+
+        # read and parse files
+        if cache_file:
+            with _stage("read_yaml"), io.open(file_path, "rb") as f:
+                source = f.read()  # type: bytes
+
+            digest = hashlib.sha256(source).hexdigest()
+            compiled = EnvYAML.__read_cache_file(cache_file, digest, loader)
+
+            # same as universal newlines mode of io.open
+            content = source.decode("utf8").replace("\r\n", "\n").replace("\r", "\n")
+
+        else:
+            with _stage("read_yaml"), io.open(file_path, encoding="utf8") as f:
+                content = f.read()  # type:str
+
+        _count("yaml_bytes", len(content))
+
+        # variables are found in scalars while parsing, text is not scanned
+        if issubclass(loader, _ScalarInterpolation):
+            pieces = []
+            yaml = EnvYAML.__load_template([content], cfg, strict, loader, pieces)
+            template = [content] + pieces
+
+            if variables is not None:
+                variables.update(EnvYAML.__get_template_variables(template))
+
+            return template, yaml
+
+        if compiled is None:
+            # remove all comments and find variables
+            with _stage("comments"):
+                content = RE_COMMENTS.sub("", content)
+
+            with _stage("scan"):
+                template = EnvYAML.__compile_template(content)
+        else:
+            template = compiled["template"]
+
+        if variables is not None:
+            variables.update(EnvYAML.__get_template_variables(template))
+
+        # parsed config is stored only on request, it holds values of variables
+        values = None
+
+        if cache_config and compiled is not None and "key" in compiled:
+            values = EnvYAML.__get_values_digest(compiled["key"], template, cfg, strict)
+
+        hit = values is not None and hmac.compare_digest(values, compiled["values"])
+
+        if hit:
+            yaml = compiled["config"]
+        else:
+            yaml = EnvYAML.__load_template(template, cfg, strict, loader)
+
+        if cache_file:
+            _count("cache_misses" if compiled is None else "cache_hits")
+
+        # parsed config stored before is dropped when it is not requested anymore
+        if (
+            cache_file
+            and not hit
+            and (compiled is None or cache_config or "config" in compiled)
+        ):
+            compiled = {
+                "version": __version__,
+                "digest": digest,
+                "loader": loader.__name__,
+                "template": template,
+            }
+
+            if cache_config:
+                key = os.urandom(32)
+
+                compiled.update(
+                    key=key,
+                    values=EnvYAML.__get_values_digest(key, template, cfg, strict),
+                    config=yaml,
+                )
+
+            EnvYAML.__write_cache_file(cache_file, compiled)
+
+        return template, yaml
+
+    @staticmethod
+    def __load_template(template, cfg, strict, loader, pieces=None):
+        """Substitute variables into compiled template and parse it
+
+        :param list template: compiled template
+        :param dict cfg: configuration variables (environ and .env)
+        :param bool strict: strict mode
+        :param type loader: YAML loader class
+        :param list pieces: list to collect variable references found in scalars
+        :return: dict or list
+        """
+        if issubclass(loader, _ScalarInterpolation):
+            found = [] if pieces is None else pieces
+
+            # template is yaml text followed by variable references of its scalars
+            with _stage("parse"):
+                yaml = EnvYAML.__load_scalars(template[0], cfg, strict, loader, found)
+
+            _count("substitutions", len(found))
+
+        else:
+            with _stage("render"):
+                content = EnvYAML.__render_template(template, cfg, strict)
+
+            # pieces of compiled template are text and reference one by one
+            _count("substitutions", len(template) // 2)
+
+            # load proper content
+            with _stage("parse"):
+                try:
+                    yaml = load(content, Loader=loader)
+                except YAMLError:
+                    # variables left in broken yaml are reported before parse error
+                    not_found = set(
+                        entry.group(1) for entry in RE_REFERENCE.finditer(content)
+                    )
+
+                    if strict and not_found:
+                        raise ValueError(
+                            "Strict mode enabled, variables "
+                            + ", ".join(["$" + v for v in not_found])
+                            + " are not defined!"
+                        )
+
+                    raise
+
+        # if contains somethings
+        if yaml and isinstance(yaml, (dict, list)):
+            return yaml
+
+        # by default return empty dict
+        return {}
+
+    @staticmethod
+    def __load_scalars(content, cfg, strict, loader, pieces=None):
+        """Parse yaml and substitute variables into scalars with "$" only, rest of text
+        is never scanned and quoting of values is kept
+
+        :param str content: yaml text
+        :param dict cfg: configuration variables (environ and .env)
+        :param bool strict: strict mode
+        :param type loader: YAML loader class with scalar interpolation
+        :param list pieces: list to collect variable references found in scalars
+        :return: any
+        """
+        not_found = set()
+
+        parser = loader(content)
+        parser.envyaml_render = EnvYAML.__get_scalar_render(cfg, not_found, pieces)
+
+        try:
+            yaml = parser.get_single_data()
+        finally:
+            parser.dispose()
+
+        # strict mode
+        if strict and not_found:
+            raise ValueError(
+                "Strict mode enabled, variables "
+                + ", ".join(["$" + v for v in not_found])
+                + " are not defined!"
+            )
+
+        return yaml
 
+    @staticmethod
+    def __get_scalar_render(cfg, not_found, pieces=None):
+        """Create function which substitutes variables into scalar value
 
-class EnvYAML:
-    __version__ = __version__
+        :param dict cfg: configuration variables (environ and .env)
+        :param set not_found: set to collect names of not defined variables
+        :param list pieces: list to collect variable references
+        :return: callable which returns value and whether tag of plain scalar is resolved from it
+        """
 
-    ENVYAML_STRICT_DISABLE = "ENVYAML_STRICT_DISABLE"  # type: str
-    DEFAULT_ENV_YAML_FILE = "env.yaml"  # type:str
-    DEFAULT_ENV_FILE = ".env"  # type:str
+        def render(value, plain=False):
+            template = EnvYAML.__compile_template(value)
 
-    __env_file = None  # type:str
-    __yaml_file = None  # type: str
-    __cfg = None  # type: dict
-    __strict = True  # type: bool
+            # variable references are between text pieces
+            for piece in template[1::2]:
+                if isinstance(piece, tuple):
+                    if pieces is not None:
+                        pieces.append(piece)
 
-    def __init__(
-        self,
-        yaml_file=None,
-        env_file=None,
-        include_environment=True,
-        strict=True,
-        flatten=True,
-        **kwargs
-    ):
-        """Create EnvYAML class instance and read content from environment and files if they exists
+                    if (
+                        piece[0] not in cfg
+                        and piece[1] is None
+                        and not RE_KEY.match(piece[0])
+                    ):
+                        not_found.add(piece[0])
 
-        :param str yaml_file: file path for config or env.yaml by default
-        :param str env_file: file path for .env file or None by default
-        :param bool include_environment: include environment variable, by default true
-        :param bool strict: use strict mode and throw exception when have unset variable, by default true
-        :param bool flatten: whether we should flatten config hierarchy or not
-        :param dict kwargs: additional environment variables keys and values
-        :return: new instance of EnvYAML
-        """
-        # raise exception module not found when no pyyaml installed
-        if safe_load is None:
-            raise ModuleNotFoundError(
-                'EnvYAML require "pyyaml >= 5" module to work. '
-                "Consider install this module into environment!"
-            )
+            # quoted default of whole plain scalar is yaml string, as with text interpolation
+            if plain and len(template) == 3 and not template[0] and not template[2]:
+                variable, default, _ = template[1]
 
-        # read environment
-        self.__cfg = dict(os.environ) if include_environment else {}
+                if (
+                    variable not in cfg
+                    and default
+                    and len(default) > 1
+                    and default[0] == default[-1]
+                    and default[0] in "\"'"
+                ):
+                    return default[1:-1], False
 
-        # set strict mode to false if "ENVYAML_STRICT_DISABLE" presents in env else use "strict" from function
-        self.__strict = False if self.ENVYAML_STRICT_DISABLE in self.__cfg else strict
+            return EnvYAML.__render_template(template, cfg, False), True
 
-        # default file names
-        self.__env_file = env_file
-        self.__yaml_file = yaml_file
+        return render
 
-        # read .env file and update config
-        self.__cfg.update(
-            self.__read_env_file(
-                self.__get_file_path(env_file, "ENV_FILE", self.DEFAULT_ENV_FILE),
-                self.__strict,
-            )
+    @staticmethod
+    def __load_templates(templates, cfg, strict, loader):
+        """Substitute variables into compiled templates, parse and merge them
+
+        :param tuple templates: compiled templates
+        :param dict cfg: configuration variables (environ and .env)
+        :param bool strict: strict mode
+        :param type loader: YAML loader class
+        :return: dict or list
+        """
+        yaml = EnvYAML.__merge(
+            [
+                EnvYAML.__load_template(template, cfg, strict, loader)
+                for template in templates
+            ]
         )
 
-        # fill cfg with kwargs
-        self.__cfg.update(kwargs)
+        # references to config keys are resolved in merged config
+        if EnvYAML.__has_references(templates, cfg):
+            yaml = EnvYAML.__resolve_references(yaml, strict)
 
-        # read yaml file and parse it
-        yaml_config = self.__read_yaml_file(
-            self.__get_file_path(
-                yaml_file, "ENV_YAML_FILE", self.DEFAULT_ENV_YAML_FILE
-            ),
-            self.__cfg,
-            self.__strict,
-        )
+        return yaml
 
-        # update config
-        if isinstance(yaml_config, list):
-            self.__cfg.update({k: v for k, v in enumerate(yaml_config)})
-        else:
-            self.__cfg.update(yaml_config)
+    @staticmethod
+    def __merge(configs):
+        """Deep merge parsed yaml files, values of later files win. Only dicts present
+        in several files are copied, rest of values are shared with parsed files.
 
-        # make config as flat dict with '.'
-        if flatten:
-            self.__cfg = self.__flat(self.__cfg)
+        :param list configs: parsed yaml files
+        :return: dict or list
+        """
+        if not configs:
+            return {}
 
-    def get(self, key, default=None):
-        """Get configuration variable with default value. If no `default` value set use None
+        merged = configs[0]
 
-        :param any key: name for the configuration key
-        :param any default: default value if no key found
+        for config in configs[1:]:
+            merged = EnvYAML.__merge_values(merged, config)
+
+        return merged
+
+    @staticmethod
+    def __merge_values(base, override):
+        """Merge two values, dicts are merged key by key and other values replaced
+
+        :param any base: value from earlier file
+        :param any override: value from later file
         :return: any
         """
+        if not isinstance(base, dict) or not isinstance(override, dict):
+            return override
 
-        return self.__cfg.get(key, default)
+        merged = dict(base)
 
-    def export(self):
-        """Export config
+        for key, value in override.items():
+            if key in merged:
+                merged[key] = EnvYAML.__merge_values(merged[key], value)
+            else:
+                merged[key] = value
+
+        return merged
+
+    @staticmethod
+    def __map(function, items):
+        """Apply function to every item, concurrently in thread pool when there are
+        several items
 
-        :return: dict with config
+        :param callable function: function to call
+        :param list items: function arguments
+        :return: list of results in items order
         """
-        return self.__cfg.copy()
+        if len(items) < 2 or ThreadPoolExecutor is None:
+            return [function(item) for item in items]
+
+        profile = getattr(_profiling, "profile", None)
+
+        def run(item):
+            # worker threads report to profile of loading thread
+            _profiling.profile = profile
+
+            try:
+                return function(item)
+            finally:
+                _profiling.profile = None
+
+        with ThreadPoolExecutor(
+            max_workers=min(len(items), EnvYAML.MAX_WORKERS)
+        ) as executor:
+            return list(executor.map(run, items))
 
     @staticmethod
-    def environ():
-        """Get os.environ mapping object
+    def __compile_template(content):
+        """Split content into text pieces and variable references within single pass
 
-        :return: A mapping object representing the string environment
+        :param str content: text with variables
+        :return: list of str and (variable, default, text) tuples
         """
-        return os.environ
+        template = []
+        position = 0
+
+        # iterate over findings
+        for entry in RE_PATTERN.finditer(content):
+            groups = entry.groupdict()  # type: dict
+
+            if groups["named"]:
+                piece = (groups["named"], groups["named_default"], entry.group(2))
+
+            elif groups["braced"]:
+                piece = (groups["braced"], groups["braced_default"], entry.group(2))
+
+            elif groups["escaped"] and "$" in groups["escaped"]:
+                piece = groups["escaped"]
+
+            else:
+                continue
+
+            # text before variable, quotes are left as is
+            template.append(content[position : entry.start(2)])
+            template.append(piece)
+            position = entry.end(2)
+
+        template.append(content[position:])
+
+        return template
 
     @staticmethod
-    def __read_env_file(file_path, strict):
-        """read and parse env file
+    def __get_template_variables(template):
+        """Get names of variables referenced by template
 
-        :param str file_path: path to file
+        :param list template: compiled template
+        :return: set
+        """
+        return set(piece[0] for piece in template if isinstance(piece, tuple))
+
+    @staticmethod
+    def __render_template(template, cfg, strict, offsets=None):
+        """Substitute variables values into compiled template
+
+        :param list template: compiled template
+        :param dict cfg: configuration variables (environ and .env)
         :param bool strict: strict mode
-        :return: dict
+        :param list offsets: list to collect (start, end, reference) of substituted variables
+        :return: str
         """
-        config = dict()
-        defined = set()
+        pieces = []
+        position = 0
 
-        if file_path:
-            with io.open(file_path, encoding="utf8") as f:
-                content = f.read()  # type: str
+        # not found variables
+        not_found_variables = set()
+
+        for piece in template:
+            text = piece
+
+            if isinstance(piece, tuple):
+                variable, default, text = piece
 
-            # iterate over findings
-            for entry in RE_DOT_ENV.finditer(content):
-                name = entry.group("name")
-                value = entry.group("value")
+                if variable in cfg:
+                    text = cfg[variable]
+                elif default is not None:
+                    text = default
+                elif RE_KEY.match(variable):
+                    # could be reference to config key, resolved after parsing
+                    text = (
+                        u"\ue000"
+                        + variable
+                        + (u"\ue001" if text.startswith("${") else u"\ue002")
+                    )
+                else:
+                    not_found_variables.add(variable)
+
+                if offsets is not None:
+                    offsets.append((position, position + len(text), piece))
 
-                # check double definition
-                if name in config:
-                    defined.add(name)
+            if offsets is not None:
+                position += len(text)
 
-                # set variable name and value
-                config[name] = os.path.expandvars(value) if "$" in value else value
+            pieces.append(text)
 
         # strict mode
-        if strict and defined:
+        if strict and not_found_variables:
             raise ValueError(
                 "Strict mode enabled, variables "
-                + ", ".join(["$" + v for v in defined])
-                + " defined several times!"
+                + ", ".join(["$" + v for v in not_found_variables])
+                + " are not defined!"
             )
 
-        return config
+        return "".join(pieces)
 
     @staticmethod
-    def __read_yaml_file(file_path, cfg, strict, separator="|"):
-        """read and parse yaml file
+    def __get_cache_file(file_path, cache_dir):
+        """Construct compiled cache file path
 
-        :param str file_path: path to file
+        :param str file_path: path to yaml file
+        :param bool|str cache_dir: directory for cache files, True to store next to yaml file
+        :return: str or None if cache disabled
+        """
+        if not cache_dir or not file_path:
+            return None
+
+        if cache_dir is True:
+            directory, name = os.path.split(os.path.abspath(file_path))
+
+            return os.path.join(directory, "." + name + ".envyamlc")
+
+        return os.path.join(
+            cache_dir,
+            "%s-%s.envyamlc"
+            % (
+                os.path.basename(file_path),
+                hashlib.sha256(os.path.realpath(file_path).encode("utf8")).hexdigest()[
+                    :16
+                ],
+            ),
+        )
+
+    @staticmethod
+    def __read_cache_file(cache_file, digest, loader):
+        """Read compiled cache file, ignore it when stale or corrupted
+
+        :param str cache_file: path to cache file
+        :param str digest: sha256 of yaml file content
+        :param type loader: YAML loader class
+        :return: dict or None
+        """
+        try:
+            with io.open(cache_file, "rb") as f:
+                compiled = _CacheUnpickler(f).load()
+
+            if (
+                compiled["version"] == __version__
+                and compiled["digest"] == digest
+                and compiled["loader"] == loader.__name__
+                and isinstance(compiled["template"], list)
+            ):
+                return compiled
+
+        except Exception:
+            pass
+
+        return None
+
+    @staticmethod
+    def __get_values_digest(key, template, cfg, strict):
+        """Keyed digest of variables values referenced by template, values themselves
+        are never written to compiled cache file
+
+        :param bytes key: random key stored with digest
+        :param list template: compiled template
         :param dict cfg: configuration variables (environ and .env)
         :param bool strict: strict mode
-        :return: dict
+        :return: str
         """
+        values = (
+            strict,
+            tuple(
+                (name, name in cfg, cfg.get(name))
+                for name in sorted(EnvYAML.__get_template_variables(template))
+            ),
+        )
 
-        # read and parse files
-        with io.open(file_path, encoding="utf8") as f:
-            content = f.read()  # type:str
+        return hmac.new(key, repr(values).encode("utf8"), hashlib.sha256).hexdigest()
 
-        # remove all comments
-        content = RE_COMMENTS.sub("", content)
+    @staticmethod
+    def __write_cache_file(cache_file, compiled):
+        """Write compiled cache file atomically, errors are ignored
 
-        # not found variables
-        not_found_variables = set()
+        :param str cache_file: path to cache file
+        :param dict compiled: compiled template and config
+        """
+        temp_file = None
 
-        # changes dictionary
-        replaces = dict()
+        try:
+            directory = os.path.dirname(cache_file)
 
-        shifting = 0
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
 
-        # iterate over findings
-        for entry in RE_PATTERN.finditer(content):
-            groups = entry.groupdict()  # type: dict
+            handle, temp_file = tempfile.mkstemp(dir=directory, suffix=".tmp")
 
-            # replace
-            variable = None
-            default = None
-            replace = None
+            with os.fdopen(handle, "wb") as f:
+                pickle.dump(compiled, f, pickle.HIGHEST_PROTOCOL)
 
-            if groups["named"]:
-                variable = groups["named"]
-                default = groups["named_default"]
+            # readers see either old or new file
+            getattr(os, "replace", os.rename)(temp_file, cache_file)
 
-            elif groups["braced"]:
-                variable = groups["braced"]
-                default = groups["braced_default"]
+        except Exception:
+            try:
+                if temp_file:
+                    os.remove(temp_file)
+            except OSError:
+                pass
 
-            elif groups["escaped"] and "$" in groups["escaped"]:
-                span = entry.span()
-                content = (
-                    content[: span[0] + shifting]
-                    + groups["escaped"]
-                    + content[span[1] + shifting :]
+    @staticmethod
+    def __get_loader(name, interpolate="text"):
+        """Get safe YAML loader class by name
+
+        :param str name: "c", "python" or "auto"
+        :param str interpolate: "text" to substitute variables into yaml text, "scalar" into parsed scalars
+        :return: type
+        """
+        if name == "auto":
+            loader = CSafeLoader or SafeLoader
+
+        elif name == "python":
+            loader = SafeLoader
+
+        elif name == "c":
+            if CSafeLoader is None:
+                raise ModuleNotFoundError(
+                    'EnvYAML "c" loader require "pyyaml" built with LibYAML. '
+                    'Consider use "python" or "auto" loader!'
                 )
-                # Added shifting since every time we update content we are
-                # changing the original groups spans
-                shifting += len(groups["escaped"]) - (span[1] - span[0])
 
-            if variable is not None:
-                if variable in cfg:
-                    replace = cfg[variable]
-                elif variable not in cfg and default is not None:
-                    replace = default
-                else:
-                    not_found_variables.add(variable)
+            loader = CSafeLoader
 
-            if replace is not None:
-                # build match
-                search = "${" if groups["braced"] else "$"
-                search += variable
-                search += separator + default if default is not None else ""
-                search += "}" if groups["braced"] else ""
+        else:
+            raise ValueError(
+                'Unknown YAML loader "%s", expected "c", "python" or "auto"!' % name
+            )
 
-                # store findings
-                replaces[search] = replace
+        if interpolate == "scalar":
+            return EnvYAML.__get_scalar_loader(loader)
 
-        # strict mode
-        if strict and not_found_variables:
+        elif interpolate != "text":
             raise ValueError(
-                "Strict mode enabled, variables "
-                + ", ".join(["$" + v for v in not_found_variables])
-                + " are not defined!"
+                'Unknown interpolation "%s", expected "text" or "scalar"!' % interpolate
             )
 
-        # replace finding with there respective values
-        for replace in sorted(replaces, reverse=True):
-            content = content.replace(replace, replaces[replace])
+        return loader
 
-        # load proper content
-        yaml = safe_load(content)
+    @staticmethod
+    def __get_scalar_loader(loader):
+        """Get YAML loader class which substitutes variables into scalars of composed
+        documents
 
-        # if contains somethings
-        if yaml and isinstance(yaml, (dict, list)):
-            return yaml
+        :param type loader: YAML loader class
+        :return: type
+        """
+        scalar_loader = _SCALAR_LOADERS.get(loader)
 
-        # by default return empty dict
-        return {}
+        if scalar_loader is None:
+            scalar_loader = type(
+                "EnvYAMLScalarLoader", (_ScalarInterpolation, loader), {}
+            )
+            _SCALAR_LOADERS[loader] = scalar_loader
+
+        return scalar_loader
+
+    @staticmethod
+    def __get_file_paths(file_path, env_name, default):
+        """Construct list of file paths
+
+        :param str|list file_path: path to file or list of paths
+        :param str env_name: env name
+        :param str default: default file path
+        :return: list of file paths
+        """
+        if isinstance(file_path, (list, tuple)):
+            return list(file_path)
+
+        return [EnvYAML.__get_file_path(file_path, env_name, default)]
 
     @staticmethod
     def __get_file_path(file_path, env_name, default):
@@ -306,59 +4251,41 @@ class EnvYAML:
             return default
 
     @staticmethod
-    def __flat_deep(prefix, config):
-        """Flat siblings
+    def __flat(config):
+        """Flat dictionaries and lists into one dict with '.' separated keys
 
-        :param str prefix: prefix
-        :param any config: configuration
+        :param dict|list config: configuration
         :return: dict
         """
         dest_ = {}
 
-        elements = (
-            enumerate(config)
-            if (isinstance(config, list) or isinstance(config, tuple))
-            else config.items()
-        )  # type: (str, any)
-
-        for key_, value_ in elements:
-            key_ = prefix + "." + str(key_)
-
-            if isinstance(value_, dict):
-                dest_[key_] = value_
-                dest_.update(EnvYAML.__flat_deep(key_, value_))
+        # stack of key prefixes and iterators over not yet visited elements
+        stack = [
+            (
+                "",
+                enumerate(config) if isinstance(config, list) else iter(config.items()),
+            )
+        ]  # type: list
 
-            elif isinstance(value_, list):
-                dest_[key_] = value_
-                dest_.update(EnvYAML.__flat_deep(key_, value_))
+        while stack:
+            prefix, elements = stack[-1]
 
-            else:
+            for key_, value_ in elements:
+                # same keys of many instances share one string
+                key_ = intern(prefix + str(key_))
                 dest_[key_] = value_
 
-        return dest_
-
-    @staticmethod
-    def __flat(config):
-        """Flat dictionaries in recursive way
-
-        :param dict config: configuration
-        :return: dict
-        """
-        dest_ = {}
-
-        for key_, value_ in config.items():
-            key_ = str(key_)
+                # go deeper, current iterator will be resumed after siblings
+                if isinstance(value_, dict):
+                    stack.append((key_ + ".", iter(value_.items())))
+                    break
 
-            if (
-                isinstance(value_, dict)
-                or isinstance(value_, list)
-                or isinstance(value_, type)
-            ):
-                dest_[key_] = value_
-                dest_.update(EnvYAML.__flat_deep(key_, value_))
+                elif isinstance(value_, list):
+                    stack.append((key_ + ".", enumerate(value_)))
+                    break
 
             else:
-                dest_[key_] = value_
+                stack.pop()
 
         return dest_
 
@@ -374,6 +4301,119 @@ class EnvYAML:
         """Set-like object providing a view on keys"""
         return self.__cfg.keys()
 
+    def get_profile(self):
+        """Get profile of last load or reload when profile is enabled: durations of
+        stages in seconds, counters, number of reads by keys and yaml keys which were
+        never read, directly or with their parents or children.
+
+        :return: dict or None when profile is disabled
+        """
+        if self.__profile is None:
+            return None
+
+        report = self.__profile.report()
+        accesses = dict(self.__accesses)
+
+        # parents of read keys are used as well
+        parents = set()
+
+        for key in accesses:
+            if isinstance(key, string_types):
+                parts = key.split(".")
+                parents.update(".".join(parts[:end]) for end in range(1, len(parts)))
+
+        unused = []
+
+        for key in self.__yaml_cfg.keys():
+            name = str(key)
+            parts = name.split(".")
+
+            if key in accesses or name in parents:
+                continue
+
+            # children of read dicts and lists are used too
+            if any(".".join(parts[:end]) in accesses for end in range(1, len(parts))):
+                continue
+
+            unused.append(name)
+
+        report["accesses"] = accesses
+        report["unused"] = sorted(unused)
+
+        return report
+
+    def get_version(self):
+        """Get version of config published by config server, it grows with every
+        change of files
+
+        :return: int or None when config is not received from server
+        """
+        return self.__config_version
+
+    def section(self, prefix):
+        """Get read-only view of nested dict or list with keys relative to prefix. Only
+        this part of config is flattened, when keys are requested.
+
+        :param str prefix: key of nested dict or list
+        :return: view with get, [], in, keys and items
+        """
+        nodes = self.__get_nodes(prefix)
+
+        if not nodes:
+            raise KeyError(prefix)
+
+        views = tuple(_LazyFlatDict(node, self.__flat) for node in nodes)
+
+        return views[0] if len(views) == 1 else _LayeredDict(views)
+
+    def items(self, prefix=None):
+        """Get keys and values of config, only keys starting with "prefix." when prefix
+        is set
+
+        :param str prefix: key of nested dict or list
+        :return: iterable of (key, value)
+        """
+        if prefix is None:
+            return self.export().items()
+
+        flat = {}
+
+        for node in reversed(self.__get_nodes(prefix)):
+            flat.update(self.__flat(node))
+
+        prefix += "."
+
+        return [(intern(prefix + key_), value_) for key_, value_ in flat.items()]
+
+    def __get_nodes(self, prefix):
+        """Find nested dicts or lists by key in layers of config without flattening
+        them, layers are looked up in same order as get does
+
+        :param str prefix: dotted key
+        :return: list of dicts and lists from highest to lowest precedence
+        """
+        cfg = self.__cfg
+
+        if isinstance(cfg, _AccessCounter):
+            cfg = cfg.cfg
+
+        nodes = []
+
+        for layer in cfg.maps if isinstance(cfg, _LayeredDict) else (cfg,):
+            # nested config, walk it by key parts
+            if not self.__flatten and isinstance(layer, dict):
+                layer = _LazyFlatDict(layer, self.__flat)
+
+            node = layer.get(prefix, _MISSING)
+
+            if node is _DELETED:
+                break
+
+            if isinstance(node, (dict, list)):
+                nodes.append(node)
+
+        return nodes
+
     def __contains__(self, item):
         """Check if key in configuration
 
@@ -392,5 +4432,68 @@ class EnvYAML:
         return self.__cfg[key]
 
 
+class EnvYAMLTemplate(object):
+    """Compiled yaml and .env files, created by EnvYAML.compile"""
+
+    __slots__ = (
+        "__render",
+        "templates",
+        "env_config",
+        "variables",
+        "include_environment",
+        "strict",
+        "flatten",
+        "loader",
+        "schema",
+        "env_defined",
+    )
+
+    def __init__(
+        self,
+        render,
+        templates,
+        env_config,
+        variables,
+        include_environment,
+        strict,
+        flatten,
+        loader,
+        schema=None,
+        env_defined=frozenset(),
+    ):
+        """Create compiled template
+
+        :param callable render: function to create EnvYAML instance from template
+        :param tuple templates: comment free yaml files split into text pieces and variable references
+        :param dict env_config: variables from .env files, they are expanded by every render
+        :param frozenset variables: names of variables referenced by yaml and .env files
+        :param bool include_environment: include environment variable
+        :param bool strict: strict mode
+        :param bool|str flatten: whether we should flatten config hierarchy or not, "lazy" to resolve keys on demand
+        :param type loader: YAML loader class
+        :param dict schema: keys and their types
+        :param frozenset env_defined: variables defined several times in .env files
+        """
+        self.__render = render
+        self.templates = templates  # type: tuple
+        self.env_config = env_config  # type: dict
+        self.variables = variables  # type: frozenset
+        self.include_environment = include_environment  # type: bool
+        self.strict = strict  # type: bool
+        self.flatten = flatten  # type: bool
+        self.loader = loader  # type: type
+        self.schema = schema  # type: dict
+        self.env_defined = env_defined  # type: frozenset
+
+    def render(self, env=None, **kwargs):
+        """Create EnvYAML instance with variables from given environment
+
+        :param dict env: environment variables, also for variables in .env files, os.environ by default
+        :param dict kwargs: additional environment variables keys and values
+        :return: new instance of EnvYAML
+        """
+        return self.__render(self, env, kwargs)
+
+
 # export only this
 __all__ = [__version__, EnvYAML]
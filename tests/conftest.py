@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+import sys
+
+# modules with syntax or stdlib which older versions of python do not have
+collect_ignore = []
+
+if sys.version_info < (3, 7):
+    collect_ignore.extend(["test_async.py", "test_dataclasses.py"])
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+
+import asyncio
+import threading
+
+import pytest
+
+from envyaml import EnvYAML
+
+
+def load_async(*args, **kwargs):
+    async def load():
+        return await EnvYAML.aload(*args, **kwargs)
+
+    return asyncio.run(load())
+
+
+@pytest.mark.parametrize(
+    "args,kwargs",
+    [
+        (("tests/env.test.yaml", "tests/test.env"), {}),
+        (("tests/env.test.yaml", "tests/test.env"), {"flatten": "lazy"}),
+        (("tests/env.types.yaml", "tests/test.env"), {"include_environment": False}),
+        (
+            (["tests/env.base.yaml", "tests/env.override.yaml"], "tests/override.env"),
+            {"include_environment": False, "SERVICE_PORT": "1"},
+        ),
+    ],
+)
+def test_it_should_load_async(args, kwargs):
+    assert load_async(*args, **kwargs).export() == EnvYAML(*args, **kwargs).export()
+
+
+def test_it_should_raise_when_load_async():
+    with pytest.raises(ValueError):
+        load_async("tests/env.test.yaml", "tests/test.env", include_environment=False)
+
+
+def test_it_should_load_async_off_loop(monkeypatch):
+    threads = []
+    read_yaml_file = EnvYAML._EnvYAML__read_yaml_file
+
+    def read(*args):
+        threads.append(threading.current_thread())
+
+        return read_yaml_file(*args)
+
+    monkeypatch.setattr(EnvYAML, "_EnvYAML__read_yaml_file", staticmethod(read))
+
+    load_async("tests/env.test.yaml", "tests/test.env")
+
+    assert threads and threading.main_thread() not in threads
+
+
+def test_it_should_reload_async(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text("key: value\n")
+
+    env = EnvYAML(str(path), include_environment=False)
+
+    path.write_text("key: new-value\n")
+
+    async def reload():
+        return await env.areload()
+
+    assert asyncio.run(reload()) == {"key"}
+    assert env["key"] == "new-value"
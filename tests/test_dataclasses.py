@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+
+import dataclasses
+
+import pytest
+
+from envyaml import EnvYAML
+
+
+@dataclasses.dataclass(frozen=True)
+class Database:
+    host: str
+    port: int
+    timeout: float = dataclasses.field(metadata={"envyaml": "duration"})
+    pool: int = 5
+
+
+@dataclasses.dataclass(frozen=True)
+class Service:
+    name: str
+    database: Database
+    tags: list
+    debug: bool = False
+
+
+def test_it_should_bind_dataclass(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text(
+        "name: service\n"
+        "debug: $DEBUG\n"
+        "tags: [a, b]\n"
+        "database:\n"
+        "  host: db.local\n"
+        "  port: $DB_PORT\n"
+        "  timeout: 1m30s\n"
+        "extra: value\n"
+    )
+
+    env = EnvYAML(str(path), include_environment=False, DEBUG="yes", DB_PORT="5432")
+    service = env.to_object(Service)
+
+    assert service == Service(
+        name="service",
+        database=Database(host="db.local", port=5432, timeout=90.0),
+        tags=["a", "b"],
+        debug=True,
+    )
+    assert env.to_object(Service) is service
+
+
+def test_it_should_raise_when_bind_dataclass_failed(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text("debug: maybe\ndatabase:\n  port: many\n  timeout: 10\n")
+
+    env = EnvYAML(str(path), include_environment=False)
+
+    with pytest.raises(ValueError) as e:
+        env.to_object(Service)
+
+    message = str(e.value)
+
+    assert message.startswith("Binding to Service failed")
+    assert "name" in message and "tags" in message and "database.host" in message
+    assert "database.port (int)" in message and "debug (bool)" in message
+
+    with pytest.raises(TypeError):
+        env.to_object(dict)
@@ -1,11 +1,21 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
 
+import io
 import os
+import pickle
+import shutil
+import socket
+import subprocess
 import sys
+import tempfile
+import threading
+import time
 import pytest
+import yaml
 
 from envyaml import EnvYAML
+from envyaml import envyaml
 
 # set os env
 os.environ["TEST_ENV"] = "test-env"
@@ -128,10 +138,14 @@ def test_it_should_populate_env_variable():
     assert env["config.test_env"] == os.environ["TEST_ENV"]
 
 
-def test_it_should_return_dict_on_export():
+def test_it_should_return_read_only_mapping_on_export():
     env = EnvYAML("tests/env.test.yaml", env_file="tests/test.env")
 
-    assert isinstance(env.export(), dict) and len(env.export()) >= 4
+    assert isinstance(env.export(), envyaml.MappingProxyType) and len(env.export()) >= 4
+    assert isinstance(dict(env.export()), dict)
+
+    with pytest.raises(TypeError):
+        env.export()["config"] = "value"
 
 
 def test_it_should_convert_config_to_dict():
@@ -165,7 +179,7 @@ def test_it_should_read_config_from_env_variable():
     env = EnvYAML()
 
     assert env["env_file.project.name"] == "project-x-42"
-    assert isinstance(env.export(), dict) and len(env.export()) >= 4
+    assert isinstance(env.export(), envyaml.MappingProxyType) and len(env.export()) >= 4
 
     del os.environ["ENV_YAML_FILE"]
     del os.environ["ENV_FILE"]
@@ -403,3 +417,1893 @@ def test_it_should_not_flatten():
 
     assert env["config"]["with_default"] == "DEFAULT"
     assert "config.with_default" not in env
+
+
+def test_it_should_not_substitute_escaped_variable_with_same_name():
+    env = EnvYAML("tests/env.default.yaml", "tests/test.env", meet="x", bracket="y")
+
+    assert env["test_escape.two"] == "$meet"
+    assert env["test_escape.three"] == "${bracket}"
+
+
+def test_it_should_flatten_nested_lists_and_dicts():
+    env = EnvYAML(
+        "tests/env.empty.yaml", include_environment=False, nested={"a": [[1, {"b": 2}]]}
+    )
+
+    assert sorted(env.keys()) == [
+        "nested",
+        "nested.a",
+        "nested.a.0",
+        "nested.a.0.0",
+        "nested.a.0.1",
+        "nested.a.0.1.b",
+    ]
+    assert env["nested.a.0.1"] == {"b": 2}
+    assert env["nested.a.0.1.b"] == 2
+
+
+def test_it_should_resolve_lazy_flatten_keys():
+    eager = EnvYAML("tests/env.test.yaml", env_file="tests/test.env")
+    lazy = EnvYAML("tests/env.test.yaml", env_file="tests/test.env", flatten="lazy")
+
+    for key in eager.keys():
+        assert key in lazy
+        assert lazy[key] == eager[key]
+        assert lazy.get(key) == eager[key]
+
+    assert "keys_and_lists.two.9" not in lazy
+    assert "one.two.missing" not in lazy
+    assert lazy.get("one.two.missing", "default") == "default"
+
+    with pytest.raises(KeyError):
+        assert lazy["list_test.01"]
+
+
+def test_it_should_scan_lazy_node_for_non_string_keys_once():
+    scans = []
+
+    class Node(dict):
+        def items(self):
+            scans.append(self)
+
+            return dict.items(self)
+
+    ports = Node({80: "http", 443: "https"})
+    lazy = envyaml._LazyFlatDict(
+        Node(name="service", ports=ports), EnvYAML._EnvYAML__flat
+    )
+
+    assert lazy["ports.80"] == "http"
+    assert lazy["ports.443"] == "https"
+    assert "ports.8080" not in lazy
+
+    for _ in range(3):
+        assert "MISSING_VARIABLE" not in lazy
+
+    assert len(scans) == 2 and ports in scans
+
+
+def test_it_should_materialize_lazy_flatten_on_export():
+    eager = EnvYAML("tests/env.list.yaml", env_file="tests/test.env")
+    lazy = EnvYAML("tests/env.list.yaml", env_file="tests/test.env", flatten="lazy")
+
+    assert lazy["0.testing_1.env.username"] == "env-username"
+    assert set(lazy.keys()) == set(eager.keys())
+    assert lazy.export() == eager.export()
+    assert lazy["2.testing_3.env.username"] == "env-username"
+
+
+def test_it_should_resolve_lazy_keys_with_dots():
+    env = EnvYAML(
+        "tests/env.empty.yaml",
+        include_environment=False,
+        flatten="lazy",
+        **{"a.b": {"c.d": [{"e": 1}]}}
+    )
+
+    assert env["a.b.c.d.0.e"] == 1
+    assert env["a.b.c.d"] == [{"e": 1}]
+
+
+@pytest.mark.skipif(envyaml.CSafeLoader is None, reason="PyYAML built without LibYAML")
+@pytest.mark.parametrize(
+    "yaml_file,env_file",
+    [
+        ("tests/env.test.yaml", "tests/test.env"),
+        ("tests/env.default.yaml", "tests/test.env"),
+        ("tests/env.list.yaml", "tests/test.env"),
+        ("tests/env.ignored.yaml", "tests/test.empty.env"),
+        ("tests/env.types.yaml", "tests/test.env"),
+        ("tests/env.empty.yaml", None),
+    ],
+)
+def test_it_should_load_same_config_with_c_and_python_loaders(yaml_file, env_file):
+    c = EnvYAML(yaml_file, env_file, strict=False, loader="c")
+    python = EnvYAML(yaml_file, env_file, strict=False, loader="python")
+
+    assert c.export() == python.export()
+
+
+def test_it_should_use_default_yaml_loader(monkeypatch):
+    monkeypatch.setattr(EnvYAML, "DEFAULT_YAML_LOADER", "python")
+
+    env = EnvYAML("tests/env.types.yaml", "tests/test.env")
+
+    assert env["service.port"] == 8080
+    assert env["service.timeout"] == 30
+    assert env["service.tags"] == {"a", "b"}
+
+
+def test_it_should_raise_exception_on_unknown_loader():
+    with pytest.raises(ValueError):
+        EnvYAML("tests/env.empty.yaml", loader="unsafe")
+
+
+def test_it_should_return_cached_instance():
+    EnvYAML.cache_clear()
+
+    env = EnvYAML.cached("tests/env.test.yaml", env_file="tests/test.env")
+
+    assert EnvYAML.cached("tests/env.test.yaml", env_file="tests/test.env") is env
+    assert EnvYAML.cached("tests/env.test.yaml", "tests/test.env", BAR="Y") is not env
+    assert (
+        EnvYAML.cached("tests/env.test.yaml", "tests/test.env", strict=False) is not env
+    )
+
+    EnvYAML.cache_clear()
+
+    assert EnvYAML.cached("tests/env.test.yaml", env_file="tests/test.env") is not env
+
+
+def test_it_should_invalidate_cached_instance_when_referenced_variable_changed(
+    monkeypatch,
+):
+    EnvYAML.cache_clear()
+
+    env = EnvYAML.cached("tests/env.test.yaml", env_file="tests/test.env")
+
+    # not referenced from files
+    monkeypatch.setenv("NOT_REFERENCED_ENV", "value")
+
+    assert EnvYAML.cached("tests/env.test.yaml", env_file="tests/test.env") is env
+
+    monkeypatch.setenv("BAR", "BAR")
+
+    changed = EnvYAML.cached("tests/env.test.yaml", env_file="tests/test.env")
+
+    assert changed is not env
+    assert changed["complex"] == "xxxBARyyy"
+
+    EnvYAML.cache_clear()
+
+
+def test_it_should_invalidate_cached_instance_when_file_changed(tmp_path):
+    EnvYAML.cache_clear()
+
+    path = tmp_path / "env.yaml"
+    path.write_text("key: one\n")
+
+    env = EnvYAML.cached(str(path))
+
+    assert env["key"] == "one"
+
+    path.write_text("key: three\n")
+
+    assert EnvYAML.cached(str(path))["key"] == "three"
+
+    EnvYAML.cache_clear()
+
+
+def test_it_should_not_change_cached_instance(tmp_path, monkeypatch):
+    EnvYAML.cache_clear()
+
+    path = tmp_path / "env.yaml"
+    path.write_text("host: $ENVYAML_CACHED_HOST\n")
+
+    monkeypatch.setenv("ENVYAML_CACHED_HOST", "prod")
+
+    env = EnvYAML.cached(str(path))
+
+    with pytest.raises(RuntimeError, match="Cached"):
+        env.update_env({"ENVYAML_CACHED_HOST": "tenant-x"})
+
+    with pytest.raises(RuntimeError, match="Cached"):
+        env.reload()
+
+    with pytest.raises(RuntimeError, match="Cached"):
+        env.watch()
+
+    assert EnvYAML.cached(str(path)) is env
+    assert env["host"] == "prod"
+
+    EnvYAML.cache_clear()
+
+
+def test_it_should_drop_least_recently_used_cached_instance(monkeypatch):
+    EnvYAML.cache_clear()
+    monkeypatch.setattr(EnvYAML, "CACHE_SIZE", 2)
+
+    first = EnvYAML.cached("tests/env.empty.yaml", FIRST="1")
+    second = EnvYAML.cached("tests/env.empty.yaml", SECOND="2")
+
+    # use first one, so second become least recently used
+    assert EnvYAML.cached("tests/env.empty.yaml", FIRST="1") is first
+
+    EnvYAML.cached("tests/env.empty.yaml", THIRD="3")
+
+    assert EnvYAML.cached("tests/env.empty.yaml", FIRST="1") is first
+    assert EnvYAML.cached("tests/env.empty.yaml", SECOND="2") is not second
+
+    EnvYAML.cache_clear()
+
+
+def test_it_should_write_and_use_compiled_cache(tmp_path, monkeypatch):
+    path = tmp_path / "env.yaml"
+    path.write_text(io.open("tests/env.types.yaml", encoding="utf8").read())
+
+    env = EnvYAML(str(path), "tests/test.env", cache_dir=True)
+
+    assert (tmp_path / ".env.yaml.envyamlc").exists()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("text should not be scanned")
+
+    # same file, comment free text and variables are taken from compiled cache
+    monkeypatch.setattr(EnvYAML, "_EnvYAML__compile_template", fail)
+
+    cached = EnvYAML(str(path), "tests/test.env", cache_dir=True)
+    changed = EnvYAML(str(path), "tests/test.env", cache_dir=True, PORT="9090")
+
+    assert cached.export() == env.export()
+    assert changed["service.port"] == 9090
+    assert changed["service.name"] == "project-x"
+
+
+def test_it_should_not_write_variables_values_to_compiled_cache(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text("key: $SECRET_VALUE\n")
+
+    env = EnvYAML(str(path), cache_dir=True, SECRET_VALUE="hunter2")
+
+    assert env["key"] == "hunter2"
+    assert b"hunter2" not in (tmp_path / ".env.yaml.envyamlc").read_bytes()
+
+    EnvYAML(str(path), cache_dir=True, cache_config=True, SECRET_VALUE="hunter2")
+
+    assert b"hunter2" in (tmp_path / ".env.yaml.envyamlc").read_bytes()
+
+    # parsed config stored before is dropped without cache_config
+    EnvYAML(str(path), cache_dir=True, SECRET_VALUE="hunter2")
+
+    assert b"hunter2" not in (tmp_path / ".env.yaml.envyamlc").read_bytes()
+
+
+@pytest.mark.skipif(
+    sys.version_info[0] < 3, reason="timezone of PyYAML for python 2 is not picklable"
+)
+def test_it_should_use_parsed_config_from_compiled_cache(tmp_path, monkeypatch):
+    path = tmp_path / "env.yaml"
+    path.write_text(io.open("tests/env.types.yaml", encoding="utf8").read())
+
+    env = EnvYAML(str(path), "tests/test.env", cache_dir=True, cache_config=True)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("YAML should not be parsed")
+
+    # same file and variables, config is taken from compiled cache
+    monkeypatch.setattr(envyaml, "load", fail)
+
+    cached = EnvYAML(str(path), "tests/test.env", cache_dir=True, cache_config=True)
+
+    assert cached.export() == env.export()
+
+    # variable changed, config is parsed again
+    with pytest.raises(AssertionError):
+        EnvYAML(
+            str(path), "tests/test.env", cache_dir=True, cache_config=True, PORT="9090"
+        )
+
+    monkeypatch.undo()
+
+    changed = EnvYAML(
+        str(path), "tests/test.env", cache_dir=True, cache_config=True, PORT="9090"
+    )
+
+    assert changed["service.port"] == 9090
+
+
+def test_it_should_invalidate_compiled_cache_when_file_changed(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text("key: $KEY_VALUE|one\n")
+
+    assert EnvYAML(str(path), cache_dir=str(tmp_path / "cache"))["key"] == "one"
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+    path.write_text("key: $KEY_VALUE|two\n")
+
+    assert EnvYAML(str(path), cache_dir=str(tmp_path / "cache"))["key"] == "two"
+
+
+def test_it_should_ignore_corrupted_compiled_cache(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text("key: $KEY_VALUE|one\n")
+
+    for content in (b"", b"corrupted", pickle.dumps({"version": None})):
+        (tmp_path / ".env.yaml.envyamlc").write_bytes(content)
+
+        assert EnvYAML(str(path), cache_dir=True)["key"] == "one"
+
+
+def test_it_should_keep_strict_mode_with_compiled_cache(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text("key: $NOT_DEFINED_VALUE\n")
+
+    assert (
+        EnvYAML(str(path), strict=False, cache_dir=True)["key"] == "$NOT_DEFINED_VALUE"
+    )
+
+    with pytest.raises(ValueError):
+        EnvYAML(str(path), cache_dir=True)
+
+
+def test_it_should_render_compiled_template(monkeypatch):
+    template = EnvYAML.compile("tests/env.test.yaml", env_file="tests/test.env")
+
+    assert {"PROJECT_NAME", "BAR", "TEST_ENV"} <= template.variables
+
+    def fail(*args, **kwargs):
+        raise AssertionError("files should not be read or scanned")
+
+    monkeypatch.setattr(envyaml.io, "open", fail)
+    monkeypatch.setattr(envyaml, "RE_PATTERN", None)
+
+    default = template.render()
+    tenant = template.render(env={"TEST_ENV": "tenant-env"}, BAR="BAR")
+
+    monkeypatch.undo()
+
+    assert default.export() == EnvYAML("tests/env.test.yaml", "tests/test.env").export()
+
+    assert tenant["config.test_env"] == "tenant-env"
+    assert tenant["complex"] == "xxxBARyyy"
+    assert tenant["env_file.project.name"] == "project-x-42"
+    assert "PATH" not in tenant
+
+
+def test_it_should_expand_env_file_when_render_template(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", "/compile")
+
+    template = EnvYAML.compile("tests/env.test.yaml", env_file="tests/test.env")
+
+    assert "HOME" in template.variables
+
+    tenant = template.render(env={"HOME": "/tenant", "TEST_ENV": "x", "BAR": "y"})
+
+    assert tenant["MY_SOURCE_DIRECTORY"] == "/tenant/mapped/source/directory"
+
+    # environment of render, not of compile
+    monkeypatch.setenv("HOME", "/render")
+
+    assert (
+        template.render().export()
+        == EnvYAML("tests/env.test.yaml", "tests/test.env").export()
+    )
+    assert template.render()["MY_SOURCE_DIRECTORY"] == "/render/mapped/source/directory"
+
+    # strict mode is checked by every render
+    path = tmp_path / "twice.env"
+    path.write_text("NAME=first\nNAME=second\n")
+
+    template = EnvYAML.compile("tests/env.empty.yaml", env_file=str(path))
+
+    with pytest.raises(ValueError, match="defined several times"):
+        template.render(env={})
+
+    assert template.render(env={"ENVYAML_STRICT_DISABLE": ""})["NAME"] == "second"
+
+
+def test_it_should_raise_exception_in_strict_mode_when_render_template():
+    template = EnvYAML.compile("tests/env.test.yaml", env_file="tests/test.env")
+
+    with pytest.raises(ValueError):
+        template.render(env={})
+
+    env = EnvYAML.compile(
+        "tests/env.test.yaml", env_file="tests/test.env", strict=False, flatten=False
+    ).render(env={})
+
+    assert env["config"]["test_env"] == "$TEST_ENV"
+
+
+def test_it_should_reload_config(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text("one: 1\ntwo:\n  three: 3\n  four: 4\n")
+
+    env = EnvYAML(str(path), include_environment=False)
+    previous = env.export()
+
+    path.write_text("one: 1\ntwo:\n  three: 33\n  four: 4\nfive: 5\n")
+
+    assert env.reload() == {"two", "two.three", "five"}
+    assert env["two.three"] == 33
+    assert previous["two.three"] == 3
+
+    assert env.reload() == set()
+
+
+def test_it_should_keep_config_when_reload_failed(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text("key: value\n")
+
+    env = EnvYAML(str(path))
+
+    path.write_text("key: $NOT_DEFINED_VALUE\n")
+
+    with pytest.raises(ValueError):
+        env.reload()
+
+    assert env["key"] == "value"
+
+    with pytest.raises(RuntimeError):
+        EnvYAML.compile(str(path), strict=False).render().reload()
+
+
+def test_it_should_watch_files_and_reload_config(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text("key: value\n")
+
+    env = EnvYAML(str(path), include_environment=False)
+
+    changes = []
+    errors = []
+    reloaded = threading.Event()
+    failed = threading.Event()
+
+    def callback(changed):
+        changes.append(changed)
+        reloaded.set()
+
+    def on_error(error):
+        errors.append(error)
+        failed.set()
+
+    env.watch(interval=0.01, callback=callback, on_error=on_error)
+
+    try:
+        # wait watcher to remember files identity
+        time.sleep(0.1)
+
+        path.write_text("key: $NOT_DEFINED_VALUE\n")
+
+        assert failed.wait(5)
+
+        # broken file is reported once, not on every check
+        time.sleep(0.1)
+
+        assert len(errors) == 1
+        assert env["key"] == "value"
+
+        path.unlink()
+        time.sleep(0.1)
+
+        assert len(errors) == 2
+
+        path.write_text("key: new-value\n")
+
+        assert reloaded.wait(5)
+    finally:
+        env.unwatch()
+
+    assert isinstance(errors[0], ValueError)
+    assert len(errors) == 2
+    assert changes == [{"key"}]
+    assert env["key"] == "new-value"
+
+
+@pytest.mark.parametrize("flatten", [True, "lazy", False])
+def test_it_should_update_env_and_recompute_dependent_values(flatten, monkeypatch):
+    env = EnvYAML("tests/env.test.yaml", "tests/test.env", flatten=flatten)
+    variables = dict(BAR="BAR", TEST_ENV="new-env", USERNAME="new-user", NEW="new")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("whole config should not be parsed")
+
+    monkeypatch.setattr(EnvYAML, "_EnvYAML__load_template", fail)
+
+    changed = env.update_env(variables)
+
+    monkeypatch.undo()
+
+    expected = EnvYAML(
+        "tests/env.test.yaml", "tests/test.env", flatten=flatten, **variables
+    )
+
+    assert env.export() == expected.export()
+    assert {
+        "BAR",
+        "NEW",
+        "complex",
+        "config",
+        "config.test_env",
+        "var_in_array.to.0",
+        "var_in_dict.extra.user",
+    } <= changed
+    assert "one.two.three.value" not in changed
+
+    assert env.update_env(variables) == set()
+
+
+def test_it_should_update_env_with_anchors():
+    env = EnvYAML("tests/env.anchors.yaml", include_environment=False, DB_HOST="a")
+
+    assert env.update_env({"DB_HOST": "b"}) == {
+        "DB_HOST",
+        "base",
+        "base.host",
+        "primary",
+        "primary.host",
+        "replica",
+        "replica.host",
+        "hosts",
+        "hosts.0",
+        "hosts.1",
+        "url",
+    }
+    assert env["primary.host"] == "b"
+    assert env["replica.host"] == "b"
+    assert env["hosts"] == ["b", "b-replica"]
+    assert env["url"] == "postgres://b:5432/db"
+
+    env.update_env({"DB_PORT": "6432"})
+
+    expected = EnvYAML(
+        "tests/env.anchors.yaml", include_environment=False, DB_HOST="b", DB_PORT="6432"
+    )
+
+    assert env.export() == expected.export()
+    assert env["replica.port"] == 5433
+
+
+def test_it_should_update_env_repeatedly(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text(
+        "".join("section%d:\n  name: name%d\n" % (i, i) for i in range(20))
+        + "service:\n  host: $HOST\n  url: http://$HOST:$PORT\n"
+    )
+
+    env = EnvYAML(str(path), include_environment=False, HOST="a", PORT="1")
+
+    for host, port in [("b", "1"), ("c", "2"), ("d", "2")]:
+        env.update_env({"HOST": host, "PORT": port})
+
+        expected = EnvYAML(str(path), include_environment=False, HOST=host, PORT=port)
+
+        assert env.export() == expected.export()
+        assert env.to_object() == expected.to_object()
+        assert env["service"] == {"host": host, "url": "http://%s:%s" % (host, port)}
+
+    assert env.freeze()["service.url"] == "http://d:2"
+
+
+def test_it_should_update_env_when_structure_changed():
+    env = EnvYAML("tests/env.anchors.yaml", include_environment=False, DB_HOST="a")
+
+    # comma splits flow sequence items
+    env.update_env({"DB_HOST": "b, c"})
+
+    assert env["hosts"] == ["b", "c", "b, c-replica"]
+
+    with pytest.raises(ValueError):
+        env.update_env({"DB_HOST": None})
+
+    with pytest.raises(Exception):
+        env.update_env({"DB_HOST": "d: e"})
+
+    assert env["hosts"] == ["b", "c", "b, c-replica"]
+
+
+@pytest.mark.parametrize(
+    "content, value",
+    [
+        ("ports: [$A]\n", ""),
+        ("ports: [$A]\n", " "),
+        ("ports: [$A]\n", "#x"),
+        ("ports: [$A]\n", "a:b"),
+        ("ports: [a-$A]\n", "a #b"),
+        ("port: $A\nhost: localhost\n", "|"),
+        ("port: $A\nhost: localhost\n", ">"),
+        ("port: $A\n", "'x'"),
+    ],
+)
+def test_it_should_update_env_same_as_load(tmp_path, content, value):
+    path = tmp_path / "env.yaml"
+    path.write_text(content)
+
+    env = EnvYAML(str(path), include_environment=False, A="1")
+
+    try:
+        expected = EnvYAML(str(path), include_environment=False, A=value).export()
+    except Exception as error:
+        with pytest.raises(type(error)):
+            env.update_env({"A": value})
+    else:
+        env.update_env({"A": value})
+
+        assert env.export() == expected
+
+
+def test_it_should_take_snapshot_of_environment(monkeypatch):
+    monkeypatch.setenv("ENVYAML_LAYER_TEST", "before")
+    monkeypatch.setenv("ENVYAML_LAYER_VALUE", "before")
+    monkeypatch.delenv("ENVYAML_LAYER_NEW", raising=False)
+
+    env = EnvYAML("tests/env.test.yaml", env_file="tests/test.env", strict=False)
+
+    assert env["ENVYAML_LAYER_TEST"] == "before"
+
+    monkeypatch.setenv("ENVYAML_LAYER_TEST", "after")
+    monkeypatch.setenv("ENVYAML_LAYER_NEW", "new")
+    monkeypatch.delenv("ENVYAML_LAYER_VALUE")
+
+    # later changes of environment are not visible
+    assert env["ENVYAML_LAYER_TEST"] == "before"
+    assert env.export()["ENVYAML_LAYER_TEST"] == "before"
+    assert env["ENVYAML_LAYER_VALUE"] == "before"
+    assert "ENVYAML_LAYER_NEW" not in env
+    assert "ENVYAML_LAYER_NEW" not in env.keys()
+    assert env.get(1) is None
+
+
+def test_it_should_keep_layers_precedence(monkeypatch):
+    monkeypatch.setenv("PROJECT_NAME", "environ")
+    monkeypatch.setenv("TEST_ENV", "environ")
+
+    env = EnvYAML("tests/env.test.yaml", env_file="tests/test.env", TEST_ENV="kwargs")
+
+    # .env file has precedence over environment, kwargs over .env file
+    assert env["PROJECT_NAME"] == "project-x"
+    assert env["TEST_ENV"] == "kwargs"
+    assert env.export()["TEST_ENV"] == "kwargs"
+
+    # yaml keys have precedence over variables
+    env = EnvYAML("tests/env.test.yaml", env_file="tests/test.env", config="kwargs")
+
+    assert env["config"] != "kwargs"
+    assert env.export()["config"] == env["config"]
+
+
+def test_it_should_hide_removed_variables(monkeypatch):
+    monkeypatch.setenv("ENVYAML_LAYER_TEST", "environ")
+
+    env = EnvYAML("tests/env.test.yaml", env_file="tests/test.env")
+
+    assert "ENVYAML_LAYER_TEST" in env.update_env({"ENVYAML_LAYER_TEST": None})
+    assert "ENVYAML_LAYER_TEST" not in env
+    assert "ENVYAML_LAYER_TEST" not in env.export()
+    assert os.environ["ENVYAML_LAYER_TEST"] == "environ"
+
+
+def test_it_should_read_env_file_line_by_line(tmp_path):
+    path = tmp_path / "big.env"
+    lines = ["# generated", "", "9WRONG=1", "SPACED = value", "EMPTY="]
+    lines += ['KEY_%d="value-%d"' % (i, i) for i in range(1000)]
+    lines += ["QUOTED='single'", "LAST=no-newline"]
+    path.write_bytes("\r\n".join(lines).encode("utf8"))
+
+    with io.open(str(path), encoding="utf8") as f:
+        expected = dict(
+            (entry.group("name"), entry.group("value"))
+            for entry in envyaml.RE_DOT_ENV.finditer(f.read())
+        )
+
+    env = EnvYAML(
+        "tests/env.test.yaml",
+        env_file=str(path),
+        include_environment=False,
+        strict=False,
+    )
+
+    assert env["KEY_999"] == "value-999"
+    assert env["QUOTED"] == "single"
+    assert env["LAST"] == "no-newline"
+    assert "9WRONG" not in env and "SPACED " not in env
+    assert dict((key, env[key]) for key in expected) == expected
+
+
+def test_it_should_merge_several_files():
+    env = EnvYAML(
+        ["tests/env.base.yaml", "tests/env.override.yaml"],
+        ["tests/base.env", "tests/override.env"],
+        include_environment=False,
+        strict=False,
+    )
+
+    assert env["service"] == {
+        "name": "service-override",
+        "port": 9090,
+        "tags": ["override"],
+        "database": {
+            "host": "db.override",
+            "port": 5432,
+            "options": {"timeout": 10, "ssl": True},
+        },
+    }
+    assert env["service.database.options.timeout"] == 10
+    assert env["service.database.options.ssl"] is True
+    assert env["service.tags.0"] == "override"
+    assert "service.tags.1" not in env
+    assert env["logging.level"] == "info"
+    assert env["region"] == "eu-west-1"
+    assert env["SERVICE_PORT"] == "9090"
+
+
+def test_it_should_raise_on_variables_defined_in_several_env_files():
+    with pytest.raises(ValueError, match=r"\$(SERVICE_NAME|DB_HOST)"):
+        EnvYAML(
+            ["tests/env.base.yaml", "tests/env.override.yaml"],
+            ["tests/base.env", "tests/override.env"],
+            include_environment=False,
+        )
+
+
+@pytest.mark.skipif(
+    envyaml.ThreadPoolExecutor is None, reason="requires concurrent.futures"
+)
+def test_it_should_read_several_files_in_thread_pool(monkeypatch):
+    threads = set()
+    read_yaml_file = EnvYAML._EnvYAML__read_yaml_file
+
+    def read(*args):
+        threads.add(threading.current_thread().name)
+        time.sleep(0.05)
+
+        return read_yaml_file(*args)
+
+    monkeypatch.setattr(EnvYAML, "_EnvYAML__read_yaml_file", staticmethod(read))
+
+    env = EnvYAML(
+        ["tests/env.base.yaml", "tests/env.override.yaml"],
+        "tests/override.env",
+        include_environment=False,
+    )
+
+    assert env["service.name"] == "service-override"
+    assert len(threads) == 2 and threading.current_thread().name not in threads
+
+
+def test_it_should_not_change_parsed_files_when_merge():
+    template = EnvYAML.compile(
+        ["tests/env.base.yaml", "tests/env.override.yaml"],
+        "tests/override.env",
+        include_environment=False,
+    )
+
+    first = template.render(SERVICE_PORT="1")
+    second = template.render(SERVICE_PORT="2", DB_HOST="db.other")
+
+    assert first["service.port"] == 1
+    assert first["service.database.host"] == "db.override"
+    assert second["service.port"] == 2
+    assert second["service.database.host"] == "db.other"
+    assert second["service.database.options"] == {"timeout": 10, "ssl": True}
+
+
+def test_it_should_update_env_of_several_files():
+    env = EnvYAML(
+        ["tests/env.base.yaml", "tests/env.override.yaml"],
+        "tests/override.env",
+        include_environment=False,
+    )
+
+    assert "service.database.host" in env.update_env({"DB_HOST": "db.new"})
+    assert env["service.database.host"] == "db.new"
+    assert env["service.database.options.ssl"] is True
+
+
+def test_it_should_export_config_without_copy(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text("service:\n  name: service\n  port: ${PORT|80}\n")
+
+    env = EnvYAML(str(path), include_environment=False)
+    exported = env.export()
+
+    # no environment layers, view of current config
+    assert exported == {
+        "service": env["service"],
+        "service.name": "service",
+        "service.port": 80,
+    }
+    assert exported["service.port"] is env["service.port"]
+
+    env.update_env({"PORT": "8080"})
+
+    # config is replaced, previous export is a snapshot
+    assert exported["service.port"] == 80
+    assert env.export()["service.port"] == 8080
+
+
+@pytest.mark.skipif(
+    sys.version_info[0] < 3, reason="python 2 interns only byte strings"
+)
+def test_it_should_share_flattened_keys_between_instances():
+    first = EnvYAML("tests/env.test.yaml", "tests/test.env")
+    second = EnvYAML("tests/env.test.yaml", "tests/test.env")
+
+    keys = dict((key, key) for key in first.keys())
+
+    assert all(keys[key] is key for key in second.keys() if "." in key)
+
+
+@pytest.mark.parametrize("flatten", [True, "lazy", False])
+def test_it_should_get_section(flatten):
+    env = EnvYAML("tests/env.test.yaml", "tests/test.env", flatten=flatten)
+    section = env.section("keys_and_lists")
+
+    assert section["one.0"] == "one"
+    assert section.get("two.1.super.one") == "one"
+    assert section.get("missing", "default") == "default"
+    assert "two" in section and "keys_and_lists" not in section
+    assert set(section.keys()) == set(
+        key[len("keys_and_lists.") :]
+        for key in EnvYAML("tests/env.test.yaml", "tests/test.env").keys()
+        if key.startswith("keys_and_lists.")
+    )
+
+    assert env.section("keys_and_lists.one")["0"] == "one"
+    assert env.section("one.two").get("three.value") == "one-two-three-value"
+
+    with pytest.raises(KeyError):
+        env.section("missing")
+
+    with pytest.raises(KeyError):
+        env.section("keys_and_lists.one.0")
+
+
+@pytest.mark.parametrize("flatten", [True, "lazy", False])
+def test_it_should_get_items_with_prefix(flatten):
+    env = EnvYAML("tests/env.test.yaml", "tests/test.env", flatten=flatten)
+    flat = EnvYAML("tests/env.test.yaml", "tests/test.env")
+
+    assert dict(env.items(prefix="keys_and_lists")) == dict(
+        (key, flat[key]) for key in flat.keys() if key.startswith("keys_and_lists.")
+    )
+    assert list(env.items(prefix="missing")) == []
+    assert list(env.items(prefix="one.two.three.value")) == []
+    assert dict(env.items()) == dict(env.export())
+
+
+@pytest.mark.parametrize("flatten", [True, "lazy", False])
+def test_it_should_get_section_of_nested_kwargs(flatten):
+    env = EnvYAML(
+        "tests/env.test.yaml",
+        "tests/test.env",
+        flatten=flatten,
+        **{"db": {"host": "localhost", "ports": [5432]}, "keys_and_lists": {"x": 1}}
+    )
+
+    assert env.section("db")["host"] == "localhost"
+    assert env.section("db").get("ports.0") == 5432
+    assert dict(env.items(prefix="db")) == {
+        "db.host": "localhost",
+        "db.ports": [5432],
+        "db.ports.0": 5432,
+    }
+
+    # yaml keys have precedence, rest of keys come from kwargs
+    section = env.section("keys_and_lists")
+
+    assert section["x"] == 1 and section["one.0"] == "one"
+    assert dict(env.items(prefix="keys_and_lists"))["keys_and_lists.x"] == 1
+
+    if flatten:
+        assert env.get("db.host") == env.section("db")["host"]
+        assert env.get("keys_and_lists.x") == section["x"]
+        assert dict(section.items())["x"] == 1
+
+
+def test_it_should_not_flatten_whole_config_for_section(monkeypatch):
+    env = EnvYAML("tests/env.test.yaml", "tests/test.env", flatten="lazy")
+    flat = EnvYAML._EnvYAML__flat
+    roots = []
+
+    def record(config):
+        roots.append(config)
+
+        return flat(config)
+
+    monkeypatch.setattr(EnvYAML, "_EnvYAML__flat", staticmethod(record))
+
+    dict(env.items(prefix="keys_and_lists"))
+    list(env.section("keys_and_lists").keys())
+
+    assert roots and all(root is env["keys_and_lists"] for root in roots)
+
+
+@pytest.mark.parametrize(
+    "getter,value,expected",
+    [
+        ("get_int", "42", 42),
+        ("get_int", 42, 42),
+        ("get_int", 42.0, 42),
+        ("get_float", "0.5", 0.5),
+        ("get_float", 2, 2.0),
+        ("get_bool", "true", True),
+        ("get_bool", "Off", False),
+        ("get_bool", "", False),
+        ("get_bool", 1, True),
+        ("get_list", "a, b,c", ["a", "b", "c"]),
+        ("get_list", "", []),
+        ("get_list", ["a"], ["a"]),
+        ("get_duration", "1.5", 1.5),
+        ("get_duration", "500ms", 0.5),
+        ("get_duration", "1h30m", 5400.0),
+        ("get_duration", "1d 2h", 93600.0),
+        ("get_duration", 10, 10.0),
+        ("get_bytes", "512", 512),
+        ("get_bytes", "10k", 10000),
+        ("get_bytes", "256Mi", 268435456),
+        ("get_bytes", "1.5 GiB", 1610612736),
+        ("get_bytes", "2MB", 2000000),
+        ("get_bytes", 1024, 1024),
+    ],
+)
+def test_it_should_convert_typed_values(getter, value, expected):
+    env = EnvYAML("tests/env.test.yaml", "tests/test.env", VALUE=value)
+
+    assert getattr(env, getter)("VALUE") == expected
+    assert getattr(env, getter)("MISSING_VALUE") is None
+    assert getattr(env, getter)("MISSING_VALUE", "default") == "default"
+
+
+@pytest.mark.parametrize(
+    "getter,value",
+    [
+        ("get_int", "4.2"),
+        ("get_int", True),
+        ("get_float", "abc"),
+        ("get_bool", "maybe"),
+        ("get_bool", 2),
+        ("get_list", {"a": 1}),
+        ("get_duration", "1x"),
+        ("get_duration", "h"),
+        ("get_bytes", "10 apples"),
+    ],
+)
+def test_it_should_raise_when_typed_value_is_wrong(getter, value):
+    env = EnvYAML("tests/env.test.yaml", "tests/test.env", VALUE=value)
+
+    with pytest.raises(ValueError, match='"VALUE" could not be converted'):
+        getattr(env, getter)("VALUE")
+
+
+def test_it_should_not_share_memoized_list():
+    env = EnvYAML("tests/env.test.yaml", "tests/test.env", VALUE="a, b")
+
+    env.get_list("VALUE").append("c")
+
+    assert env.get_list("VALUE") == ["a", "b"]
+    assert env.get_list("VALUE") is not env.get_list("VALUE")
+
+
+def test_it_should_memoize_typed_values(monkeypatch):
+    env = EnvYAML("tests/env.test.yaml", "tests/test.env", SIZE="10")
+    calls = []
+
+    def to_int(value):
+        calls.append(value)
+
+        return int(value)
+
+    monkeypatch.setitem(envyaml._CONVERTERS, "int", to_int)
+
+    assert env.get_int("SIZE") == 10
+    assert env.get_int("SIZE") == 10
+    assert calls == ["10"]
+
+    env.update_env({"SIZE": "20"})
+
+    assert env.get_int("SIZE") == 20
+    assert env.get_int("SIZE") == 20
+    assert calls == ["10", "20"]
+
+    monkeypatch.setenv("ENVYAML_TYPED_TEST", "30")
+
+    env = EnvYAML("tests/env.test.yaml", "tests/test.env")
+
+    assert env.get_int("ENVYAML_TYPED_TEST") == 30
+    assert env.get_int("ENVYAML_TYPED_TEST") == 30
+
+    # environment is snapshot taken on construction
+    monkeypatch.setenv("ENVYAML_TYPED_TEST", "40")
+
+    assert env.get_int("ENVYAML_TYPED_TEST") == 30
+    assert calls == ["10", "20", "30"]
+
+
+def test_it_should_validate_schema_at_load(monkeypatch):
+    schema = {
+        "PROJECT_ID": "int",
+        "one.two.three.value": str,
+        "keys_and_lists.one": list,
+        "TIMEOUT": "duration",
+    }
+
+    env = EnvYAML("tests/env.test.yaml", "tests/test.env", schema=schema, TIMEOUT="5s")
+
+    def fail(value):
+        raise AssertionError("value should be converted at load")
+
+    monkeypatch.setitem(envyaml._CONVERTERS, "int", fail)
+    monkeypatch.setitem(envyaml._CONVERTERS, "duration", fail)
+
+    assert env.get_int("PROJECT_ID") == 42
+    assert env.get_duration("TIMEOUT") == 5.0
+
+    monkeypatch.undo()
+
+    with pytest.raises(ValueError) as e:
+        EnvYAML(
+            "tests/env.test.yaml",
+            "tests/test.env",
+            schema=dict(schema, MISSING="int", USERNAME="bool", PASSWORD="bytes"),
+        )
+
+    message = str(e.value)
+
+    assert "MISSING" in message and "TIMEOUT" in message
+    assert "USERNAME (bool)" in message and "PASSWORD (bytes)" in message
+    assert "PROJECT_ID" not in message
+
+    with pytest.raises(ValueError, match="Unknown schema type"):
+        EnvYAML("tests/env.test.yaml", "tests/test.env", schema={"PROJECT_ID": "uuid"})
+
+
+def test_it_should_keep_config_when_update_breaks_schema():
+    env = EnvYAML(
+        "tests/env.test.yaml", "tests/test.env", schema={"SIZE": "int"}, SIZE="1"
+    )
+
+    with pytest.raises(ValueError, match=r"SIZE \(int\)"):
+        env.update_env({"SIZE": "one"})
+
+    assert env["SIZE"] == "1" and env.get_int("SIZE") == 1
+
+
+def test_it_should_build_object():
+    env = EnvYAML("tests/env.test.yaml", "tests/test.env")
+    config = env.to_object()
+
+    assert config.one.two.three.value == env["one.two.three.value"]
+    assert config.keys_and_lists.one == tuple(env["keys_and_lists.one"])
+    assert config.keys_and_lists.two[1].super.one == "one"
+    assert config.config.test_env == env["config.test_env"]
+    assert env.to_object() is config
+
+    with pytest.raises(AttributeError):
+        config.one = "value"
+
+    with pytest.raises(AttributeError):
+        config.one.__dict__
+
+    # same keys share generated class
+    assert type(config.one) is type(
+        EnvYAML("tests/env.test.yaml", "tests/test.env").to_object().one
+    )
+
+
+def test_it_should_skip_keys_which_are_not_identifiers(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text("a-b: 1\n1c: 2\nclass: 3\n__d: 4\n5: 6\nok: 7\n")
+
+    config = EnvYAML(str(path), include_environment=False).to_object()
+
+    assert config.a_b == 1 and config.ok == 7
+    assert not hasattr(config, "class") and not hasattr(config, "__d")
+
+
+def test_it_should_rebuild_object_when_config_changed():
+    env = EnvYAML("tests/env.test.yaml", "tests/test.env")
+    config = env.to_object()
+
+    env.update_env({"TEST_ENV": "new-value"})
+
+    assert env.to_object() is not config
+    assert env.to_object().config.test_env == "new-value"
+    assert config.config.test_env != "new-value"
+
+
+def test_it_should_resolve_references_to_config_keys():
+    env = EnvYAML("tests/env.references.yaml", "tests/references.env", strict=True)
+
+    assert env["service.name"] == "eu-app-service"
+    assert env["database.name"] == "eu-app-service_db"
+    assert env["database.url"] == "postgres://localhost:5432/eu-app-service_db"
+    assert env["service.port"] == 5432
+    assert env["service.database"] == env["database"]
+    assert env["service.database.port"] == 5432
+    assert env["service.hosts"] == ["localhost", "replica-localhost"]
+    assert env["replica.url"] == env["database.url"] + "?replica=true"
+    assert env["replica.first"] == "replica-localhost"
+
+
+def test_it_should_prefer_variables_over_config_keys(monkeypatch):
+    monkeypatch.setenv("DB_HOST", "db.local")
+
+    env = EnvYAML(
+        "tests/env.references.yaml", "tests/references.env", **{"database.port": "1"}
+    )
+
+    assert env["database.url"] == "postgres://db.local:1/eu-app-service_db"
+    assert env["service.port"] == 1
+
+
+def test_it_should_expand_env_variables_in_dependency_order(monkeypatch):
+    monkeypatch.setenv("ENVYAML_REFERENCES_HOME", "/root")
+
+    env = EnvYAML("tests/env.references.yaml", "tests/references.env")
+
+    assert env["PREFIX"] == "eu-app"
+    assert env["SERVICE"] == "eu-app-service"
+
+    # variable referring to itself gets value from environment
+    assert env["ENVYAML_REFERENCES_HOME"] == "/root/home"
+    assert env["DATA_DIR"] == "/root/home/data"
+
+
+def test_it_should_raise_on_circular_references(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text("a: ${b.c}\nb:\n  c: $d\nd: x-${a}\n")
+
+    with pytest.raises(ValueError, match="circular references"):
+        EnvYAML(str(path), include_environment=False)
+
+    path.write_text("a:\n  b: ${a}\n")
+
+    with pytest.raises(ValueError, match="Config keys a.b have circular references"):
+        EnvYAML(str(path), include_environment=False)
+
+    env_path = tmp_path / ".env"
+    env_path.write_text("A=$B\nB=${C}\nC=$A\n")
+    path.write_text("a: 1\n")
+
+    with pytest.raises(ValueError, match=r"Variables .* have circular references"):
+        EnvYAML(str(path), str(env_path), include_environment=False)
+
+
+def test_it_should_check_references_in_strict_mode(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text("a: ${missing.key}\nb: x-$missing.key\n${c.d}: 1\n")
+
+    with pytest.raises(ValueError, match=r"\$missing.key"):
+        EnvYAML(str(path), include_environment=False)
+
+    env = EnvYAML(str(path), include_environment=False, strict=False)
+
+    assert env["a"] == "${missing.key}"
+    assert env["b"] == "x-$missing.key"
+    assert env["${c.d}"] == 1
+
+
+def test_it_should_report_not_defined_variables_before_parse_error(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text("a: [$missing.key\nb: 1\n")
+
+    with pytest.raises(ValueError, match=r"\$missing.key are not defined"):
+        EnvYAML(str(path), include_environment=False)
+
+    with pytest.raises(yaml.YAMLError):
+        EnvYAML(str(path), include_environment=False, strict=False)
+
+
+def test_it_should_expand_percent_variables_in_env_file_on_windows(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setattr(os, "name", "nt")
+    monkeypatch.setenv("ENVYAML_WINDOWS_HOME", "C:\\Users\\envyaml")
+
+    env_path = tmp_path / ".env"
+    env_path.write_text(
+        "A=$B-%ENVYAML_WINDOWS_HOME%-%ENVYAML_NOT_SET%-100%%\nB=b\nC=%ENVYAML_WINDOWS_HOME%\n"
+    )
+    path = tmp_path / "env.yaml"
+    path.write_text("a: 1\n")
+
+    env = EnvYAML(str(path), str(env_path))
+
+    assert env["A"] == "b-C:\\Users\\envyaml-%ENVYAML_NOT_SET%-100%"
+
+    # same as os.path.expandvars, values without "$" are kept as is
+    assert env["C"] == "%ENVYAML_WINDOWS_HOME%"
+
+
+def test_it_should_resolve_references_between_files(tmp_path):
+    path = tmp_path / "service.yaml"
+    path.write_text(
+        "service:\n  url: http://${service.database.host}:${service.port}\n"
+    )
+
+    env = EnvYAML(
+        ["tests/env.base.yaml", str(path)],
+        "tests/base.env",
+        include_environment=False,
+    )
+
+    assert env["service.url"] == "http://db.base:9090"
+
+
+def test_it_should_update_env_with_references():
+    env = EnvYAML("tests/env.references.yaml", "tests/references.env")
+
+    env.update_env({"DB_HOST": "db.new"})
+
+    assert env["database.url"] == "postgres://db.new:5432/eu-app-service_db"
+    assert env["replica.first"] == "replica-db.new"
+    assert (
+        env.export()
+        == EnvYAML(
+            "tests/env.references.yaml", "tests/references.env", DB_HOST="db.new"
+        ).export()
+    )
+
+
+def test_it_should_not_profile_by_default():
+    env = EnvYAML("tests/env.test.yaml", "tests/test.env")
+
+    assert env.get_profile() is None
+
+
+def test_it_should_profile_load(tmp_path):
+    reports = []
+
+    env = EnvYAML(
+        "tests/env.test.yaml",
+        "tests/test.env",
+        cache_dir=str(tmp_path),
+        profile=reports.append,
+    )
+    profile = env.get_profile()
+
+    assert set(profile["stages"]) >= {
+        "total",
+        "read_env",
+        "expand_env",
+        "read_yaml",
+        "comments",
+        "scan",
+        "render",
+        "parse",
+        "merge",
+        "flatten",
+        "validate",
+    }
+    assert all(seconds >= 0 for seconds in profile["stages"].values())
+    assert profile["stages"]["total"] >= profile["stages"]["parse"]
+
+    counts = profile["counts"]
+
+    assert counts["yaml_bytes"] > 0 and counts["env_variables"] > 0
+    assert counts["substitutions"] > 0
+    assert counts["keys"] == len(env._EnvYAML__yaml_cfg) > 10
+    assert counts["cache_misses"] == 1 and "cache_hits" not in counts
+    assert reports == [{"stages": profile["stages"], "counts": counts}]
+
+    env = EnvYAML(
+        "tests/env.test.yaml", "tests/test.env", cache_dir=str(tmp_path), profile=True
+    )
+
+    assert env.get_profile()["counts"]["cache_hits"] == 1
+    assert "scan" not in env.get_profile()["stages"]
+
+
+def test_it_should_profile_several_files():
+    env = EnvYAML(
+        ["tests/env.base.yaml", "tests/env.override.yaml"],
+        "tests/override.env",
+        include_environment=False,
+        profile=True,
+    )
+
+    profile = env.get_profile()
+
+    assert profile["counts"]["yaml_bytes"] == sum(
+        len(io.open(name, encoding="utf8").read())
+        for name in ("tests/env.base.yaml", "tests/env.override.yaml")
+    )
+    assert "parse" in profile["stages"]
+
+
+def test_it_should_count_reads_of_keys(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text(
+        "database:\n  host: db\n  port: $PORT\nservice:\n  name: a\n  tags: [x]\nlog: info\n"
+    )
+
+    env = EnvYAML(str(path), include_environment=False, profile=True, PORT="1")
+
+    env["database.host"]
+    env.get("database.host")
+    env.get_int("database.port")
+    "missing" in env
+    env["service"]
+
+    profile = env.get_profile()
+
+    assert profile["accesses"] == {
+        "database.host": 2,
+        "database.port": 1,
+        "missing": 1,
+        "service": 1,
+    }
+    assert profile["unused"] == ["log"]
+
+    env.update_env({"PORT": "2"})
+    env.reload()
+
+    # reads are kept after config was replaced, comparison is not counted
+    assert env.get_profile()["accesses"]["database.host"] == 2
+    assert env.export()["database.port"] == 1
+
+
+@pytest.mark.parametrize("loader", ["python", "auto"])
+def test_it_should_iter_documents(loader):
+    documents = list(
+        EnvYAML.iter_documents(
+            "tests/env.documents.yaml",
+            include_environment=False,
+            loader=loader,
+            HOST_PREFIX="eu",
+            REGION="west",
+            CACHE_ENABLED="true",
+        )
+    )
+
+    assert documents == [
+        {
+            "name": "web",
+            "host": "eu-web",
+            "port": 8080,
+            "tags": ["frontend", "west"],
+            "tags.0": "frontend",
+            "tags.1": "west",
+        },
+        {
+            "name": "db",
+            "host": "eu-db",
+            "port": 5432,
+            "url": "postgres://eu-db:5432",
+        },
+        {},
+        {"name": "cache", "enabled": True, "price": "$10"},
+    ]
+
+
+def test_it_should_iter_documents_without_flatten():
+    documents = EnvYAML.iter_documents(
+        "tests/env.documents.yaml",
+        include_environment=False,
+        strict=False,
+        flatten=False,
+        HOST_PREFIX="eu",
+    )
+
+    assert next(documents)["tags"] == ["frontend", "$REGION"]
+
+
+def test_it_should_iter_documents_of_opened_file():
+    stream = io.StringIO("a: $A\n---\n- $A\n- b\n")
+
+    documents = EnvYAML.iter_documents(stream, include_environment=False, A="1")
+
+    assert list(documents) == [{"a": 1}, {"0": 1, "1": "b"}]
+    assert not stream.closed
+
+
+def test_it_should_iter_documents_lazily():
+    documents = EnvYAML.iter_documents(
+        "tests/env.documents.yaml",
+        include_environment=False,
+        HOST_PREFIX="eu",
+        REGION="west",
+    )
+
+    # variables of later documents are checked when documents are reached
+    assert next(documents)["port"] == 8080
+    assert next(documents)["host"] == "eu-db"
+
+    with pytest.raises(ValueError, match="CACHE_ENABLED"):
+        list(documents)
+
+
+def test_it_should_keep_variable_value_as_scalar():
+    stream = io.StringIO("a: $VALUE\nb: '$VALUE'\n")
+
+    (document,) = EnvYAML.iter_documents(
+        stream, include_environment=False, VALUE="{x: 1}"
+    )
+
+    assert document == {"a": "{x: 1}", "b": "{x: 1}"}
+
+
+@pytest.mark.parametrize(
+    "yaml_file,env_file",
+    [
+        ("tests/env.default.yaml", None),
+        ("tests/env.references.yaml", "tests/references.env"),
+        ("tests/env.types.yaml", "tests/test.env"),
+        ("tests/env.anchors.yaml", "tests/test.env"),
+    ],
+)
+def test_it_should_interpolate_scalars_as_text(yaml_file, env_file):
+    text = EnvYAML(yaml_file, env_file, strict=False)
+    scalar = EnvYAML(yaml_file, env_file, strict=False, interpolate="scalar")
+
+    assert scalar.export() == text.export()
+
+
+def test_it_should_keep_quoting_of_scalar_values(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text(
+        "a: $VALUE\n"
+        "b: 'quoted $VALUE'\n"
+        "c: !!str $PORT\n"
+        "d: $PORT\n"
+        "e: 1 # $UNDEFINED\n"
+        "f: $$PORT\n"
+        "${NAME}: x\n"
+    )
+
+    env = EnvYAML(
+        str(path),
+        include_environment=False,
+        interpolate="scalar",
+        VALUE="x: 'y' # z",
+        PORT="80",
+        NAME="key",
+    )
+
+    assert env["a"] == "x: 'y' # z"
+    assert env["b"] == "quoted x: 'y' # z"
+    assert env["c"] == "80"
+    assert env["d"] == 80
+    assert env["e"] == 1
+    assert env["f"] == "$PORT"
+    assert env["key"] == "x"
+
+
+def test_it_should_check_scalars_in_strict_mode(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text("a: $FIRST\nb: [$SECOND, 1]\nc: ${THIRD|3}\n")
+
+    with pytest.raises(ValueError, match="FIRST") as error:
+        EnvYAML(str(path), include_environment=False, interpolate="scalar")
+
+    assert "SECOND" in str(error.value)
+    assert "THIRD" not in str(error.value)
+
+
+def test_it_should_update_env_with_scalar_interpolation():
+    env = EnvYAML(
+        "tests/env.references.yaml",
+        "tests/references.env",
+        include_environment=False,
+        interpolate="scalar",
+    )
+
+    assert env.update_env({"DB_HOST": "db"}) >= {"database.host", "replica.url"}
+    assert env["replica.url"] == "postgres://db:5432/eu-app-service_db?replica=true"
+
+
+def test_it_should_compile_with_scalar_interpolation():
+    compiled = EnvYAML.compile(
+        "tests/env.references.yaml",
+        "tests/references.env",
+        include_environment=False,
+        interpolate="scalar",
+    )
+
+    assert "DB_HOST" in compiled.variables
+    assert compiled.render({}, DB_HOST="db")["service.hosts.1"] == "replica-db"
+
+
+def test_it_should_raise_on_unknown_interpolation():
+    with pytest.raises(ValueError, match="interpolation"):
+        EnvYAML("tests/env.default.yaml", interpolate="regex")
+
+
+def test_it_should_load_shared_instance_once_under_contention(monkeypatch):
+    EnvYAML.shared_clear()
+
+    loads = []
+    init = EnvYAML.__init__
+
+    def slow_init(self, *args, **kwargs):
+        loads.append(threading.current_thread().name)
+        time.sleep(0.05)
+        init(self, *args, **kwargs)
+
+    monkeypatch.setattr(EnvYAML, "__init__", slow_init)
+
+    threads_count = 64
+    start = threading.Event()
+    results = []
+
+    def run():
+        start.wait()
+        results.append(
+            EnvYAML.shared("contention", "tests/env.default.yaml", strict=False)
+        )
+
+    threads = [threading.Thread(target=run) for _ in range(threads_count)]
+
+    for thread in threads:
+        thread.start()
+
+    # all threads ask for instance at once
+    start.set()
+
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert len(results) == threads_count
+    assert all(instance is results[0] for instance in results)
+    assert EnvYAML.shared("contention") is results[0]
+
+    EnvYAML.shared_clear("contention")
+
+    assert EnvYAML.shared("contention", "tests/env.default.yaml", strict=False) is not (
+        results[0]
+    )
+    assert len(loads) == 2
+
+    EnvYAML.shared_clear()
+
+
+def test_it_should_share_failed_load_and_try_again(tmp_path):
+    EnvYAML.shared_clear()
+
+    path = tmp_path / "env.yaml"
+    path.write_text("a: $UNDEFINED_SHARED\n")
+
+    threads_count = 16
+    start = threading.Event()
+    errors = []
+
+    def run():
+        start.wait()
+
+        try:
+            EnvYAML.shared("failed", str(path), include_environment=False)
+        except ValueError as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=run) for _ in range(threads_count)]
+
+    for thread in threads:
+        thread.start()
+
+    # all threads ask for instance at once
+    start.set()
+
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == threads_count
+
+    path.write_text("a: 1\n")
+
+    assert EnvYAML.shared("failed", str(path), include_environment=False)["a"] == 1
+
+    EnvYAML.shared_clear()
+
+
+def test_it_should_read_shared_instance_while_reloading(tmp_path):
+    EnvYAML.shared_clear()
+
+    path = tmp_path / "env.yaml"
+    path.write_text("a: 1\nb: 1\n")
+
+    env = EnvYAML.shared("reloading", str(path), include_environment=False)
+    stop = threading.Event()
+    errors = []
+
+    def read():
+        while not stop.is_set():
+            instance = EnvYAML.shared("reloading")
+            snapshot = instance.export()
+
+            # values of one snapshot are always consistent
+            if snapshot["a"] != snapshot["b"]:
+                errors.append(snapshot)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+
+    for reader in readers:
+        reader.start()
+
+    try:
+        for value in range(2, 12):
+            path.write_text("a: %d\nb: %d\n" % (value, value))
+            env.reload()
+    finally:
+        stop.set()
+
+        for reader in readers:
+            reader.join()
+
+    assert not errors
+    assert EnvYAML.shared("reloading")["a"] == 11
+
+    EnvYAML.shared_clear()
+
+
+@pytest.mark.parametrize("flatten", [True, "lazy", False])
+def test_it_should_freeze_config(flatten):
+    env = EnvYAML(
+        "tests/env.types.yaml", "tests/test.env", strict=False, flatten=flatten
+    )
+    before = dict(env.export())
+
+    assert env.freeze() is env
+    assert dict(env.export()) == before
+    assert isinstance(env.export(), envyaml.MappingProxyType)
+
+    for key in before:
+        assert env[key] == before[key]
+        assert key in env
+
+    assert "missing.key" not in env
+    assert env.get(1) is None
+    assert env.get("missing.key", "x") == "x"
+
+
+def test_it_should_not_change_frozen_config():
+    env = EnvYAML("tests/env.default.yaml", strict=False).freeze()
+
+    with pytest.raises(RuntimeError, match="Frozen"):
+        env.reload()
+
+    with pytest.raises(RuntimeError, match="Frozen"):
+        env.update_env({"SIMPLE_A": "a"})
+
+
+def test_it_should_keep_environment_layers_when_frozen(monkeypatch):
+    monkeypatch.setenv("ENVYAML_FROZEN", "before")
+
+    env = EnvYAML("tests/env.default.yaml", strict=False, EXTRA="kwarg").freeze()
+
+    monkeypatch.setenv("ENVYAML_FROZEN", "after")
+
+    assert env["ENVYAML_FROZEN"] == "before"
+    assert env["EXTRA"] == "kwarg"
+
+
+def test_it_should_preload_shared_instance(monkeypatch):
+    EnvYAML.shared_clear()
+
+    frozen = []
+    # gc.freeze is available since python 3.7
+    monkeypatch.setattr(
+        envyaml.gc, "freeze", lambda: frozen.append(True), raising=False
+    )
+
+    env = EnvYAML.preload(
+        "preloaded", gc_freeze=True, yaml_file="tests/env.default.yaml", strict=False
+    )
+
+    assert EnvYAML.shared("preloaded") is env
+    assert frozen == [True]
+
+    with pytest.raises(RuntimeError):
+        env.reload()
+
+    EnvYAML.shared_clear()
+
+
+def test_it_should_keep_values_and_order_of_frozen_config(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text(
+        "z: 1\nday: 2021-12-31\nbig: 123456789012345678901234567890\n"
+        "items: [a, b]\nempty: ~\nratio: 0.5\n"
+    )
+
+    env = EnvYAML(str(path), include_environment=False)
+    keys = list(env.keys())
+    values = dict(env.export())
+
+    env.freeze()
+
+    assert list(env.keys()) == keys
+    assert dict(env.export()) == values
+    assert env["items"] is values["items"]
+    assert env.get_list("items") == ["a", "b"]
+
+
+unix_only = pytest.mark.skipif(
+    not hasattr(__import__("socket"), "AF_UNIX"), reason="requires Unix sockets"
+)
+
+
+@pytest.fixture
+def socket_path():
+    # path of Unix socket is limited to about 100 characters
+    directory = tempfile.mkdtemp()
+
+    yield os.path.join(directory, "envyaml.sock")
+
+    shutil.rmtree(directory)
+
+
+@unix_only
+def test_it_should_serve_config_to_connected_instance(tmp_path, socket_path):
+    path = tmp_path / "env.yaml"
+    path.write_text("db:\n  host: $DB_HOST\n  port: 5432\nday: 2021-12-31\n")
+
+    server = EnvYAML.serve(
+        socket_path, interval=0.05, yaml_file=str(path), DB_HOST="db"
+    )
+    updates = []
+
+    try:
+        env = EnvYAML.connect(socket_path, interval=0.05, callback=updates.append)
+
+        assert env.get_version() == 1
+        local = EnvYAML(str(path), include_environment=False, DB_HOST="db")
+
+        # only yaml config is published, not variables of server
+        assert dict(env.export()) == dict(
+            (key, local[key]) for key in local.keys() if key != "DB_HOST"
+        )
+        assert env["db.port"] == 5432
+        assert env.section("db")["host"] == "db"
+        assert env.to_object().db.port == 5432
+
+        with pytest.raises(RuntimeError, match="Frozen"):
+            env.reload()
+
+        path.write_text("db:\n  host: $DB_HOST\n  port: 6432\nday: 2021-12-31\n")
+        os.utime(str(path), (time.time() + 10, time.time() + 10))
+
+        for _ in range(100):
+            if updates:
+                break
+
+            time.sleep(0.05)
+
+        assert updates == [{"db", "db.port"}]
+        assert env["db.port"] == 6432
+        assert env.get_version() == 2
+
+        env.unwatch()
+    finally:
+        server.close()
+
+    assert not os.path.exists(socket_path)
+
+
+@unix_only
+def test_it_should_reconnect_after_server_restart(socket_path):
+    server = EnvYAML.serve(
+        socket_path, yaml_file="tests/env.default.yaml", strict=False
+    )
+    updates = []
+
+    try:
+        env = EnvYAML.connect(socket_path, interval=0.05, callback=updates.append)
+    finally:
+        server.close()
+
+    # last received config is kept while server is down
+    assert env["simple_a"] == "default"
+
+    server = EnvYAML.serve(
+        socket_path, yaml_file="tests/env.default.yaml", strict=False, AAA="x"
+    )
+
+    try:
+        for _ in range(100):
+            if updates:
+                break
+
+            time.sleep(0.05)
+
+        assert "simple_a" in updates[0]
+        assert env["simple_a"] == "x"
+    finally:
+        env.unwatch()
+        server.close()
+
+
+@unix_only
+def test_it_should_serve_on_private_socket_by_default(monkeypatch):
+    directory = tempfile.mkdtemp()
+
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.delenv("ENVYAML_SOCKET", raising=False)
+    monkeypatch.setattr(tempfile, "tempdir", directory)
+
+    try:
+        server = EnvYAML.serve(yaml_file="tests/env.default.yaml", strict=False)
+
+        try:
+            assert os.path.isabs(server.socket_path)
+            assert os.stat(os.path.dirname(server.socket_path)).st_mode & 0o077 == 0
+
+            env = EnvYAML.connect()
+
+            assert env["simple_a"] == "default"
+
+            env.unwatch()
+        finally:
+            server.close()
+
+        # directory which other users could write to is not trusted
+        os.chmod(os.path.dirname(server.socket_path), 0o777)
+
+        with pytest.raises(RuntimeError, match="not private"):
+            EnvYAML.connect(timeout=0.2)
+    finally:
+        shutil.rmtree(directory)
+
+
+@unix_only
+def test_it_should_not_wait_for_client_which_does_not_read(tmp_path, socket_path):
+    path = tmp_path / "env.yaml"
+    # snapshot is larger than buffer of socket
+    path.write_text("key: %s\n" % ("x" * (8 << 20)))
+
+    server = EnvYAML.serve(socket_path, yaml_file=str(path), include_environment=False)
+    stalled = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        stalled.connect(socket_path)
+
+        started = time.time()
+        server.publish()
+        env = EnvYAML.connect(socket_path, timeout=2)
+
+        assert time.time() - started < server.SEND_TIMEOUT
+        assert len(env["key"]) == 8 << 20
+
+        env.unwatch()
+    finally:
+        stalled.close()
+        server.close()
+
+
+@unix_only
+def test_it_should_not_connect_without_server(socket_path):
+    with pytest.raises((OSError, IOError)):
+        EnvYAML.connect(socket_path, timeout=0.2)
+
+
+@unix_only
+def test_it_should_serve_from_command_line(socket_path):
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "envyaml",
+            "serve",
+            "--socket",
+            socket_path,
+            "--yaml",
+            "tests/env.default.yaml",
+            "--no-strict",
+        ],
+        stdout=subprocess.PIPE,
+    )
+
+    try:
+        env = EnvYAML.connect(socket_path, timeout=10)
+
+        assert env["simple_a"] == "default"
+
+        env.unwatch()
+    finally:
+        process.terminate()
+        process.wait()
+
+    assert process.returncode == 0
+    assert not os.path.exists(socket_path)